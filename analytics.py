@@ -0,0 +1,352 @@
+"""
+Plan quality analytics, computed in bulk with pandas group-bys.
+
+A plan (or every stored plan under a directory) becomes two long tables, one
+row per served side dish and one row per day, and every metric is a group-by
+over them instead of a loop over days:
+  - dish_frequency:         servings and plans per dish
+  - frequency_distribution: how many dishes were served 1, 2, 3, ... times
+  - repeat_distance:        mean / min days between servings of a dish (within a plan)
+  - weekly_categories:      side dishes per category, per plan and ISO week (Monday)
+  - weekly_meats:           meat-type dishes per meat type, per plan and ISO week
+  - weekly_ingredients:     distinct ingredients per shopping week (as aggregate_ingredients)
+  - staple_mix:             staple days per staple category and dish
+  - plans:                  one summary row per plan, for comparing plans/catalogs
+
+    python analytics.py meal_plan.csv -i dishes.csv --json analytics.json
+    python analytics.py out/ -i dishes.csv --csv analytics/     # many stored plans
+    python main.py --analytics analytics.json                   # also adds a tab to the web report
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from planner import is_columnar_path, load_dishes_from_csv, load_plan_from_csv
+from shopping_aggregator import iter_plan_files
+
+TABLES = ['plans', 'dish_frequency', 'frequency_distribution', 'repeat_distance',
+          'weekly_categories', 'weekly_meats', 'weekly_ingredients', 'staple_mix']
+
+
+def _plan_arrays(plan):
+    # Same columns as _plan_file_arrays, from in-memory DayPlans
+    served = [(day.date_str, meal, d.name)
+              for day in plan for meal, dishes in (('Dinner', day.dinner), ('Lunch', day.lunch)) for d in dishes]
+    columns = [np.array(c, dtype=object) for c in zip(*served)] or [np.empty(0, dtype=object)] * 3
+    days = (np.array([day.date_str for day in plan], dtype=object), np.array([day.staple for day in plan], dtype=object))
+    return tuple(columns), days
+
+
+def plan_frames(plan, plan_id='plan'):
+    """(served, days) long tables of an in-memory plan (list of DayPlans)."""
+    served, days = _plan_arrays(plan)
+    return _frames([plan_id], [served], [days])
+
+
+def _plan_file_arrays(filepath):
+    """
+    Numpy columns of a stored plan file: (served dates, meals, dishes) and
+    (day dates, staples). Frames are only built once for a whole set of files.
+    """
+    if is_columnar_path(filepath):
+        df = pd.read_parquet(filepath) if filepath.lower().endswith('.parquet') else pd.read_feather(filepath)
+        header = list(df.columns)
+        block = df.astype(str).replace({'nan': '', 'None': '', '<NA>': ''}).to_numpy(dtype=object)
+    else:
+        # The csv module is several times faster than read_csv on files this small
+        with open(filepath, 'r', encoding='utf-8-sig', newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader, [])
+            block = np.array([row for row in reader if len(row) == len(header)], dtype=object)
+    col = {name: i for i, name in enumerate(header)}
+    if 'Date' not in col:
+        empty = np.empty(0, dtype=object)
+        return (empty, empty, empty), (empty, empty)
+    block = block.reshape(-1, len(header))
+
+    # Day-major flattening of the Dish/Lunch columns
+    dish_cols = [i for name, i in col.items() if name.startswith(('Dish ', 'Lunch '))]
+    table = block[:, dish_cols].ravel()
+    keep = table != ''
+    meals = np.array(['Lunch' if header[i].startswith('Lunch ') else 'Dinner' for i in dish_cols], dtype=object)
+    dates = block[:, col['Date']]
+    staples = block[:, col['Staple']] if 'Staple' in col else np.full(len(block), '', dtype=object)
+    served = (np.repeat(dates, len(dish_cols))[keep], np.tile(meals, len(block))[keep], table[keep])
+    return served, (dates, staples)
+
+
+def _frames(plan_ids, served_parts, day_parts):
+    # One DataFrame per table for all files; plan ids as a categorical
+    def plan_column(parts):
+        counts = [len(p[0]) for p in parts]
+        codes = np.repeat(np.arange(len(plan_ids)), counts)
+        return pd.Categorical.from_codes(codes, categories=pd.Index(plan_ids, dtype=object))
+    def cat(parts, k):
+        return np.concatenate([p[k] for p in parts]) if parts else np.empty(0, dtype=object)
+    served = pd.DataFrame({'plan': plan_column(served_parts), 'date': cat(served_parts, 0),
+                           'meal': cat(served_parts, 1), 'dish': cat(served_parts, 2)})
+    days = pd.DataFrame({'plan': plan_column(day_parts), 'date': cat(day_parts, 0), 'staple': cat(day_parts, 1)})
+    # One vectorized date parse for the whole set
+    for df in (served, days):
+        df['date'] = pd.to_datetime(df['date'].astype(str), format='ISO8601')
+    return served, days
+
+
+def load_plan_frames(paths, dishes=None):
+    """(served, days) of every plan file under the given files/directories; the path is the plan id."""
+    from sqlite_store import is_db_path
+    plan_ids, served_parts, day_parts = [], [], []
+    for filepath in iter_plan_files(paths):
+        if filepath in plan_ids:
+            continue
+        if is_db_path(filepath):
+            s, d = _plan_arrays(load_plan_from_csv(filepath, dishes or []))
+        else:
+            s, d = _plan_file_arrays(filepath)
+        plan_ids.append(filepath)
+        served_parts.append(s)
+        day_parts.append(d)
+    return _frames(plan_ids, served_parts, day_parts)
+
+
+def catalog_frames(dishes):
+    """(dish name -> category/meat_type table, long dish/ingredient table); first entry per name wins."""
+    info = pd.DataFrame([(d.name, d.category, d.meat_type or '') for d in dishes],
+                        columns=['dish', 'category', 'meat_type']).drop_duplicates('dish').set_index('dish')
+    ingredients = pd.DataFrame([(d.name, ing) for d in dishes for ing in set(d.ingredients)],
+                               columns=['dish', 'ingredient']).drop_duplicates()
+    return info, ingredients
+
+
+def _monday(dates):
+    return (dates - pd.to_timedelta(dates.dt.weekday, unit='D')).dt.strftime('%Y-%m-%d')
+
+
+class PlanAnalytics:
+    """Result tables (pandas DataFrames) and headline numbers of analyze()."""
+
+    def __init__(self, tables, summary):
+        self.tables = tables
+        self.summary = summary
+
+    def to_dict(self):
+        return {'summary': self.summary,
+                'tables': {name: json.loads(df.to_json(orient='records', force_ascii=False))
+                           for name, df in self.tables.items()}}
+
+    def save_json(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+        print(f"Analytics saved to {path}")
+
+    def save_csv(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        for name, df in self.tables.items():
+            df.to_csv(os.path.join(directory, f"{name}.csv"), index=False, encoding='utf-8-sig')
+        with open(os.path.join(directory, 'summary.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.summary, f, indent=2, ensure_ascii=False)
+        print(f"Analytics saved to {directory}/")
+
+    def save(self, path):
+        # .json -> one JSON file, anything else -> a directory of CSV tables
+        if path.lower().endswith('.json'):
+            self.save_json(path)
+        else:
+            self.save_csv(path)
+
+
+def _codes(values, names=None):
+    """Integer codes of a column (and its distinct values); -1 for values missing from names."""
+    if names is None:
+        codes, names = pd.factorize(values)
+        return codes, pd.Index(names)
+    return names.get_indexer(values), names
+
+
+def _days(dates):
+    # Datetime column -> day numbers (days since 1970-01-01, a Thursday)
+    return dates.to_numpy(dtype='datetime64[D]').astype(np.int64)
+
+
+def _iso(day_numbers):
+    return pd.to_datetime(np.asarray(day_numbers, dtype='datetime64[D]')).strftime('%Y-%m-%d')
+
+
+def analyze(served, days, dishes):
+    """
+    PlanAnalytics of the (served, days) tables against the catalog.
+    Dishes, plans, categories and meat types are factorized to integer codes
+    once; every group-by then runs on integer columns.
+    """
+    info, ingredients = catalog_frames(dishes)
+    plan_codes, plans = _codes(days['plan'])
+    e_plan, _ = _codes(served['plan'], plans)
+    e_dish, dish_names = _codes(served['dish'])
+    e_day = _days(served['date'])
+    n_dishes = len(dish_names)
+
+    # Per-dish attributes, gathered per served row by code
+    dish_cat = info['category'].reindex(dish_names).fillna('').to_numpy()
+    dish_meat = info['meat_type'].reindex(dish_names).fillna('').to_numpy()
+    cat_of_dish, categories = _codes(dish_cat)
+    meat_of_dish, meat_types = _codes(dish_meat)
+    e_cat = cat_of_dish[e_dish]
+    e_meat = meat_of_dish[e_dish]
+    rows = pd.DataFrame({'plan': e_plan, 'dish': e_dish, 'day': e_day,
+                         'week': e_day - (e_day + 3) % 7, 'cat': e_cat, 'meat': e_meat})
+    tables = {}
+
+    # Dish frequency and its distribution
+    n_served = np.bincount(e_dish, minlength=n_dishes)
+    n_plans = rows.drop_duplicates(['dish', 'plan']).groupby('dish').size().reindex(range(n_dishes), fill_value=0)
+    freq = pd.DataFrame({'dish': dish_names, 'category': dish_cat, 'served': n_served, 'plans': n_plans.to_numpy()})
+    freq = freq.sort_values('served', ascending=False, kind='stable').reset_index(drop=True)
+    tables['dish_frequency'] = freq
+    times, count = np.unique(n_served, return_counts=True)
+    tables['frequency_distribution'] = pd.DataFrame({'times_served': times, 'dishes': count})
+
+    # Days between consecutive servings of a dish, within each plan
+    ordered = rows.sort_values(['plan', 'dish', 'day'], kind='stable')
+    same = (ordered['plan'].diff() == 0) & (ordered['dish'].diff() == 0)
+    gaps = ordered.assign(gap=ordered['day'].diff())[same]
+    by_dish = gaps.groupby('dish')['gap'].agg(['size', 'mean', 'min'])
+    tables['repeat_distance'] = pd.DataFrame({
+        'dish': dish_names[by_dish.index], 'repeats': by_dish['size'].to_numpy(),
+        'mean_gap': by_dish['mean'].to_numpy(), 'min_gap': by_dish['min'].to_numpy(),
+    }).sort_values('mean_gap', kind='stable').reset_index(drop=True)
+
+    # Weekly balance by category and by meat type (ISO weeks keyed by Monday)
+    def weekly(col, names, mask=None):
+        sub = rows if mask is None else rows[mask]
+        table = sub.groupby(['plan', 'week', col]).size().unstack(fill_value=0)
+        table.columns = [names[c] for c in table.columns]
+        table = table.reset_index()
+        table['plan'] = plans[table['plan']]
+        table['week'] = _iso(table['week'])
+        return table
+    tables['weekly_categories'] = weekly('cat', categories)
+    has_meat = dish_meat[e_dish] != ''
+    tables['weekly_meats'] = weekly('meat', meat_types, has_meat)
+
+    # Distinct ingredients per shopping week (7-day blocks from each plan's first day):
+    # distinct (week, dish) pairs exploded to ingredients through a CSR dish -> ingredient index
+    start = pd.Series(_days(days['date'])).groupby(plan_codes).min().reindex(range(len(plans))).to_numpy()
+    shop_week = (e_day - start[e_plan]) // 7 + 1
+    n_weeks = int(shop_week.max()) + 1 if len(shop_week) else 1
+    # (hash-based pd.unique: no sort of the exploded rows)
+    group = np.sort(pd.unique(e_plan.astype(np.int64) * n_weeks + shop_week))
+    pairs = pd.unique((e_plan.astype(np.int64) * n_weeks + shop_week) * n_dishes + e_dish)
+    ing_dish, _ = _codes(ingredients['dish'], dish_names)
+    ing_code, ing_names = _codes(ingredients['ingredient'])
+    known = ing_dish >= 0
+    order = np.argsort(ing_dish[known], kind='stable')
+    ing_sorted = ing_code[known][order]
+    per_dish = np.bincount(ing_dish[known], minlength=n_dishes)
+    indptr = np.concatenate(([0], np.cumsum(per_dish)))
+    pair_dish = pairs % n_dishes
+    lengths = per_dish[pair_dish]
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    ings = ing_sorted[np.repeat(indptr[pair_dish], lengths) + offsets]
+    keys = pd.unique(np.repeat(pairs // n_dishes, lengths) * max(len(ing_names), 1) + ings)
+    distinct = pd.Series(keys // max(len(ing_names), 1)).value_counts().reindex(group, fill_value=0)
+    tables['weekly_ingredients'] = pd.DataFrame({
+        'plan': plans[group // n_weeks], 'shop_week': group % n_weeks, 'distinct_ingredients': distinct.to_numpy(),
+    })
+
+    # Staple mix over the planned days
+    staples = days[~days['staple'].isin(['', 'Holiday'])]
+    staple_plan = plan_codes[~days['staple'].isin(['', 'Holiday']).to_numpy()]
+    staple_code, staple_names = _codes(staples['staple'])
+    # Staples not in the catalog: 白飯 of the monthly-limit fallback is rice; a bare
+    # category name (catalog without dishes of that category) is its own category
+    bare = pd.Series(staple_names, index=staple_names)
+    bare = bare.where(bare.isin(['Rice', 'Combo (Rice)', 'Combo (Noodle)']), 'Rice')
+    staple_cat = info['category'].reindex(staple_names).fillna(bare).to_numpy()
+    per_staple = np.bincount(staple_code, minlength=len(staple_names))
+    mix = pd.DataFrame({'category': staple_cat, 'staple': staple_names, 'days': per_staple})
+    mix['share'] = mix['days'] / max(len(staples), 1)
+    tables['staple_mix'] = mix.sort_values('days', ascending=False, kind='stable').reset_index(drop=True)
+    is_combo = np.array(['Combo' in c for c in staple_cat], dtype=bool)[staple_code]
+    mix_codes, mix_categories = _codes(staple_cat[staple_code])
+
+    # One row per plan
+    n = len(plans)
+    def per_plan(values, codes, how='sum'):
+        return pd.Series(values).groupby(codes).agg(how).reindex(range(n)).to_numpy()
+    planned = np.bincount(staple_plan, minlength=n)
+    tables['plans'] = pd.DataFrame({
+        'plan': plans,
+        'planned_days': planned,
+        'dishes_served': np.bincount(e_plan, minlength=n),
+        'distinct_dishes': np.bincount(pd.unique(e_plan.astype(np.int64) * n_dishes + e_dish) // max(n_dishes, 1),
+                                       minlength=n),
+        'mean_repeat_gap': per_plan(gaps['gap'].to_numpy(), gaps['plan'].to_numpy(), 'mean'),
+        'mean_weekly_ingredients': per_plan(distinct.to_numpy(), group // n_weeks, 'mean'),
+        'combo_share': np.bincount(staple_plan, weights=is_combo, minlength=n) / np.maximum(planned, 1),
+    })
+
+    def shares(codes, names):
+        counts = np.bincount(codes, minlength=len(names))
+        total = max(counts.sum(), 1)
+        return {names[k]: float(counts[k] / total) for k in np.argsort(-counts, kind='stable') if counts[k]}
+
+    summary = {
+        'plans': n,
+        'planned_days': int(len(staples)),
+        'dishes_served': int(len(e_dish)),
+        'distinct_dishes': n_dishes,
+        'catalog_coverage': n_dishes / max(info.shape[0], 1),
+        'mean_servings_per_dish': float(n_served.mean()) if n_dishes else 0.0,
+        'mean_repeat_gap_days': float(gaps['gap'].mean()) if len(gaps) else None,
+        'mean_weekly_ingredients': float(distinct.mean()) if len(distinct) else 0.0,
+        'category_share': shares(e_cat, categories),
+        'meat_share': shares(e_meat[has_meat], meat_types),
+        'staple_category_share': shares(mix_codes, mix_categories),
+    }
+    return PlanAnalytics({name: tables[name] for name in TABLES}, summary)
+
+
+def analyze_plan(plan, dishes):
+    """Analytics of one in-memory plan."""
+    return analyze(*plan_frames(plan), dishes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quality analytics of one or many stored meal plans")
+    parser.add_argument('plans', nargs='+', help='Plan files or directories of stored plans')
+    parser.add_argument('--input', '-i', default='dishes.csv', help='Path to the dishes CSV file')
+    parser.add_argument('--json', type=str, default=None, help='Write all tables and the summary as JSON')
+    parser.add_argument('--csv', type=str, default=None, help='Write one CSV per table into this directory')
+    args = parser.parse_args()
+
+    dishes = load_dishes_from_csv(args.input)
+    if not dishes:
+        print("Error: No dishes loadable from file. Check format.")
+        sys.exit(1)
+    served, days = load_plan_frames(args.plans, dishes)
+    if days.empty:
+        print("Error: No plans found.")
+        sys.exit(1)
+
+    result = analyze(served, days, dishes)
+    s = result.summary
+    print(f"{s['plans']} plan(s), {s['planned_days']} planned days, {s['dishes_served']} dishes served")
+    print(f"Distinct dishes: {s['distinct_dishes']} ({s['catalog_coverage']:.0%} of the catalog), "
+          f"{s['mean_servings_per_dish']:.1f} servings each")
+    if s['mean_repeat_gap_days'] is not None:
+        print(f"Mean repeat distance: {s['mean_repeat_gap_days']:.1f} days")
+    print(f"Distinct ingredients per shopping week: {s['mean_weekly_ingredients']:.1f}")
+    print("Staples: " + ", ".join(f"{k} {v:.0%}" for k, v in s['staple_category_share'].items()))
+    if args.json:
+        result.save_json(args.json)
+    if args.csv:
+        result.save_csv(args.csv)
+
+
+if __name__ == "__main__":
+    main()
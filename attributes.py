@@ -0,0 +1,198 @@
+"""
+Numeric dish attributes (cost, prep time, calories) and limits on them.
+
+The catalog may carry optional Cost, PrepTime (minutes) and Calories columns.
+They are parsed into Dish.attrs and the planner keeps them as one float array
+per attribute indexed by Dish.id (NaN = unknown, counted as 0). Per-day and
+per-week limits are 'attribute/period' keys of MealPlanner.LIMITS and are
+checked with one vectorized comparison over the candidate pool per pick:
+
+    python main.py --limit cost/week=1500 --limit prep_time/day=60 --prefer cost
+
+Staples count towards the totals. Weekly limits follow the shopping weeks
+(7-day blocks from the plan start), so they match the shopping list totals.
+"""
+import numpy as np
+
+# Attribute -> accepted catalog column names
+ATTRIBUTES = {
+    'cost': ('Cost', 'cost'),
+    'prep_time': ('PrepTime', 'Prep Time', 'prep_time'),
+    'calories': ('Calories', 'calories'),
+}
+PERIODS = ('day', 'week')
+FORMATS = {'cost': 'cost {:.0f}', 'prep_time': '{:.0f} min', 'calories': '{:.0f} kcal'}
+
+
+def parse_attributes(row, name=None):
+    """Attribute values of one catalog row; blank or missing columns are left out."""
+    attrs = {}
+    for attr, columns in ATTRIBUTES.items():
+        value = next((row[c] for c in columns if row.get(c)), None)
+        if value is None or not value.strip():
+            continue
+        try:
+            attrs[attr] = float(value)
+        except ValueError:
+            from planner import warn
+            warn(f"Warning: Invalid {attr} {value!r} for '{name}', ignored.")
+    return attrs
+
+
+def check_limits(limits):
+    for key, value in limits.items():
+        attr, _, period = key.partition('/')
+        if attr not in ATTRIBUTES or period not in PERIODS:
+            raise ValueError(f"unknown limit '{key}': use attribute/period with attribute one of "
+                             f"{', '.join(ATTRIBUTES)} and period day or week")
+        if not isinstance(value, (int, float)):
+            raise ValueError(f"limit '{key}' must be a number")
+
+
+def parse_limits(specs):
+    """['cost/week=1500', ...] -> {'cost/week': 1500.0}; raises ValueError."""
+    limits = {}
+    for spec in specs:
+        key, sep, value = spec.partition('=')
+        if not sep:
+            raise ValueError(f"limit '{spec}' is not attribute/period=value")
+        limits[key.strip()] = float(value)
+    check_limits(limits)
+    return limits
+
+
+def format_totals(totals):
+    return ' · '.join(FORMATS[attr].format(value) for attr, value in totals.items())
+
+
+class DishAttributes:
+    """Columnar attributes of a catalog: values[k, Dish.id] is attribute names[k]."""
+
+    def __init__(self, dishes):
+        self.names = [attr for attr in ATTRIBUTES if any(attr in d.attrs for d in dishes)]
+        self.values = np.full((len(self.names), len(dishes)), np.nan)
+        self.ids = {}
+        for i, d in enumerate(dishes):
+            d.id = i
+            self.ids.setdefault(d.name, i)
+            for k, attr in enumerate(self.names):
+                value = d.attrs.get(attr)
+                if value is not None:
+                    self.values[k, i] = value
+
+    def totals(self, names):
+        """Attribute -> sum over the named dishes (unknown values count as 0)."""
+        ids = [self.ids[n] for n in names if n in self.ids]
+        return dict(zip(self.names, np.nansum(self.values[:, ids], axis=1).tolist()))
+
+    def plan_totals(self, plan):
+        """
+        ({date: totals} of the planned days, {shopping week: totals}), staples
+        included; weeks are the 7-day blocks of aggregate_ingredients.
+        """
+        days, weeks = {}, {}
+        for i, day in enumerate(plan):
+            week = weeks.setdefault(i // 7 + 1, dict.fromkeys(self.names, 0.0))
+            if not day.is_planned:
+                continue
+            totals = self.totals([day.staple] + day.dinner_names + day.lunch_names)
+            days[day.date] = totals
+            for attr, value in totals.items():
+                week[attr] += value
+        return days, weeks
+
+    def preference(self, attr):
+        """Pick weights favoring low values of attr: 1 / (1 + value / median); unknown -> 1/2."""
+        values = self.values[self.names.index(attr)]
+        known = values[~np.isnan(values)]
+        scale = np.median(known[known > 0]) if (known > 0).any() else 1.0
+        return np.where(np.isnan(values), 0.5, 1.0 / (1.0 + np.clip(values, 0, None) / scale))
+
+
+class Budget:
+    """
+    Spending of one planning run against per-day and per-shopping-week limits.
+    mask(pool) marks the pool dishes that still fit (one vectorized comparison
+    per pick; the planner's rule check reads the result by Dish.id). Each cap
+    keeps the cheapest side dish in reserve for every slot still to fill that
+    day, and the dearest staple plus the cheapest sides for every planned day
+    left in the week. Staples are picked by their own rules, among the ones
+    that fit (staple_fits) when any does.
+    """
+
+    def __init__(self, attributes, limits, side_ids, staple_ids, day_sides):
+        limited = {key.partition('/')[0] for key in limits}
+        self.names = [attr for attr in attributes.names if attr in limited]
+        rows = [attributes.names.index(attr) for attr in self.names]
+        self.values = np.nan_to_num(attributes.values[rows], nan=0.0)
+        self.day_cap = np.array([limits.get(f"{attr}/day", np.inf) for attr in self.names], dtype=float)
+        self.week_cap = np.array([limits.get(f"{attr}/week", np.inf) for attr in self.names], dtype=float)
+        self.min_side = self.values[:, side_ids].min(axis=1) if len(side_ids) else np.zeros(len(self.names))
+        max_staple = self.values[:, staple_ids].max(axis=1) if len(staple_ids) else np.zeros(len(self.names))
+        self.day_reserve = max_staple + day_sides * self.min_side
+        self.day_sides = day_sides
+        self.ok = np.ones(self.values.shape[1], dtype=bool)
+        self._pools = {}
+        self.ids = attributes.ids
+        self.start_week()
+
+    def start_week(self):
+        self.week_spent = np.zeros(len(self.names))
+        self.start_day()
+
+    def start_day(self, days_after=0):
+        # days_after: planned days left in the shopping week after this one
+        self.day_spent = np.zeros(len(self.names))
+        self.days_after = days_after
+        self.slots = self.day_sides
+
+    def cap(self):
+        reserve = max(self.slots - 1, 0) * self.min_side
+        week_reserve = reserve + self.days_after * self.day_reserve
+        return np.minimum(self.day_cap - self.day_spent - reserve, self.week_cap - self.week_spent - week_reserve)
+
+    def mask(self, pool):
+        """Which pool dishes fit (bool array in pool order); also sets self.ok[Dish.id]."""
+        entry = self._pools.get(id(pool))
+        if entry is None or entry[0] is not pool:
+            # Pool ids and a contiguous copy of their values, gathered once per pool
+            ids = np.fromiter((d.id for d in pool), dtype=np.int64, count=len(pool))
+            entry = self._pools[id(pool)] = (pool, ids, np.ascontiguousarray(self.values[:, ids]))
+        _, ids, values = entry
+        fits = np.ones(len(pool), dtype=bool)
+        for row, cap in zip(values, self.cap() + 1e-9):
+            if cap < np.inf:
+                fits &= row <= cap
+        self.ok[ids] = fits
+        return fits
+
+    def fits(self, dish):
+        # Re-check inside a batch pick, after its earlier picks were booked
+        return bool((self.values[:, dish.id] <= self.cap() + 1e-9).all())
+
+    def staple_fits(self, name):
+        # The day's staple fits when the cheapest sides for all its slots still fit next to it
+        i = self.ids.get(name)
+        if i is None:
+            return True
+        return bool((self.values[:, i] <= self.cap() - self.min_side + 1e-9).all())
+
+    def dearer(self, name, than):
+        # Whether dish `name` costs more than dish `than` in some limited attribute
+        i, j = self.ids.get(name), self.ids.get(than)
+        if i is None or j is None:
+            return False
+        return bool((self.values[:, i] > self.values[:, j] + 1e-9).any())
+
+    def add(self, dish):
+        value = self.values[:, dish.id]
+        self.day_spent += value
+        self.week_spent += value
+        self.slots -= 1
+
+    def spend(self, name):
+        # Books a dish by name without using a slot (staples, locked days)
+        i = self.ids.get(name)
+        if i is not None:
+            self.day_spent += self.values[:, i]
+            self.week_spent += self.values[:, i]
@@ -0,0 +1,260 @@
+"""
+Benchmark suite for the planner hot paths, aggregation and reporters.
+
+Runs every case across catalog sizes and planning horizons on synthetic
+catalogs (see synthetic_catalog.py), reports throughput and peak memory and
+compares against a stored baseline so regressions fail loudly. A case's time
+is the median of interleaved samples of at least MIN_SAMPLE each; slowdowns
+under TIME_FLOOR or within the samples' noise (time_noise) don't fail:
+
+    python benchmark.py --save-baseline          # record benchmark_baseline.json
+    python benchmark.py                          # compare, exit 1 on regression or no baseline
+    python benchmark.py --full                   # up to 30k dishes / 10 years
+"""
+import argparse
+import contextlib
+import datetime
+import gc
+import io
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from planner import MealPlanner, load_dishes_from_csv
+from validator import validate_plan
+from html_reporter import generate_html_report, generate_mobile_report, generate_mobile_shopping_list, generate_print_html
+from synthetic_catalog import generate_catalog, save_catalog_csv, horizon
+
+QUICK_SIZES = [30, 300, 3000]
+QUICK_HORIZONS = [7, 28, 365]
+FULL_SIZES = [30, 300, 3000, 30000]
+FULL_HORIZONS = [7, 28, 365, 3650]
+
+CALLS = 200  # calls per measurement for the per-call cases
+MIN_SAMPLE = 0.05   # seconds: each timed sample loops a case at least this long
+TIME_FLOOR = 0.001  # seconds: per-run slowdowns below this are timer noise, never a regression
+NOISE_SIGMAS = 3    # ... as are slowdowns within this many standard errors (time_noise)
+
+
+def calibrate(fn):
+    """Runs of fn per timed sample, so one sample takes at least MIN_SAMPLE (like timeit.autorange)."""
+    number = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - t0
+        if elapsed >= MIN_SAMPLE:
+            return number
+        number *= 2 if elapsed * 2 >= MIN_SAMPLE else max(2, int(MIN_SAMPLE / max(elapsed, 1e-6)))
+
+
+def sample(fn, number):
+    # Wall time of one run, averaged over `number` runs; like timeit, without
+    # collector pauses that depend on what earlier cases left on the heap
+    gc.collect()
+    gc.disable()
+    try:
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        return (time.perf_counter() - t0) / number
+    finally:
+        gc.enable()
+
+
+def peak_memory(fn):
+    """Peak traced memory (KiB) of one run."""
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024
+
+
+def build_cases(sizes, horizons, workdir, seed=0):
+    """
+    Yields (case name, units, unit count, fn). The key of a case in the baseline
+    is its name, e.g. "generate_month_plan[dishes=300,days=365]".
+    """
+    for size in sizes:
+        dishes = generate_catalog(size, seed=seed)
+        csv_path = os.path.join(workdir, f"dishes_{size}.csv")
+        with contextlib.redirect_stdout(io.StringIO()):
+            save_catalog_csv(dishes, csv_path)
+        planner = MealPlanner(dishes)
+        start_date = horizon('week')[0]
+
+        yield (f"load_dishes_from_csv[dishes={size}]", 'dishes', size,
+               lambda p=csv_path: load_dishes_from_csv(p))
+
+        def dinners(planner=planner):
+            for i in range(CALLS):
+                planner.generate_dinner('Rice', i % 2 == 0, set(), 0)
+        yield (f"generate_dinner[dishes={size}]", 'calls', CALLS, dinners)
+
+        def staples(planner=planner):
+            planner.last_noodle_date = None
+            last_combo = None
+            for i in range(CALLS):
+                d = start_date + datetime.timedelta(days=i)
+                s = planner.get_daily_staple(d, i % 5 < 3, last_combo)
+                if 'Combo' in s:
+                    last_combo = d
+        yield (f"get_daily_staple[dishes={size}]", 'calls', CALLS, staples)
+
+        for days in horizons:
+            tag = f"dishes={size},days={days}"
+            plan = planner.generate_month_plan(days=days, start_date=start_date)
+            shopping = planner.aggregate_ingredients(plan)
+            # Correctness oracle: timings of a planner that breaks the rules don't count
+            report = validate_plan(plan, dishes)
+            if not report.ok:
+                print(f"Error: plan for {tag} breaks the planning rules.\n{report.summary()}")
+                sys.exit(1)
+
+            yield (f"generate_month_plan[{tag}]", 'days', days,
+                   lambda planner=planner, days=days: planner.generate_month_plan(days=days, start_date=start_date))
+            yield (f"validate_plan[{tag}]", 'days', days,
+                   lambda plan=plan: validate_plan(plan, dishes))
+            yield (f"aggregate_ingredients[{tag}]", 'days', days,
+                   lambda planner=planner, plan=plan: planner.aggregate_ingredients(plan))
+
+            out = lambda name: os.path.join(workdir, name)
+            yield (f"generate_html_report[{tag}]", 'days', days,
+                   lambda plan=plan, shopping=shopping: generate_html_report(plan, shopping, out("report.html"), open_browser=False))
+            yield (f"generate_mobile_report[{tag}]", 'days', days,
+                   lambda plan=plan, shopping=shopping: generate_mobile_report(plan, shopping, out("mobile.html")))
+            yield (f"generate_mobile_shopping_list[{tag}]", 'days', days,
+                   lambda shopping=shopping: generate_mobile_shopping_list(shopping, out("shop.html")))
+            yield (f"generate_print_html[{tag}]", 'days', days,
+                   lambda plan=plan: generate_print_html(plan, out("a4.html")))
+
+
+def run(sizes, horizons, repeat=9, memory=True, seed=0, pattern=None):
+    """Median of `repeat` samples per case; samples are taken round-robin over the cases."""
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        cases = [case for case in build_cases(sizes, horizons, workdir, seed) if not pattern or pattern in case[0]]
+        # Reporters and loaders print progress; keep the table readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            numbers = []
+            for name, units, count, fn in cases:
+                random.seed(seed)
+                numbers.append(calibrate(fn))
+            # One sample of every case per round: a slow spell of a shared machine
+            # lands on all cases alike instead of on the few measured during it
+            samples = [[] for _ in cases]
+            for _ in range(repeat):
+                for (name, units, count, fn), number, times in zip(cases, numbers, samples):
+                    random.seed(seed)
+                    times.append(sample(fn, number))
+            peaks = [peak_memory(fn) if memory else None for name, units, count, fn in cases]
+
+        for (name, units, count, fn), times, peak_kb in zip(cases, samples, peaks):
+            seconds = statistics.median(times)
+            q1, _, q3 = statistics.quantiles(times, n=4) if len(times) > 1 else (seconds, None, seconds)
+            results[name] = {
+                'seconds': seconds,
+                'spread_s': q3 - q1,  # interquartile range of the samples
+                'samples': len(times),
+                'throughput': count / seconds if seconds > 0 else float('inf'),
+                'units': units,
+                'peak_kb': peak_kb,
+            }
+            peak = f"{peak_kb:10.0f} KiB" if peak_kb is not None else "         -"
+            print(f"{name:60s} {seconds * 1000:10.2f} ms {results[name]['throughput']:12.0f} {units}/s {peak}")
+    return results
+
+
+def time_noise(r, base):
+    # NOISE_SIGMAS standard errors of the difference of the two medians; the standard
+    # error of a median is about 0.93 * IQR / sqrt(samples). Quiet machines get a tight
+    # gate, shared ones (short slow spells of 1.5x and more) a looser one
+    se = [0.93 * x.get('spread_s', 0) / math.sqrt(x.get('samples', 1)) for x in (r, base)]
+    return NOISE_SIGMAS * math.hypot(*se)
+
+
+def compare(results, baseline, tolerance):
+    """Regressions: time or peak memory over baseline * (1 + tolerance) and past its noise floor."""
+    regressions = []
+    for name, r in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        # Like memory below, small differences are noise: under a millisecond on tiny
+        # cases, or within what the sample spread of the two runs explains
+        if (r['seconds'] > base['seconds'] * (1 + tolerance)
+                and r['seconds'] - base['seconds'] > max(TIME_FLOOR, time_noise(r, base))):
+            regressions.append(f"{name}: {r['seconds'] * 1000:.2f} ms vs baseline {base['seconds'] * 1000:.2f} ms")
+        # Ignore a few KiB of allocator noise on tiny cases
+        if (r.get('peak_kb') and base.get('peak_kb') and r['peak_kb'] > base['peak_kb'] * (1 + tolerance)
+                and r['peak_kb'] - base['peak_kb'] > 64):
+            regressions.append(f"{name}: peak {r['peak_kb']:.0f} KiB vs baseline {base['peak_kb']:.0f} KiB")
+    return regressions
+
+
+def parse_ints(text):
+    return [int(x) for x in text.split(',') if x.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark planner, aggregation and reporters")
+    parser.add_argument('--full', action='store_true', help='Full matrix: up to 30k dishes and 10-year horizons (slow)')
+    parser.add_argument('--sizes', type=str, default=None, help='Catalog sizes, comma-separated (overrides --full)')
+    parser.add_argument('--horizons', type=str, default=None, help='Horizons in days, comma-separated (overrides --full)')
+    parser.add_argument('--filter', '-k', type=str, default=None, help='Only run cases whose name contains this text')
+    parser.add_argument('--repeat', type=int, default=9, help='Timed samples per case (the median is kept)')
+    parser.add_argument('--no-memory', action='store_true', help='Skip the extra peak-memory run')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for catalogs and planning')
+    parser.add_argument('--baseline', type=str, default='benchmark_baseline.json', help='Baseline file to compare against')
+    parser.add_argument('--save-baseline', action='store_true', help='Store these results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed slowdown before failing (default: 0.25 = 25%%)')
+    parser.add_argument('--json', type=str, default=None, help='Also write the results to this JSON file')
+    args = parser.parse_args()
+
+    sizes = parse_ints(args.sizes) if args.sizes else (FULL_SIZES if args.full else QUICK_SIZES)
+    horizons = parse_ints(args.horizons) if args.horizons else (FULL_HORIZONS if args.full else QUICK_HORIZONS)
+
+    if not args.save_baseline and not os.path.exists(args.baseline):
+        # Nothing to compare against is a failure, not a pass
+        print(f"Error: No baseline at {args.baseline}; run with --save-baseline to record one.")
+        sys.exit(1)
+
+    results = run(sizes, horizons, repeat=args.repeat, memory=not args.no_memory,
+                  seed=args.seed, pattern=args.filter)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\nREGRESSION ({len(regressions)} over {args.tolerance:.0%} tolerance):")
+        for line in regressions:
+            print(f" - {line}")
+        sys.exit(1)
+    print(f"\nNo regressions against {args.baseline}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+Up-front feasibility check of a catalog against the planning rules.
+
+Runs before any sampling: from the dish counts per category and meat type,
+the weekly egg days, the weekly fish cap and the monthly staple limits it works
+out, week by week, whether every dinner of the horizon can be filled.
+
+    python feasibility.py -i dishes.csv --days 365 --start-date 2026-01-05
+
+Errors mean some dinners are guaranteed to come out short (fewer side dishes
+than the staple needs); warnings mean a rule will be bent (e.g. an egg day
+without an egg dish, filled from Other/Protein instead).
+Exits 1 when there are errors.
+"""
+import argparse
+import datetime
+import sys
+from collections import Counter
+
+from planner import MealPlanner, load_dishes_from_csv, taiwan_holidays_2026
+
+SIDE_CATEGORIES = ['Vegetable', 'Egg', 'Protein', 'Other']
+
+
+class FeasibilityReport:
+    def __init__(self):
+        self.errors = []   # (weeks, message)
+        self.warnings = [] # (weeks, message)
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def _add(self, issues, week, message):
+        # The same shortage usually repeats every full week: list it once with its weeks
+        for weeks, msg in issues:
+            if msg == message:
+                weeks.append(week)
+                return
+        issues.append(([week], message))
+
+    def summary(self):
+        if not self.errors and not self.warnings:
+            return "Feasibility: OK, the catalog can fill every dinner of the horizon."
+        lines = []
+        for label, issues in (('ERROR', self.errors), ('WARNING', self.warnings)):
+            for weeks, message in issues:
+                lines.append(f"{label}: {message} [{format_weeks(weeks)}]")
+        return "\n".join(lines)
+
+
+def format_weeks(weeks):
+    if not weeks or weeks == [None]:
+        return "whole horizon"
+    if len(weeks) <= 4:
+        return ", ".join(weeks)
+    return f"{weeks[0]} .. {weeks[-1]}, {len(weeks)} weeks"
+
+
+def catalog_counts(dishes):
+    """(category -> non-fish dish count, category -> fish dish count), names deduplicated."""
+    plain = Counter()
+    fish = Counter()
+    seen = set()
+    for d in dishes:
+        if (d.name, d.category) in seen:
+            continue
+        seen.add((d.name, d.category))
+        if d.meat_type == 'Fish':
+            fish[d.category] += 1
+        else:
+            plain[d.category] += 1
+    return plain, fish
+
+
+def working_days_by_week(start_date, days, holidays=None):
+    """ISO week label -> number of planned weekdays (Mon-Fri, not a holiday) in the horizon."""
+    if holidays is None:
+        holidays = taiwan_holidays_2026()
+    weeks = {}
+    for i in range(days):
+        d = start_date + datetime.timedelta(days=i)
+        year, week, weekday = d.isocalendar()
+        label = f"{year}-W{week:02d}"
+        weeks.setdefault(label, 0)
+        if weekday <= 5 and d not in holidays:
+            weeks[label] += 1
+    return weeks
+
+
+def combos_per_week(planner_cls=MealPlanner):
+    # Most combo days Mon..Fri can hold under the combo spacing (2 with COMBO_GAP 3)
+    return -(-5 // max(1, planner_cls.COMBO_GAP))
+
+
+def check_week(plain, fish, n_days, has_combos=True, planner_cls=MealPlanner, lunch=False):
+    """
+    Returns (errors, warnings) for one ISO week with n_days planned weekdays.
+    Every dinner takes 1 Vegetable, 1 Egg on egg days and Protein/Other for the
+    rest: 4 sides on a normal staple day, 2 on a combo day (egg days only, at
+    most 2 a week given the combo spacing). In lunch mode every day also takes
+    a lunch of LUNCH_SIDES sides (1 Vegetable, 1 Protein, Other). Short even
+    with the most combo days is an error; short in a week without combos is a warning.
+    """
+    errors, warnings = [], []
+    if n_days == 0:
+        return errors, warnings
+
+    fish_cap = planner_cls.WEEKLY_FISH_LIMIT
+    egg_days = planner_cls.EGG_DAYS_PER_WEEK
+    max_egg = min(egg_days, n_days)
+    min_egg = max(0, egg_days - (5 - n_days)) # holidays may take the egg days
+    max_combos = min(combos_per_week(planner_cls), max_egg) if has_combos else 0
+    meals = 2 if lunch else 1
+    lunch_sides = planner_cls.LUNCH_SIDES * n_days if lunch else 0
+
+    def shortfall(sides, egg_slots):
+        # Weekly no-repeat: each dish counts once a week, fish at most fish_cap times in total
+        fish_left = fish_cap
+        def usable(cats, need):
+            nonlocal fish_left
+            n_plain = sum(plain[c] for c in cats)
+            n_fish = min(sum(fish[c] for c in cats), fish_left, max(0, need - n_plain))
+            fish_left -= n_fish
+            return min(need, n_plain + n_fish)
+        veg = usable(['Vegetable'], n_days * meals)
+        egg = usable(['Egg'], egg_slots)
+        # Protein and Other take the rest, including Vegetable/Egg slots left empty
+        filler = usable(['Protein', 'Other'], sides - veg - egg)
+        return sides - veg - egg - filler, (veg, egg, filler)
+
+    best, usable_counts = min(shortfall(4 * n_days - 2 * max_combos + lunch_sides, e) for e in (min_egg, max_egg))
+    worst, _ = max(shortfall(4 * n_days + lunch_sides, e) for e in (min_egg, max_egg))
+    veg, egg, filler = usable_counts
+    if best > 0:
+        errors.append(f"{best} side dish(es) short in every {n_days}-day week: the catalog has only "
+                      f"{veg} Vegetable + {egg} Egg + {filler} Protein/Other usable "
+                      f"(weekly no-repeat, fish cap {fish_cap})")
+    elif worst > 0:
+        warnings.append(f"up to {worst} side dish(es) short in a {n_days}-day week without combo days "
+                        f"(weekly no-repeat, fish cap {fish_cap})")
+
+    # Category shortfalls the fillers cover by bending the meal structure
+    for cat, need in (('Vegetable', n_days * meals), ('Egg', max_egg), ('Protein', n_days * meals)):
+        have = plain[cat] + min(fish[cat], fish_cap)
+        if have < need:
+            warnings.append(f"only {have} usable {cat} dish(es) for {need} {cat}-slots in a {n_days}-day week; "
+                            f"{need - have} meal(s) get a filler instead")
+    if fish['Protein'] and not plain['Protein'] and n_days > fish_cap:
+        warnings.append(f"all Protein dishes are fish: at most {fish_cap} protein days a week")
+    return errors, warnings
+
+
+def check_staples(dishes, days, planner_cls=MealPlanner, start_date=None):
+    """Warnings for the staple categories and monthly limits over the whole horizon."""
+    warnings = []
+    # MONTHLY_LIMITS apply per calendar month: each month the horizon touches adds capacity
+    if start_date is not None:
+        end_date = start_date + datetime.timedelta(days=max(days - 1, 0))
+        months = (end_date.year - start_date.year) * 12 + end_date.month - start_date.month + 1
+    else:
+        months = days // 28 + 1
+    limits = planner_cls.MONTHLY_LIMITS
+    by_cat = {}
+    for d in dishes:
+        by_cat.setdefault(d.category, []).append(d)
+
+    if not by_cat.get('Rice'):
+        warnings.append("no 'Rice' dishes: normal staple days show the bare category name")
+
+    for cat in ('Combo (Rice)', 'Combo (Noodle)'):
+        options = by_cat.get(cat, [])
+        if not options:
+            if by_cat.get('Rice'):
+                warnings.append(f"no '{cat}' dishes: every {cat} day falls back to a Rice dish (with Rice-day sides)")
+            else:
+                warnings.append(f"no '{cat}' dishes: {cat} days show the bare category name (with combo sides)")
+            continue
+        capacity = 0
+        for d in options:
+            lim = next((lim for key, lim in limits.items() if key in d.name), None)
+            if lim is None:
+                capacity = None # unlimited
+                break
+            capacity += lim * months
+        # Noodles at most every NOODLE_GAP days; combos at most every COMBO_GAP days (egg days only)
+        if 'Noodle' in cat:
+            demand = days // planner_cls.NOODLE_GAP + 1
+        else:
+            demand = (days // 7 + 1) * min(combos_per_week(planner_cls), planner_cls.EGG_DAYS_PER_WEEK)
+        if capacity is not None and capacity < demand:
+            warnings.append(f"'{cat}' has only {capacity} serving(s) under MONTHLY_LIMITS for up to {demand} "
+                            f"{cat} day(s); later ones fall back to 白飯 (more Protein/Other needed)")
+    return warnings
+
+
+def check_feasibility(dishes, days=28, start_date=None, planner_cls=MealPlanner, lunch=False):
+    """
+    Returns a FeasibilityReport for planning `days` days from start_date with
+    this catalog (lunch: lunch mode, a lunch next to every dinner).
+    """
+    if start_date is None:
+        start_date = datetime.date.today()
+    report = FeasibilityReport()
+    plain, fish = catalog_counts(dishes)
+    has_combos = bool(plain['Combo (Rice)'] + fish['Combo (Rice)'] + plain['Combo (Noodle)'] + fish['Combo (Noodle)'])
+
+    for cat in SIDE_CATEGORIES:
+        if not plain[cat] and not fish[cat]:
+            report._add(report.warnings, None, f"no '{cat}' dishes in the catalog")
+
+    results = {} # n_days -> (errors, warnings); the catalog is the same every week
+    for label, n_days in working_days_by_week(start_date, days).items():
+        if n_days not in results:
+            results[n_days] = check_week(plain, fish, n_days, has_combos, planner_cls, lunch)
+        errors, warnings = results[n_days]
+        for msg in errors:
+            report._add(report.errors, label, msg)
+        for msg in warnings:
+            report._add(report.warnings, label, msg)
+
+    for msg in check_staples(dishes, days, planner_cls, start_date):
+        report._add(report.warnings, None, msg)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check whether a catalog can satisfy the planning rules")
+    parser.add_argument('--input', '-i', default='dishes.csv', help='Path to the dishes CSV (or .db) file')
+    parser.add_argument('--days', '-d', type=int, default=28, help='Number of days to plan (default: 28)')
+    parser.add_argument('--start-date', type=str, default=None, help='Start date in YYYY-MM-DD format (default: today)')
+    parser.add_argument('--lunch', action='store_true', help='Check lunch mode (a lunch next to every dinner)')
+    args = parser.parse_args()
+
+    start_date = None
+    if args.start_date:
+        try:
+            start_date = datetime.datetime.strptime(args.start_date, "%Y-%m-%d").date()
+        except ValueError:
+            print("Error: Invalid date format. Please use YYYY-MM-DD.")
+            sys.exit(1)
+
+    dishes = load_dishes_from_csv(args.input)
+    if not dishes:
+        print("Error: No dishes loadable from file. Check format.")
+        sys.exit(1)
+
+    report = check_feasibility(dishes, args.days, start_date, lunch=args.lunch)
+    print(report.summary())
+    if not report.ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Persistent history of served meals, built from past meal_plan.csv outputs.
+
+The store is indexed by date (date -> staple and dishes) and by dish
+(dish -> sorted served dates), so the planner can seed its constraint state
+for a new horizon with a handful of O(1) lookups. Source files are tracked by
+mtime and size: only new or changed plans are read on each run.
+"""
+import argparse
+import bisect
+import datetime
+import json
+import os
+from collections import defaultdict
+
+from planner import iter_table_rows
+
+
+class HistoryStore:
+    def __init__(self, path=None):
+        self.path = path
+        self.by_date = {}                 # date -> (staple, tuple of dish names)
+        self.by_dish = defaultdict(list)  # dish name -> sorted list of dates
+        self.sources = {}                 # abs path -> [mtime, size]
+
+    @classmethod
+    def load(cls, path):
+        store = cls(path)
+        if not os.path.exists(path):
+            return store
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        store.sources = data.get('sources', {})
+        for date_str, (staple, dishes) in data.get('days', {}).items():
+            store._set_day(datetime.date.fromisoformat(date_str), staple, dishes)
+        return store
+
+    def save(self, path=None):
+        path = path or self.path
+        data = {
+            'sources': self.sources,
+            'days': {d.isoformat(): [staple, list(dishes)]
+                     for d, (staple, dishes) in sorted(self.by_date.items())}
+        }
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def _set_day(self, date, staple, dishes):
+        # Later plans overwrite earlier ones for the same date (e.g. after a re-plan)
+        old = self.by_date.get(date)
+        if old:
+            for name in old[1]:
+                dates = self.by_dish.get(name)
+                if dates:
+                    i = bisect.bisect_left(dates, date)
+                    if i < len(dates) and dates[i] == date:
+                        del dates[i]
+        dishes = tuple(dishes)
+        if not staple and not dishes:
+            self.by_date.pop(date, None)
+            return
+        self.by_date[date] = (staple, dishes)
+        for name in dishes:
+            bisect.insort(self.by_dish[name], date)
+
+    def add_plan(self, plan):
+        # In-memory plan (list of DayPlans from generate_month_plan)
+        for day in plan:
+            staple = day.staple if day.staple != 'Holiday' else ''
+            self._set_day(day.date, staple, day.dinner_names + day.lunch_names)
+
+    def ingest_plan_file(self, filepath, force=False):
+        """
+        Adds a meal_plan.csv to the store. Returns False if the file is unchanged
+        since it was last ingested.
+        """
+        key = os.path.abspath(filepath)
+        st = os.stat(filepath)
+        stamp = [st.st_mtime, st.st_size]
+        if not force and self.sources.get(key) == stamp:
+            return False
+
+        for row in iter_table_rows(filepath):
+            if not row.get('Date'):
+                continue
+            staple = row.get('Staple') or ''
+            if staple == 'Holiday':
+                staple = ''
+            dishes = [v for c, v in row.items() if c.startswith(('Dish ', 'Lunch ')) and v]
+            self._set_day(datetime.date.fromisoformat(row['Date']), staple, dishes)
+
+        self.sources[key] = stamp
+        return True
+
+    def served_on(self, date):
+        """(staple, dishes) served on a date, or None. O(1)."""
+        return self.by_date.get(date)
+
+    def last_served(self, dish_name, before):
+        """Most recent date strictly before `before` on which the dish was served."""
+        dates = self.by_dish.get(dish_name)
+        if not dates:
+            return None
+        i = bisect.bisect_left(dates, before)
+        return dates[i - 1] if i > 0 else None
+
+    def serve_count(self, dish_name, start=None, end=None):
+        """How often a dish was served in [start, end]."""
+        dates = self.by_dish.get(dish_name, [])
+        lo = bisect.bisect_left(dates, start) if start else 0
+        hi = bisect.bisect_right(dates, end) if end else len(dates)
+        return max(0, hi - lo)
+
+
+def main():
+    from shopping_aggregator import iter_plan_files
+
+    parser = argparse.ArgumentParser(description="Build or update the meal history store from past plans")
+    parser.add_argument('store', help='History store file (JSON), created if missing')
+    parser.add_argument('plans', nargs='+', help='Plan CSV files or batch output directories')
+    args = parser.parse_args()
+
+    store = HistoryStore.load(args.store)
+    read = 0
+    for filepath in iter_plan_files(args.plans):
+        if store.ingest_plan_file(filepath):
+            read += 1
+    store.save()
+    print(f"History store {args.store}: {read} plan files read, {len(store.by_date)} days indexed.")
+
+
+if __name__ == "__main__":
+    main()
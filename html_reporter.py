@@ -2,10 +2,77 @@ import os
 import webbrowser
 import datetime
 
-def generate_html_report(plan, shopping_lists, output_file="meal_plan_report.html"):
+from planner import emit
+
+def meals_label(plan):
+    # "Lunch & Dinner" for plans made in lunch mode
+    return "Lunch & Dinner" if any(day.lunch for day in plan) else "Dinner"
+
+def meal_blocks(day):
+    # Desktop day card: one titled block per meal when the day has a lunch
+    def block(dishes, title=''):
+        tags = ''.join(f'<div class="dish-tag dish-{d.category}">{d.name}</div>' for d in dishes)
+        title_html = f'<div class="meal-title">{title}</div>' if title else ''
+        return f'<div class="meal-block">{title_html}<div class="dish-list">{tags}</div></div>'
+    if not day.lunch:
+        return block(day.dinner)
+    return block(day.lunch, 'Lunch') + block(day.dinner, 'Dinner')
+
+def meal_lists(day):
+    # Mobile day card, labelled the same way
+    def items(dishes):
+        return ''.join(f'<div class="dish-item dish-{d.category}">{d.name}</div>' for d in dishes)
+    if not day.lunch:
+        return f'<div class="dish-list">{items(day.dinner)}</div>'
+    return (f'<div class="meal-label">Lunch</div><div class="dish-list">{items(day.lunch)}</div>'
+            f'<div class="meal-label">Dinner</div><div class="dish-list">{items(day.dinner)}</div>')
+
+def totals_line(totals, key):
+    # Attribute totals of a day (by date) or shopping week, from MealPlanner.plan_totals
+    if not totals:
+        return ''
+    from attributes import format_totals
+    days, weeks = totals
+    values = weeks.get(key) if isinstance(key, int) else days.get(key)
+    return f'<div class="totals">{format_totals(values)}</div>' if values else ''
+
+def analytics_section(analytics, top=10):
+    # Analytics tab (analytics.PlanAnalytics): headline numbers, shares, top dishes, weekly balance
+    s = analytics.summary
+    t = analytics.tables
+    def card(title, items):
+        rows = ''.join(f'<li class="shop-item"><span>{k}</span> <span class="shop-count">{v}</span></li>'
+                       for k, v in items)
+        return f'<div class="shop-week"><h3>{title}</h3><ul class="shop-list">{rows}</ul></div>'
+    gap = s['mean_repeat_gap_days']
+    parts = [card('Overview', [
+        ('Planned days', s['planned_days']),
+        ('Dishes served', s['dishes_served']),
+        ('Distinct dishes', f"{s['distinct_dishes']} ({s['catalog_coverage']:.0%} of catalog)"),
+        ('Mean repeat distance', f"{gap:.1f} days" if gap is not None else '-'),
+        ('Ingredients per shopping week', f"{s['mean_weekly_ingredients']:.1f}"),
+    ])]
+    parts.append(card('Staple mix', [(r.staple, f"{r.days} ({r.share:.0%})") for r in t['staple_mix'].head(top).itertuples()]))
+    parts.append(card('Categories', [(k, f"{v:.0%}") for k, v in s['category_share'].items()]))
+    if s['meat_share']:
+        parts.append(card('Meat types', [(k, f"{v:.0%}") for k, v in s['meat_share'].items()]))
+    parts.append(card(f'Most served (top {top})', [(r.dish, f"x{r.served}") for r in t['dish_frequency'].head(top).itertuples()]))
+
+    weekly = t['weekly_categories']
+    if len(weekly):
+        cols = [c for c in weekly.columns if c not in ('plan', 'week')]
+        head = ''.join(f'<th>{c}</th>' for c in ['Week'] + cols)
+        body = ''.join('<tr>' + f'<td>{row["week"]}</td>' + ''.join(f'<td>{row[c]}</td>' for c in cols) + '</tr>'
+                       for _, row in weekly.iterrows())
+        parts.append(f'<div class="shop-week"><h3>Weekly balance</h3>'
+                     f'<table class="analytics-table"><tr>{head}</tr>{body}</table></div>')
+    return ''.join(parts)
+
+def render_html_report(plan, shopping_lists, analytics=None, totals=None):
     """
-    Generates a premium-looking HTML report for the meal plan.
-    Uses a Calendar Layout (Sun-Sat).
+    Premium-looking HTML report for the meal plan, as a string.
+    Uses a Calendar Layout (Sun-Sat). With analytics (analytics.analyze_plan)
+    an Analytics tab is added.
     """
     
     # Pre-process plan into weeks for calendar grid
@@ -20,7 +87,7 @@ def generate_html_report(plan, shopping_lists, output_file="meal_plan_report.htm
     calendar_days = []
     
     if plan:
-        first_date = plan[0]['Date']
+        first_date = plan[0].date
         # weekday(): Mon=0, Sun=6.
         # We want Sun to be index 0 in our grid.
         # Python: Mon(0) -> 1, Tue(1) -> 2 ... Sat(5)->6, Sun(6)->0
@@ -256,6 +323,11 @@ def generate_html_report(plan, shopping_lists, output_file="meal_plan_report.htm
         border-bottom: 1px solid var(--border);
         padding-bottom: 10px;
     }
+    .totals {
+        color: var(--text-muted);
+        font-size: 0.85rem;
+        margin-top: 8px;
+    }
     .shop-list {
         display: grid;
         grid-template-columns: repeat(auto-fill, minmax(200px, 1fr));
@@ -278,6 +350,18 @@ def generate_html_report(plan, shopping_lists, output_file="meal_plan_report.htm
         padding: 2px 8px;
         border-radius: 10px;
     }
+    .analytics-table {
+        width: 100%;
+        border-collapse: collapse;
+        text-align: center;
+    }
+    .analytics-table th, .analytics-table td {
+        padding: 6px 10px;
+        border-bottom: 1px solid var(--border);
+    }
+    .analytics-table th {
+        color: var(--accent);
+    }
 
     .category-legend {
         text-align: center;
@@ -307,6 +391,9 @@ def generate_html_report(plan, shopping_lists, output_file="meal_plan_report.htm
     """
     
     # HTML Builder
+    meals = meals_label(plan)
+    schedule_label = "Lunch & Dinner" if meals != "Dinner" else "Dinner Only"
+    analytics_tab = '\n                <button class="tab-btn" onclick="openTab(\'analytics\')">Analytics</button>' if analytics else ''
     html_content = [f"""
     <!DOCTYPE html>
     <html lang="en">
@@ -320,13 +407,13 @@ def generate_html_report(plan, shopping_lists, output_file="meal_plan_report.htm
         <div class="container">
             <header>
                 <h1>Monthly Meal Calendar</h1>
-                <p class="subtitle">Weekly Dinner Plan (Mon-Fri) & Shopping Assistant</p>
+                <p class="subtitle">Weekly {meals} Plan (Mon-Fri) & Shopping Assistant</p>
             </header>
 
             <div class="rules-container">
                 <h3>🍱 Planning Rules</h3>
                 <ul>
-                    <li><strong>Schedule:</strong> Dinner Only (Mon-Fri). Weekends excluded.</li>
+                    <li><strong>Schedule:</strong> {schedule_label} (Mon-Fri). Weekends excluded.</li>
                     <li><strong>Egg Days (3/week):</strong> 1 Protein + 1 Veg + 1 Egg.</li>
                     <li><strong>Non-Egg Days (2/week):</strong> 1 Protein + 1 Veg + 2 Other (Requires Rice/Noodle).</li>
                     <li><strong>Staples:</strong> Rice/Noodle/Combo. Noodle max once every 14 days.</li>
@@ -337,7 +424,7 @@ def generate_html_report(plan, shopping_lists, output_file="meal_plan_report.htm
             
             <div class="tabs">
                 <button class="tab-btn active" onclick="openTab('plan')">Calendar View</button>
-                <button class="tab-btn" onclick="openTab('shop')">Shopping List</button>
+                <button class="tab-btn" onclick="openTab('shop')">Shopping List</button>{analytics_tab}
             </div>
             
             <div id="plan" class="tab-content active">
@@ -357,10 +444,10 @@ def generate_html_report(plan, shopping_lists, output_file="meal_plan_report.htm
             # Empty / Padding Day (for start of month alignment)
             html_content.append('<div class="day-card empty"></div>')
         else:
-            date_obj = day['Date']
+            date_obj = day.date
             date_str = date_obj.strftime("%m/%d")
-            is_weekend = len(day['Dinner_Objects']) == 0
-            is_holiday = day.get('Staple') == 'Holiday'
+            is_weekend = len(day.dinner) == 0
+            is_holiday = day.staple == 'Holiday'
             
             if is_weekend or is_holiday:
                  card_class = "weekend" if is_weekend and not is_holiday else "holiday"
@@ -369,31 +456,27 @@ def generate_html_report(plan, shopping_lists, output_file="meal_plan_report.htm
                 <div class="day-card {card_class}">
                     <div class="date-header">
                         <span class="date-num">{date_str}</span>
-                        <span class="date-weekday">{day['Weekday']}</span>
+                        <span class="date-weekday">{day.weekday}</span>
                     </div>
                     <div class="{card_class}-content">{message}</div>
                 </div>
                 """)
             else:
-                staple_info = day.get('Staple', '')
+                staple_info = day.staple
                 html_content.append(f"""
                 <div class="day-card">
                     <div class="date-header">
                         <div class="date-info">
                             <span class="date-num">{date_str}</span>
-                            <span class="date-weekday">{day['Weekday']}</span>
+                            <span class="date-weekday">{day.weekday}</span>
                         </div>
                     </div>
                     <div class="staple-row">
                         <div class="staple-badge">{staple_info}</div>
                     </div>
                     
-                    <div class="meal-block">
-                        <!-- <div class="meal-title">Dinner</div> -->
-                        <div class="dish-list">
-                        {''.join([f'<div class="dish-tag dish-{d.category}">{d.name}</div>' for d in day['Dinner_Objects']])}
-                        </div>
-                    </div>
+                    {meal_blocks(day)}
+                    {totals_line(totals, day.date)}
                 </div>
                 """)
             
@@ -409,6 +492,7 @@ def generate_html_report(plan, shopping_lists, output_file="meal_plan_report.htm
         html_content.append(f"""
             <div class="shop-week">
                 <h3>Week {week}</h3>
+                {totals_line(totals, week)}
                 <ul class="shop-list">
         """)
         for ing, count in sorted(counter.items()):
@@ -421,6 +505,10 @@ def generate_html_report(plan, shopping_lists, output_file="meal_plan_report.htm
         
     html_content.append("""
             </div>
+    """)
+    if analytics:
+        html_content.append(f'<div id="analytics" class="tab-content">{analytics_section(analytics)}</div>')
+    html_content.append("""
         </div>
         
         <script>
@@ -435,20 +523,28 @@ def generate_html_report(plan, shopping_lists, output_file="meal_plan_report.htm
     </html>
     """)
     
-    full_html = "".join(html_content)
-    
+    return "".join(html_content)
+
+def generate_html_report(plan, shopping_lists, output_file="meal_plan_report.html", open_browser=True, analytics=None,
+                         totals=None):
+    """
+    Writes render_html_report to output_file and opens it in the browser.
+    """
+    full_html = render_html_report(plan, shopping_lists, analytics, totals)
     try:
         with open(output_file, "w", encoding="utf-8") as f:
             f.write(full_html)
         print(f"HTML Report generated: {output_file}")
-        webbrowser.open(f'file://{os.path.abspath(output_file)}')
+        emit('file_written', path=output_file, kind='report')
+        if open_browser:
+            webbrowser.open(f'file://{os.path.abspath(output_file)}')
         
     except Exception as e:
         print(f"Error generating HTML: {e}")
 
-def generate_mobile_report(plan, shopping_list, output_file="meal_plan_mobile.html"):
+def render_mobile_report(plan, shopping_list, totals=None):
     """
-    Generates a mobile-optimized HTML report (Vertical List).
+    Mobile-optimized HTML report (Vertical List), as a string.
     """
     import datetime
     
@@ -549,6 +645,13 @@ def generate_mobile_report(plan, shopping_list, output_file="meal_plan_mobile.ht
         flex-direction: column;
         gap: 12px;
     }
+    .meal-label {
+        font-size: 0.75rem;
+        font-weight: 700;
+        text-transform: uppercase;
+        color: var(--accent);
+        margin: 8px 0 -4px;
+    }
     .dish-item {
         background: rgba(255,255,255,0.03);
         padding: 12px;
@@ -566,6 +669,11 @@ def generate_mobile_report(plan, shopping_list, output_file="meal_plan_mobile.ht
         color: var(--text-muted);
         font-style: italic;
     }
+    .totals {
+        color: var(--text-muted);
+        font-size: 0.85rem;
+        margin-top: 10px;
+    }
     
     .fab-btn {
         position: fixed;
@@ -611,16 +719,16 @@ def generate_mobile_report(plan, shopping_list, output_file="meal_plan_mobile.ht
         <div id="plan-view">
             <div class="header">
                 <h1>📅 Meal Plan</h1>
-                <p class="subtitle">Dinner Menu (Mon-Fri)</p>
+                <p class="subtitle">{meals_label(plan)} Menu (Mon-Fri)</p>
             </div>
     """]
     
     # Generate Day Cards
     for day in plan:
-        date_obj = day['Date']
+        date_obj = day.date
         date_str = date_obj.strftime("%m/%d")
         
-        is_weekend = len(day.get('Dinner_Objects', [])) == 0
+        is_weekend = len(day.dinner) == 0
         
         if is_weekend:
             html_content.append(f"""
@@ -628,26 +736,25 @@ def generate_mobile_report(plan, shopping_list, output_file="meal_plan_mobile.ht
                 <div class="date-row" style="margin-bottom:0; border-bottom: none;">
                     <div class="date-left">
                         <span class="date-num">{date_str}</span>
-                        <span class="date-weekday">{day['Weekday']}</span>
+                        <span class="date-weekday">{day.weekday}</span>
                     </div>
                     <span style="font-size:0.9rem; opacity:0.7">Weekend</span>
                 </div>
             </div>
             """)
         else:
-            staple = day.get('Staple', 'Rice')
+            staple = day.staple or 'Rice'
             html_content.append(f"""
             <div class="day-card">
                 <div class="date-row">
                     <div class="date-left">
                         <span class="date-num">{date_str}</span>
-                        <span class="date-weekday">{day['Weekday']}</span>
+                        <span class="date-weekday">{day.weekday}</span>
                     </div>
                     <div class="staple-pill">{staple}</div>
                 </div>
-                <div class="dish-list">
-                    {''.join([f'<div class="dish-item dish-{d.category}">{d.name}</div>' for d in day['Dinner_Objects']])}
-                </div>
+                {meal_lists(day)}
+                {totals_line(totals, day.date)}
             </div>
             """)
             
@@ -658,16 +765,24 @@ def generate_mobile_report(plan, shopping_list, output_file="meal_plan_mobile.ht
     </html>
     """)
     
+    return '\n'.join(html_content)
+
+def generate_mobile_report(plan, shopping_list, output_file="meal_plan_mobile.html", totals=None):
+    """
+    Writes render_mobile_report to output_file.
+    """
+    html = render_mobile_report(plan, shopping_list, totals)
     try:
         with open(output_file, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(html_content))
+            f.write(html)
         print(f"Mobile Report generated: {output_file}")
+        emit('file_written', path=output_file, kind='report')
     except Exception as e:
         print(f"Error generating Mobile HTML: {e}")
 
-def generate_mobile_shopping_list(shopping_list, output_file="shopping_list_mobile.html"):
+def render_mobile_shopping_list(shopping_list, totals=None):
     """
-    Generates a mobile-optimized Shopping List with checkboxes.
+    Mobile-optimized Shopping List with checkboxes, as a string.
     """
     
     css = """
@@ -776,6 +891,11 @@ def generate_mobile_shopping_list(shopping_list, output_file="shopping_list_mobi
         flex-grow: 1;
         font-size: 1.05rem;
     }
+    .totals {
+        color: var(--text-muted);
+        font-size: 0.85rem;
+        margin: -4px 0 8px;
+    }
     .item-count {
         background: rgba(255,255,255,0.1);
         padding: 2px 8px;
@@ -811,6 +931,7 @@ def generate_mobile_shopping_list(shopping_list, output_file="shopping_list_mobi
         html_content.append(f"""
         <div class="week-group">
             <h3 class="week-title">Week {week}</h3>
+            {totals_line(totals, week)}
             <ul class="shop-items">
         """)
         
@@ -830,16 +951,24 @@ def generate_mobile_shopping_list(shopping_list, output_file="shopping_list_mobi
     </html>
     """)
     
+    return '\n'.join(html_content)
+
+def generate_mobile_shopping_list(shopping_list, output_file="shopping_list_mobile.html", totals=None):
+    """
+    Writes render_mobile_shopping_list to output_file.
+    """
+    html = render_mobile_shopping_list(shopping_list, totals)
     try:
         with open(output_file, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(html_content))
+            f.write(html)
         print(f"Mobile Shopping List generated: {output_file}")
+        emit('file_written', path=output_file, kind='report')
     except Exception as e:
         print(f"Error generating Shopping List HTML: {e}")
 
-def generate_print_html(plan, output_file="meal_plan_a4.html"):
+def render_print_html(plan):
     """
-    Generates a single-page A4 Landscape HTML optimized for Print-to-PDF.
+    Single-page A4 Landscape HTML optimized for Print-to-PDF, as a string.
     Mon-Fri Only. Uses Gap property for perfect borders.
     """
     
@@ -943,6 +1072,16 @@ def generate_print_html(plan, output_file="meal_plan_a4.html"):
     .dish-Egg { background: #fef3c7; }
     .dish-Vegetable { background: #dcfce7; }
     .dish-Other { background: #f3e8ff; }
+    .meal-sep {
+        font-size: 9px;
+        font-weight: 700;
+        text-transform: uppercase;
+        color: #64748b;
+        border-top: 1px dashed #cbd5e1;
+    }
+    .meal-sep:first-child {
+        border-top: none;
+    }
     
     /* Print tweaks */
     @media print {
@@ -972,11 +1111,11 @@ def generate_print_html(plan, output_file="meal_plan_a4.html"):
     calendar_days = []
     
     # Filter Mon-Fri
-    workdays = [d for d in plan if d['Date'].weekday() < 5]
+    workdays = [d for d in plan if d.date.weekday() < 5]
 
     if workdays:
         first_day = workdays[0]
-        wd = first_day['Date'].weekday() # Mon=0
+        wd = first_day.date.weekday() # Mon=0
         
         # Padding for first week
         for _ in range(wd):
@@ -997,20 +1136,25 @@ def generate_print_html(plan, output_file="meal_plan_a4.html"):
         if day is None:
             html_content.append('<div class="day-cell" style="background:#fafafa;"></div>')
         else:
-            date_str = day['Date'].strftime("%m/%d")
+            date_str = day.date.strftime("%m/%d")
             
             cell_html = '<div class="day-cell">'
             cell_html += f'<div class="date-row"><span>{date_str}</span></div>'
             
-            staple = day.get('Staple', '')
+            staple = day.staple
             if staple == 'Holiday':
                 cell_html += f'<div class="staple" style="background: #fee2e2; color: #b91c1c;">HOLIDAY</div>'
                 cell_html += '<div class="dish-list" style="align-items: center; justify-content: center; color: #ccc;">No Meal</div>'
             else:
                 cell_html += f'<div class="staple">{staple}</div>'
                 cell_html += '<div class="dish-list">'
-                for d in day['Dinner_Objects']:
-                    cell_html += f'<div class="dish dish-{d.category}">{d.name}</div>'
+                # Lunch first, as in the desktop and mobile reports (meal_blocks / meal_lists)
+                meals = [('Lunch', day.lunch), ('Dinner', day.dinner)] if day.lunch else [('', day.dinner)]
+                for title, dishes in meals:
+                    if title:
+                        cell_html += f'<div class="meal-sep">{title}</div>'
+                    for d in dishes:
+                        cell_html += f'<div class="dish dish-{d.category}">{d.name}</div>'
                 cell_html += '</div>'
                 
             cell_html += '</div>'
@@ -1022,9 +1166,17 @@ def generate_print_html(plan, output_file="meal_plan_a4.html"):
     </html>
     """)
     
+    return '\n'.join(html_content)
+
+def generate_print_html(plan, output_file="meal_plan_a4.html"):
+    """
+    Writes render_print_html to output_file.
+    """
+    html = render_print_html(plan)
     try:
         with open(output_file, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(html_content))
+            f.write(html)
         print(f"Print Report generated: {output_file}")
+        emit('file_written', path=output_file, kind='report')
     except Exception as e:
         print(f"Error generating Print HTML: {e}")
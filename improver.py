@@ -0,0 +1,300 @@
+"""
+Simulated-annealing improver for a generated plan.
+
+Starts from a valid plan (generate_month_plan) and tries local moves on the
+dinner side dishes:
+  - replace: swap one dish for another of the same category
+  - swap:    exchange two same-category dishes between two days
+Staples, lunches, weekends and holidays are never touched. A move is only
+considered if the planning rules still hold (weekly no-repeat, weekly fish cap,
+daily meat uniqueness, incompatible pairs, the planner's attribute LIMITS) and is accepted by the Metropolis
+rule on the change in score (lower is better):
+  - repeat:      dishes served many times over the horizon (sum of n*(n-1)/2)
+  - ingredients: distinct ingredients per shopping week (shorter lists)
+  - meat_spacing: the same meat type on consecutive days
+Rules and score are kept as running counters, so a move costs O(dishes per
+day) regardless of the horizon.
+
+    python improver.py meal_plan.csv -i dishes.csv --iterations 50000
+"""
+import argparse
+import math
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+
+from planner import MealPlanner, load_dishes_from_csv, load_plan_from_csv, save_plan_to_csv
+
+DEFAULT_WEIGHTS = {
+    'repeat': 1.0,
+    'ingredients': 0.3,
+    'meat_spacing': 0.5,
+}
+
+
+class PlanImprover:
+    def __init__(self, planner, weights=None):
+        self.planner = planner
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+        self.fish_limit = planner.WEEKLY_FISH_LIMIT
+        self.pairs = planner.INCOMPATIBLE_PAIRS
+        self.random = planner.random # the planner's random stream
+        # Attribute limits (attributes.py): (attribute, 'day' or 'week', limit)
+        self.limits = [(*key.partition('/')[::2], limit) for key, limit in planner.LIMITS.items()]
+
+    @staticmethod
+    def meat(dish):
+        return dish.meat_type
+
+    # --- Bookkeeping -----------------------------------------------------
+
+    def _index(self, plan):
+        self.plan = plan
+        self.iso_week = [day.date.isocalendar()[:2] for day in plan]
+        self.shop_week = [i // 7 + 1 for i in range(len(plan))] # as in aggregate_ingredients
+        self.week_dishes = defaultdict(Counter) # iso week -> dish name counts
+        self.week_fish = Counter()              # iso week -> fish dishes
+        self.uses = Counter()                   # dish name -> uses over the horizon
+        self.week_ings = defaultdict(Counter)   # shopping week -> ingredient -> dishes using it
+        self.day_meats = []                     # day index -> Counter of meat types
+        self.day_attrs = defaultdict(Counter)   # day index -> attribute totals (with LIMITS)
+        self.week_attrs = defaultdict(Counter)  # shopping week -> attribute totals
+        if self.limits:
+            # Staples count towards the limits but are never moved
+            staples = {d.name: d for d in self.planner.dishes}
+            for i, day in enumerate(plan):
+                if day.staple in staples:
+                    self._add_attrs(i, staples[day.staple], 1)
+        for i, day in enumerate(plan):
+            meats = Counter()
+            # Lunch dishes (lunch mode) count for the rules and score but are not moved
+            for d in day.dinner + day.lunch:
+                self._add(i, d, meats)
+            self.day_meats.append(meats)
+
+    def _add(self, i, dish, meats=None):
+        self.week_dishes[self.iso_week[i]][dish.name] += 1
+        self.uses[dish.name] += 1
+        m = self.meat(dish)
+        if m == 'Fish':
+            self.week_fish[self.iso_week[i]] += 1
+        if m:
+            (meats if meats is not None else self.day_meats[i])[m] += 1
+        ings = self.week_ings[self.shop_week[i]]
+        for ing in set(dish.ingredients):
+            ings[ing] += 1
+        if self.limits:
+            self._add_attrs(i, dish, 1)
+
+    def _remove(self, i, dish):
+        self.week_dishes[self.iso_week[i]][dish.name] -= 1
+        self.uses[dish.name] -= 1
+        m = self.meat(dish)
+        if m == 'Fish':
+            self.week_fish[self.iso_week[i]] -= 1
+        if m:
+            self.day_meats[i][m] -= 1
+        ings = self.week_ings[self.shop_week[i]]
+        for ing in set(dish.ingredients):
+            ings[ing] -= 1
+            if not ings[ing]:
+                del ings[ing]
+        if self.limits:
+            self._add_attrs(i, dish, -1)
+
+    def _add_attrs(self, i, dish, sign):
+        for attr, value in dish.attrs.items():
+            self.day_attrs[i][attr] += sign * value
+            self.week_attrs[self.shop_week[i]][attr] += sign * value
+
+    # --- Score -----------------------------------------------------------
+
+    def score(self):
+        """Full score of the indexed plan (used for reporting; moves use the deltas from _replace)."""
+        w = self.weights
+        repeat = sum(n * (n - 1) / 2 for n in self.uses.values())
+        ingredients = sum(len(c) for c in self.week_ings.values())
+        spacing = 0
+        for i in range(1, len(self.plan)):
+            spacing += self._shared_meats(self.day_meats[i - 1], self.day_meats[i])
+        return w['repeat'] * repeat + w['ingredients'] * ingredients + w['meat_spacing'] * spacing
+
+    @staticmethod
+    def _shared_meats(a, b):
+        return sum(1 for m, n in a.items() if n and b.get(m))
+
+    def _spacing_around(self, i):
+        s = 0
+        if i > 0:
+            s += self._shared_meats(self.day_meats[i - 1], self.day_meats[i])
+        if i + 1 < len(self.plan):
+            s += self._shared_meats(self.day_meats[i], self.day_meats[i + 1])
+        return s
+
+    def _replace(self, i, pos, new):
+        """Puts `new` at dinner position pos of day i; returns the change in score."""
+        w = self.weights
+        day = self.plan[i]
+        old = day.dinner[pos]
+        ings = self.week_ings[self.shop_week[i]]
+        old_ings, new_ings = set(old.ingredients), set(new.ingredients)
+        # Ingredients that disappear from / appear on the week's list
+        d_ings = -sum(1 for g in old_ings - new_ings if ings[g] == 1) \
+                 + sum(1 for g in new_ings - old_ings if not ings.get(g))
+        d_repeat = self.uses[new.name] - (self.uses[old.name] - 1)
+        before = self._spacing_around(i)
+
+        self._remove(i, old)
+        self._add(i, new)
+        dinner = list(day.dinner)
+        dinner[pos] = new
+        day.dinner = tuple(dinner)
+
+        d_spacing = self._spacing_around(i) - before
+        return w['repeat'] * d_repeat + w['ingredients'] * d_ings + w['meat_spacing'] * d_spacing
+
+    # --- Rules -----------------------------------------------------------
+
+    def _fits(self, i, pos, new, same_week=False, same_shop_week=False):
+        """
+        Whether `new` may take dinner position pos of day i under the planning rules.
+        same_week: a swap inside one ISO week, which leaves the week's dishes and
+        fish count as they are; same_shop_week likewise for the weekly limits.
+        """
+        day = self.plan[i]
+        old = day.dinner[pos]
+        week = self.iso_week[i]
+        if not same_week and self.week_dishes[week][new.name] > 0:
+            return False
+        m = self.meat(new)
+        if m:
+            if (not same_week and m == 'Fish' and self.meat(old) != 'Fish'
+                    and self.week_fish[week] >= self.fish_limit):
+                return False
+            if self.day_meats[i][m] - (self.meat(old) == m) > 0:
+                return False
+        others = {d.name for k, d in enumerate(day.dinner) if k != pos}
+        for pair in self.pairs:
+            if new.name in pair and (pair - {new.name}) & others:
+                return False
+        for attr, period, limit in self.limits:
+            delta = new.attrs.get(attr, 0.0) - old.attrs.get(attr, 0.0)
+            if delta <= 0 or (period == 'week' and same_shop_week):
+                continue
+            totals = self.day_attrs[i] if period == 'day' else self.week_attrs[self.shop_week[i]]
+            if totals[attr] + delta > limit + 1e-9:
+                return False
+        return True
+
+    # --- Search ----------------------------------------------------------
+
+    def improve(self, plan, iterations=20000, seconds=None, t_start=2.0, t_end=0.01, swap_ratio=0.3):
+        """
+        Improves plan in place. Stops after `iterations` moves or `seconds` of
+        wall time, whichever comes first, and keeps the best plan seen.
+        Returns a dict with the score before/after and move counts.
+        """
+        self._index(plan)
+        slots = [(i, pos) for i, day in enumerate(plan) if day.is_planned for pos in range(len(day.dinner))]
+        result = {'score_before': self.score(), 'iterations': 0, 'accepted': 0, 'improved': 0, 'seconds': 0.0}
+        if not slots:
+            result['score_after'] = result['score_before']
+            return result
+        by_cat_slots = defaultdict(list)
+        for i, pos in slots:
+            by_cat_slots[plan[i].dinner[pos].category].append((i, pos))
+
+        current = best = result['score_before']
+        # Undo log back to the best plan: day -> its dinner when that plan was seen,
+        # for the days changed since (O(changed days) per new best, not O(horizon))
+        since_best = {}
+        started = time.perf_counter()
+        deadline = started + seconds if seconds else None
+        n = 0
+        while iterations is None or n < iterations:
+            if deadline is not None and n % 64 == 0 and time.perf_counter() >= deadline:
+                break
+            # Geometric cooling over the iteration (or time) budget
+            if iterations:
+                progress = n / iterations
+            else:
+                progress = (time.perf_counter() - started) / seconds
+            temp = t_start * (t_end / t_start) ** min(progress, 1.0)
+            n += 1
+
+            i, pos = self.random.choice(slots)
+            old = plan[i].dinner[pos]
+            if self.random.random() < swap_ratio:
+                # Swap with the same category on another day
+                j, pos2 = self.random.choice(by_cat_slots[old.category])
+                if j == i:
+                    continue
+                other = plan[j].dinner[pos2]
+                if other.name == old.name:
+                    continue
+                same_week = self.iso_week[i] == self.iso_week[j]
+                same_shop = self.shop_week[i] == self.shop_week[j]
+                if not (self._fits(i, pos, other, same_week, same_shop) and self._fits(j, pos2, old, same_week, same_shop)):
+                    continue
+                before = ((i, plan[i].dinner), (j, plan[j].dinner))
+                delta = self._replace(i, pos, other) + self._replace(j, pos2, old)
+                undo = lambda: (self._replace(j, pos2, other), self._replace(i, pos, old))
+            else:
+                pool = self.planner.by_category[old.category]
+                new = self.random.choice(pool)
+                if new.name == old.name or not self._fits(i, pos, new):
+                    continue
+                before = ((i, plan[i].dinner),)
+                delta = self._replace(i, pos, new)
+                undo = lambda: self._replace(i, pos, old)
+
+            if delta <= 0 or self.random.random() < math.exp(-delta / temp):
+                current += delta
+                result['accepted'] += 1
+                for day, dinner in before:
+                    since_best.setdefault(day, dinner)
+                if current < best - 1e-9:
+                    best = current
+                    result['improved'] += 1
+                    since_best.clear()
+            else:
+                undo()
+
+        # Roll back to the best plan seen
+        for day, dinner in since_best.items():
+            plan[day].dinner = dinner
+        self._index(plan)
+        result['iterations'] = n
+        result['seconds'] = time.perf_counter() - started
+        result['score_after'] = self.score()
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Improve an existing meal plan by simulated annealing")
+    parser.add_argument('plan', help='Plan file to improve (rewritten in place unless --output is given)')
+    parser.add_argument('--input', '-i', default='dishes.csv', help='Path to the dishes CSV file')
+    parser.add_argument('--output', '-o', default=None, help='Write the improved plan here instead')
+    parser.add_argument('--iterations', '-n', type=int, default=20000, help='Move budget (default: 20000)')
+    parser.add_argument('--seconds', type=float, default=None, help='Time budget in seconds')
+    parser.add_argument('--household', type=str, default='default', help='Household key for .db plans')
+    args = parser.parse_args()
+
+    dishes = load_dishes_from_csv(args.input)
+    if not dishes:
+        print("Error: No dishes loadable from file. Check format.")
+        sys.exit(1)
+    plan = load_plan_from_csv(args.plan, dishes, household=args.household)
+    if not plan:
+        print(f"Error: No plan loadable from '{args.plan}'.")
+        sys.exit(1)
+
+    result = PlanImprover(MealPlanner(dishes)).improve(plan, args.iterations, args.seconds)
+    print(f"Score {result['score_before']:.1f} -> {result['score_after']:.1f} "
+          f"({result['iterations']} moves, {result['accepted']} accepted, {result['seconds']:.2f}s)")
+    save_plan_to_csv(plan, args.output or args.plan, household=args.household)
+
+
+if __name__ == "__main__":
+    main()
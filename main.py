@@ -1,7 +1,15 @@
 import argparse
+import random
 import sys
 import os
-from planner import load_dishes_from_csv, MealPlanner, save_plan_to_csv, save_shopping_list
+import time
+from contextlib import nullcontext
+from planner import load_dishes_from_csv, load_plan_from_csv, load_shopping_list, load_pantry, MealPlanner, PlannerStats, save_plan_to_csv, save_shopping_list
+from history_store import HistoryStore
+from feasibility import check_feasibility
+from validator import validate_plan
+from sqlite_store import is_db_path
+from attributes import parse_limits
 from html_reporter import generate_html_report, generate_mobile_report, generate_mobile_shopping_list, generate_print_html
 
 def main():
@@ -12,17 +20,89 @@ def main():
     parser.add_argument('--output-shop', '-s', default='shopping_list.csv', help='Output filename for the shopping list')
     parser.add_argument('--output-html', '-w', default='meal_plan_report.html', help='Output filename for the Web Report')
     parser.add_argument('--start-date', type=str, default=None, help='Start date in YYYY-MM-DD format (default: today)')
+    parser.add_argument('--replan', type=str, default=None, help='Re-plan only these dates of the existing --output-plan (comma-separated YYYY-MM-DD)')
+    parser.add_argument('--history', type=str, default=None, help='History store (JSON) of past plans; seeds constraints and is updated with this plan')
+    parser.add_argument('--format', '-f', choices=['csv', 'parquet', 'feather'], default='csv', help='Format of the plan and shopping list files (parquet/feather need pyarrow)')
+    parser.add_argument('--household', type=str, default='default', help='Household key when plan/shopping outputs are SQLite databases (.db)')
+    parser.add_argument('--replan-week', type=str, default=None, help='Re-plan the whole week containing this date (YYYY-MM-DD)')
+    parser.add_argument('--metrics', type=str, default=None, help='Write per-stage wall/CPU time, peak memory and counts to this JSON file')
+    parser.add_argument('--constraint-stats', action='store_true', help='Count rule rejections, empty pools, short meals and staple fallbacks (included in --metrics)')
+    parser.add_argument('--improve', type=int, default=0, help='Improve the generated plan with this many simulated-annealing moves (see improver.py)')
+    parser.add_argument('--improve-seconds', type=float, default=None, help='Time budget for --improve in seconds')
+    parser.add_argument('--deadline-ms', type=int, default=None, help='Anytime planning: best plan found within this many milliseconds')
+    parser.add_argument('--shopping-weight', type=float, default=None, help='Favor dishes reusing ingredients already on the week\'s list (0 = off; default 1 with --pantry)')
+    parser.add_argument('--pantry', type=str, default=None, help='Ingredients on hand, one per line; favored like ones already on the list')
+    parser.add_argument('--lunch', action='store_true', help='Also plan a lunch every weekday (shares the daily rules with dinner)')
+    parser.add_argument('--rotation', type=str, default=None, help='Least-recently-served rotation; serve log (JSON) kept across runs')
+    parser.add_argument('--meat-taxonomy', type=str, default=None, help='Custom meat taxonomy (JSON, see meat_taxonomy.py) used to classify dishes')
+    parser.add_argument('--force', action='store_true', help='Plan even when the feasibility check finds the catalog too small')
+    parser.add_argument('--analytics', type=str, default=None, help='Write plan quality analytics (.json file, or a directory of CSV tables)')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed (the same seed and inputs give the same plan)')
+    parser.add_argument('--watch', action='store_true', help='Stay running and regenerate the outputs whenever the catalog or a rules input changes')
+    parser.add_argument('--watch-interval', type=float, default=0.5, help='Polling interval of --watch in seconds')
+    parser.add_argument('--cache', type=str, default=None, help='Plan cache directory: a run identical to an earlier one (needs --seed) reuses its plan')
+    parser.add_argument('--cache-size', type=float, default=64, help='Size limit of --cache in MB (least recently used plans are evicted)')
+    parser.add_argument('--limit', action='append', default=[], help='Limit on a dish attribute per day or shopping week (repeatable), e.g. cost/week=1500, prep_time/day=60')
+    parser.add_argument('--prefer', choices=['cost', 'prep_time', 'calories'], default=None, help='Favor dishes with a low value of this attribute')
+    parser.add_argument('--profile', type=str, default=None, help='Run under cProfile and dump the stats to this file')
     
     args = parser.parse_args()
     
+    stats = PlannerStats() if args.constraint_stats else None
+    metrics = None
+    if args.metrics:
+        from metrics import RunMetrics
+        metrics = RunMetrics()
+        metrics.attach()
+    
+    try:
+        if args.profile:
+            import cProfile
+            profiler = cProfile.Profile()
+            try:
+                profiler.runcall(run, args, metrics, stats)
+            finally:
+                profiler.dump_stats(args.profile)
+                print(f"Profile saved to {args.profile} (view with: python -m pstats {args.profile})")
+        else:
+            run(args, metrics, stats)
+    finally:
+        if stats is not None:
+            print(stats.summary())
+        if metrics is not None:
+            if stats is not None:
+                metrics.extra['constraints'] = stats.to_dict()
+            metrics.detach()
+            metrics.save(args.metrics)
+
+def stage(metrics, name):
+    # Timing context for one stage of the run; a no-op without --metrics
+    return metrics.stage(name) if metrics is not None else nullcontext()
+
+def run(args, metrics=None, stats=None):
+    if args.format != 'csv':
+        # Swap the extension of the (default or given) output names
+        ext = '.' + args.format
+        args.output_plan = os.path.splitext(args.output_plan)[0] + ext
+        args.output_shop = os.path.splitext(args.output_shop)[0] + ext
+    
+    if args.watch and (args.replan or args.replan_week):
+        print("Error: --watch regenerates whole plans; it cannot be combined with --replan/--replan-week.")
+        sys.exit(1)
+    
     input_path = os.path.abspath(args.input)
     if not os.path.exists(input_path):
         print(f"Error: Input file '{input_path}' not found.")
         print("Please provide a valid CSV file with columns: Dish Name, Category, Ingredients")
         sys.exit(1)
         
+    if args.meat_taxonomy:
+        from meat_taxonomy import MeatClassifier, use_taxonomy
+        use_taxonomy(MeatClassifier.from_json(args.meat_taxonomy))
+    
     print(f"Loading dishes from {input_path}...")
-    dishes = load_dishes_from_csv(input_path)
+    with stage(metrics, 'load'):
+        dishes = load_dishes_from_csv(input_path)
     
     if not dishes:
         print("Error: No dishes loadable from file. Check format.")
@@ -30,7 +110,25 @@ def main():
         
     print(f"Loaded {len(dishes)} dishes.")
     
-    planner = MealPlanner(dishes)
+    pantry = load_pantry(args.pantry) if args.pantry else None
+    shopping_weight = args.shopping_weight
+    if shopping_weight is None:
+        shopping_weight = 1.0 if pantry else 0.0
+    with stage(metrics, 'index'):
+        rotation = None
+        if args.rotation:
+            from rotation import RotationScheduler
+            rotation = RotationScheduler(dishes, args.rotation)
+        try:
+            planner = MealPlanner(dishes, stats=stats, shopping_weight=shopping_weight, pantry=pantry, rotation=rotation,
+                                  lunch=args.lunch, limits=parse_limits(args.limit), prefer=args.prefer)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+    
+    if args.replan or args.replan_week:
+        replan(args, dishes, planner, metrics)
+        return
     
     start_date = None
     if args.start_date:
@@ -41,20 +139,27 @@ def main():
             print("Error: Invalid date format. Please use YYYY-MM-DD.")
             sys.exit(1)
     
-    print(f"Generating plan for {args.days} days starting from {start_date if start_date else 'Today'}...")
-    plan = planner.generate_month_plan(days=args.days, start_date=start_date)
+    history = None
+    if args.history:
+        history = load_history(args, metrics)
     
-    save_plan_to_csv(plan, args.output_plan)
+    cache = None
+    if args.watch:
+        from watcher import OutputCache
+        cache = OutputCache()
+        if args.seed is None:
+            # Same seed for every regeneration, so an edit only changes what it touches
+            args.seed = random.randrange(2**32)
+        print(f"Watch mode: seed {args.seed}; history and rotation log are read but not updated.")
     
-    print("Aggregating ingredients...")
-    shopping = planner.aggregate_ingredients(plan)
-    save_shopping_list(shopping, args.output_shop)
-    
-    print("Generating Web Reports...")
-    generate_html_report(plan, shopping, args.output_html)
-    generate_mobile_report(plan, shopping, "meal_plan_mobile.html")
-    generate_mobile_shopping_list(shopping, "shopping_list_mobile.html")
-    generate_print_html(plan, "meal_plan_a4.html")
+    plan, shopping = make_plan(args, dishes, planner, start_date, history, metrics)
+    write_outputs(plan, planner, args, metrics, cache=cache, shopping=shopping)
+    if not args.watch:
+        if planner.rotation is not None:
+            update_rotation(planner.rotation, plan)
+        if history is not None:
+            with stage(metrics, 'history'):
+                update_history(history, args.output_plan, plan)
     
     # Auto-open
     try:
@@ -67,6 +172,334 @@ def main():
     print(f" - Web Report: {os.path.abspath(args.output_html)}")
     print(f" - Plan: {os.path.abspath(args.output_plan)}")
     print(f" - Shopping List: {os.path.abspath(args.output_shop)}")
+    
+    if args.watch:
+        watch(args, planner, start_date, history, metrics, cache)
+
+def load_history(args, metrics=None):
+    with stage(metrics, 'history'):
+        history = HistoryStore.load(args.history)
+    print(f"Loaded history: {len(history.by_date)} days from {len(history.sources)} plans.")
+    return history
+
+def make_plan(args, dishes, planner, start_date, history=None, metrics=None):
+    """
+    Feasibility check, planning (plain, --deadline-ms or --improve) and
+    validation. Returns the plan and, with --cache, its shopping lists
+    (else None: write_outputs aggregates them).
+    """
+    plan_cache, key = open_plan_cache(args, dishes, planner, start_date, history, metrics)
+    if key is not None:
+        with stage(metrics, 'cache'):
+            cached = plan_cache.get(key, dishes)
+        if cached is not None:
+            print(f"Plan cache hit ({key[:12]}): planning skipped.")
+            validate(cached[0], dishes, metrics, planner)
+            if metrics is not None:
+                metrics.count_plan(cached[0])
+            return cached
+    
+    if args.seed is not None:
+        random.seed(args.seed)
+    
+    # Fail fast before any sampling when the catalog can't fill the horizon
+    with stage(metrics, 'feasibility'):
+        report = check_feasibility(dishes, args.days, start_date, lunch=args.lunch)
+    if report.errors or report.warnings:
+        print(report.summary())
+    if not report.ok:
+        if not args.force:
+            print("Error: Catalog cannot satisfy the planning rules (use --force to plan anyway).")
+            sys.exit(1)
+        print("Continuing anyway (--force): some dinners will be short.")
+    
+    print(f"Generating plan for {args.days} days starting from {start_date if start_date else 'Today'}...")
+    with stage(metrics, 'plan'):
+        if args.deadline_ms:
+            plan, report = planner.generate_plan_within(args.deadline_ms / 1000, days=args.days,
+                                                        start_date=start_date, history=history)
+            print(f"Best plan in {report['seconds'] * 1000:.0f} ms ({report['attempts']} attempts, "
+                  f"{report['improve_moves']} improvement moves): {report['full_days']:.0%} full days, "
+                  f"{report['short_meals']} short meals, {report['staple_fallbacks']} staple fallbacks")
+        else:
+            plan = planner.generate_month_plan(days=args.days, start_date=start_date, history=history)
+    
+    if args.improve or args.improve_seconds:
+        from improver import PlanImprover
+        with stage(metrics, 'improve'):
+            result = PlanImprover(planner).improve(plan, iterations=args.improve or None, seconds=args.improve_seconds)
+        print(f"Improved plan: score {result['score_before']:.1f} -> {result['score_after']:.1f} "
+              f"({result['iterations']} moves in {result['seconds']:.2f}s)")
+    validate(plan, dishes, metrics, planner)
+    if metrics is not None:
+        metrics.count_plan(plan)
+    
+    shopping = None
+    if key is not None:
+        with stage(metrics, 'aggregate'):
+            shopping = planner.aggregate_ingredients(plan)
+        with stage(metrics, 'cache'):
+            plan_cache.put(key, plan, shopping)
+    return plan, shopping
+
+def open_plan_cache(args, dishes, planner, start_date, history=None, metrics=None):
+    # (PlanCache, key of this run), or (None, None) when the run can't be cached
+    if not args.cache:
+        return None, None
+    if args.seed is None or args.deadline_ms or args.improve_seconds:
+        print("Plan cache not used: needs --seed and no time-based --deadline-ms/--improve-seconds.")
+        return None, None
+    import datetime
+    from plan_cache import PlanCache, cache_key
+    with stage(metrics, 'cache'):
+        params = {
+            'days': args.days,
+            'start_date': start_date or datetime.date.today(),
+            'seed': args.seed,
+            'lunch': planner.lunch,
+            'shopping_weight': planner.shopping_weight,
+            'pantry': sorted(planner.pantry),
+            'improve': args.improve,
+            'limits': planner.LIMITS,
+            'prefer': planner.prefer,
+        }
+        key = cache_key(dishes, params, history, planner.rotation, type(planner))
+        plan_cache = PlanCache(args.cache, max_bytes=int(args.cache_size * 1024 * 1024))
+    return plan_cache, key
+
+def write_outputs(plan, planner, args, metrics=None, cache=None, catalog_version=0, shopping=None):
+    """
+    Writes the plan, shopping list, analytics and reports. With a watch
+    OutputCache only the outputs whose inputs changed are rewritten.
+    """
+    plan_id = shop_id = None
+    if cache is not None:
+        from watcher import plan_key
+        plan_id = plan_key(plan)
+    
+    def stale(output, *inputs):
+        return cache is None or cache.stale(output, *inputs)
+    
+    if stale('plan', plan_id):
+        with stage(metrics, 'write_plan'):
+            save_plan_to_csv(plan, args.output_plan, household=args.household)
+    
+    if shopping is None:
+        print("Aggregating ingredients...")
+        with stage(metrics, 'aggregate'):
+            shopping = planner.aggregate_ingredients(plan)
+    if cache is not None:
+        from watcher import shopping_key
+        shop_id = shopping_key(shopping)
+    # Attribute totals (catalogs with Cost/PrepTime/Calories) go with the shopping list and reports
+    totals = planner.plan_totals(plan)
+    if totals is not None:
+        print_totals(totals)
+    if stale('shopping', shop_id, *((plan_id, catalog_version) if totals is not None else ())):
+        with stage(metrics, 'write_shopping'):
+            save_shopping_list(shopping, args.output_shop, household=args.household, plan_start=plan[0].date if plan else None,
+                               totals=totals and totals[1])
+    
+    # Analytics also read the catalog (ingredients, meat types)
+    if stale('analytics', plan_id, catalog_version):
+        analytics = plan_analytics(plan, planner.dishes, args, metrics)
+        if cache is not None:
+            cache.values['analytics'] = analytics
+    else:
+        analytics = cache.values['analytics']
+    
+    reports = None
+    # The browser opens once, not on every watch regeneration
+    open_browser = cache is None or 'report_html' not in cache.inputs
+    if cache is not None:
+        reports = {name for name, inputs in (('report_html', (plan_id, shop_id, catalog_version)),
+                                             ('report_mobile', (plan_id, shop_id, catalog_version)),
+                                             ('report_mobile_shopping', (shop_id, plan_id, catalog_version)),
+                                             ('report_print', (plan_id,)))
+                   if cache.stale(name, *inputs)}
+    print("Generating Web Reports...")
+    write_reports(plan, shopping, args, metrics, analytics=analytics, only=reports, open_browser=open_browser,
+                  totals=totals)
+    return shopping
+
+def watch(args, planner, start_date, history=None, metrics=None, cache=None):
+    """
+    --watch: keeps the process warm (imports, parsed catalog, planner indexes)
+    and regenerates whenever an input changes. Only the changed inputs are
+    re-read, the planner keeps the pools of unchanged categories and only the
+    outputs whose inputs changed are rewritten.
+    """
+    from watcher import InputWatcher, OutputCache
+    cache = cache or OutputCache()
+    watcher = InputWatcher({name: path for name, path in (
+        ('catalog', args.input), ('taxonomy', args.meat_taxonomy), ('pantry', args.pantry),
+        ('history', args.history), ('rotation', args.rotation)) if path})
+    catalog_version = 0
+    print(f"\nWatching {', '.join(watcher.paths.values())} for changes (Ctrl+C to stop)...")
+    try:
+        while True:
+            changed = watcher.wait(args.watch_interval)
+            print(f"\nChanged: {', '.join(watcher.paths[name] for name in changed)}")
+            t0 = time.perf_counter()
+            try:
+                if 'taxonomy' in changed:
+                    from meat_taxonomy import MeatClassifier, use_taxonomy
+                    use_taxonomy(MeatClassifier.from_json(args.meat_taxonomy))
+                if 'catalog' in changed or 'taxonomy' in changed:
+                    with stage(metrics, 'load'):
+                        dishes = load_dishes_from_csv(os.path.abspath(args.input))
+                    if not dishes:
+                        print("Error: No dishes loadable from file. Check format.")
+                        sys.exit(1)
+                    with stage(metrics, 'index'):
+                        categories = planner.update_dishes(dishes)
+                    if categories:
+                        catalog_version += 1
+                    print(f"Loaded {len(planner.dishes)} dishes; changed categories: {', '.join(sorted(categories)) or 'none'}.")
+                if 'pantry' in changed:
+                    planner.set_pantry(load_pantry(args.pantry))
+                if 'history' in changed:
+                    history = load_history(args, metrics)
+                if args.rotation and ('rotation' in changed or 'catalog' in changed or 'taxonomy' in changed):
+                    from rotation import RotationScheduler
+                    planner.rotation = RotationScheduler(planner.dishes, args.rotation)
+                
+                plan, shopping = make_plan(args, planner.dishes, planner, start_date, history, metrics)
+                write_outputs(plan, planner, args, metrics, cache=cache, catalog_version=catalog_version, shopping=shopping)
+            except (SystemExit, ValueError, OSError) as e:
+                # A broken edit must not end the watch; the next save retries
+                if not isinstance(e, SystemExit):
+                    print(f"Error: {e}")
+                print("Outputs left as they were; waiting for the next change.")
+                continue
+            print(f"Regenerated in {(time.perf_counter() - t0) * 1000:.0f} ms.")
+    except KeyboardInterrupt:
+        print("\nStopped watching.")
+
+def validate(plan, dishes, metrics=None, planner=None):
+    # Every finished plan is checked against the rules (vectorized, a few ms per year)
+    with stage(metrics, 'validate'):
+        report = validate_plan(plan, dishes, planner or MealPlanner)
+    if not report.ok or report.warnings:
+        print(report.summary())
+    if metrics is not None:
+        metrics.extra['validation'] = report.counts()
+    return report
+
+def update_rotation(rotation, plan):
+    # Only the final plan counts as served (not discarded attempts)
+    rotation.record_plan(plan)
+    rotation.save()
+
+def update_history(history, plan_path, plan):
+    # CSV plans are tracked by file so history_store.py won't re-read them
+    if is_db_path(plan_path):
+        history.add_plan(plan)
+    else:
+        history.ingest_plan_file(plan_path)
+    history.save()
+
+def plan_analytics(plan, dishes, args, metrics=None):
+    # Feeds the Analytics tab of the web report; saved too with --analytics
+    from analytics import analyze_plan
+    with stage(metrics, 'analytics'):
+        result = analyze_plan(plan, dishes)
+        if args.analytics:
+            result.save(args.analytics)
+    if args.analytics:
+        print(f"Analytics saved to {args.analytics}")
+    return result
+
+def print_totals(totals):
+    # Attribute totals per shopping week (cost, prep time, calories in the catalog)
+    from attributes import format_totals
+    for week, values in totals[1].items():
+        print(f"Week {week}: {format_totals(values)}")
+
+def write_reports(plan, shopping, args, metrics=None, analytics=None, only=None, open_browser=True, totals=None):
+    # only: names of the reports to render (watch mode), None = all
+    def render(name):
+        return only is None or name in only
+    if render('report_html'):
+        with stage(metrics, 'report_html'):
+            generate_html_report(plan, shopping, args.output_html, open_browser=open_browser, analytics=analytics,
+                                 totals=totals)
+    if render('report_mobile'):
+        with stage(metrics, 'report_mobile'):
+            generate_mobile_report(plan, shopping, "meal_plan_mobile.html", totals=totals)
+    if render('report_mobile_shopping'):
+        with stage(metrics, 'report_mobile_shopping'):
+            generate_mobile_shopping_list(shopping, "shopping_list_mobile.html", totals=totals)
+    if render('report_print'):
+        with stage(metrics, 'report_print'):
+            generate_print_html(plan, "meal_plan_a4.html")
+
+def replan(args, dishes, planner, metrics=None):
+    """
+    Incremental mode: loads the existing plan, locks every other day and
+    re-solves only the selected dates. Only the affected shopping weeks change.
+    """
+    import datetime
+    
+    try:
+        dates = set()
+        if args.replan:
+            for s in args.replan.split(','):
+                dates.add(datetime.datetime.strptime(s.strip(), "%Y-%m-%d").date())
+        if args.replan_week:
+            anchor = datetime.datetime.strptime(args.replan_week, "%Y-%m-%d").date()
+            monday = anchor - datetime.timedelta(days=anchor.weekday())
+            for i in range(7):
+                dates.add(monday + datetime.timedelta(days=i))
+    except ValueError:
+        print("Error: Invalid date format. Please use YYYY-MM-DD.")
+        sys.exit(1)
+    
+    if not os.path.exists(args.output_plan):
+        print(f"Error: Existing plan '{args.output_plan}' not found. Generate a plan first.")
+        sys.exit(1)
+    
+    with stage(metrics, 'load_plan'):
+        plan = load_plan_from_csv(args.output_plan, dishes, household=args.household)
+    if args.seed is not None:
+        # Like make_plan: the same seed and plan re-plan the same way
+        random.seed(args.seed)
+    with stage(metrics, 'plan'):
+        # Plans made in lunch mode keep their lunches when re-planned
+        planner.lunch = args.lunch or any(day.lunch for day in plan)
+        changed_weeks = planner.replan_days(plan, dates)
+    if not changed_weeks:
+        print("Nothing to re-plan: none of the dates is a planned day in the existing plan.")
+        return
+    print(f"Re-planned {len([d for d in plan if d.date in dates and d.is_planned])} days in week(s) {sorted(changed_weeks)}.")
+    validate(plan, dishes, metrics, planner)
+    
+    with stage(metrics, 'write_plan'):
+        save_plan_to_csv(plan, args.output_plan, household=args.household)
+    if planner.rotation is not None:
+        update_rotation(planner.rotation, plan)
+    if args.history:
+        with stage(metrics, 'history'):
+            update_history(HistoryStore.load(args.history), args.output_plan, plan)
+    
+    # Keep the shopping already done: only the affected weeks are recomputed
+    with stage(metrics, 'aggregate'):
+        if os.path.exists(args.output_shop):
+            shopping = load_shopping_list(args.output_shop, household=args.household,
+                                          start_date=plan[0].date, end_date=plan[-1].date)
+        else:
+            shopping = planner.aggregate_ingredients(plan)
+        shopping.update(planner.aggregate_ingredients(plan, weeks=changed_weeks))
+        shopping = {week: shopping[week] for week in sorted(shopping)}
+    totals = planner.plan_totals(plan)
+    if totals is not None:
+        print_totals(totals)
+    with stage(metrics, 'write_shopping'):
+        save_shopping_list(shopping, args.output_shop, household=args.household, plan_start=plan[0].date if plan else None,
+                           totals=totals and totals[1])
+    
+    print("Updating Web Reports...")
+    write_reports(plan, shopping, args, metrics, analytics=plan_analytics(plan, dishes, args, metrics), totals=totals)
 
 if __name__ == "__main__":
     main()
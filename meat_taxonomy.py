@@ -0,0 +1,254 @@
+"""
+Meat type classification for dish names (daily meat uniqueness, fish cap).
+
+A taxonomy maps each meat type to keywords in several languages plus
+exclusion terms (雞蛋 is not chicken, fish sauce is not fish). All terms are
+compiled into one Aho-Corasick automaton, so a name is classified in a single
+pass however large the taxonomy. Resolution:
+  - a match inside a longer match is dropped (魷魚 is squid, not 魚 fish)
+  - a match inside an exclusion term of its type is dropped
+  - Latin keywords only match whole words (plural -s/-es allowed)
+  - of the types left, the first in taxonomy order wins
+Dishes are classified once when loaded (planner.Dish.meat_type); an explicit
+MeatType column in the catalog overrides it. When the name has no meat, the
+ingredients decide, more strictly (classify_ingredients): only one meat type
+may match, and not only in optional ingredients ('雞肉或牛小排', 'bacon (optional)'),
+else the dish stays unclassified rather than counting towards a meat's limits. A custom taxonomy is a JSON file
+of the same shape as TAXONOMY:
+
+    python meat_taxonomy.py -i dishes_old.csv            # show the classification
+    python main.py --meat-taxonomy my_taxonomy.json
+"""
+import argparse
+import json
+from collections import deque
+
+# Meat type -> keywords / exclusions, in priority order
+TAXONOMY = {
+    'Fish': {
+        'keywords': ['魚', '鱼', 'fish', 'salmon', 'cod', 'tuna', 'mackerel', 'tilapia', 'halibut', 'trout',
+                     'sardine', 'anchovy', 'milkfish', 'sea bass', 'snapper', 'eel', 'whitebait'],
+        'exclude': ['魚露', '鱼露', 'fish sauce', 'jellyfish', 'cuttlefish', 'shellfish'],
+    },
+    'Beef': {
+        'keywords': ['牛', 'beef', 'steak', 'brisket', 'oxtail', 'veal', 'hamburger'],
+        'exclude': ['牛奶', '牛油', '牛蒡', '蝸牛', 'beefsteak tomato'],
+    },
+    'Pork': {
+        'keywords': ['豬', '猪', 'pork', 'bacon', 'ham', 'sausage', 'pancetta', 'prosciutto', 'char siu', "pig's", 'pig'],
+        'exclude': [],
+    },
+    'Chicken': {
+        'keywords': ['雞', '鸡', 'chicken', 'poultry'],
+        'exclude': ['雞蛋', '鸡蛋', '雞精', '鸡精', 'chicken egg', 'chicken stock powder'],
+    },
+    'Shrimp': {
+        'keywords': ['蝦', '虾', 'shrimp', 'prawn', 'lobster'],
+        'exclude': ['蝦皮醬'],
+    },
+    'Clam': {
+        'keywords': ['蛤蜊', '蛤', '蜆', 'clam'],
+        'exclude': ['蛤蟆'],
+    },
+    'Duck': {
+        'keywords': ['鴨', '鸭', 'duck'],
+        'exclude': ['鴨蛋', '鸭蛋', 'duck egg'],
+    },
+    'Lamb': {
+        'keywords': ['羊', 'lamb', 'mutton'],
+        'exclude': ['羊栖菜'],
+    },
+    'Squid': {
+        'keywords': ['魷魚', '鱿鱼', '花枝', '章魚', '章鱼', '墨魚', '墨鱼', '小卷', 'squid', 'calamari',
+                     'octopus', 'cuttlefish'],
+        'exclude': [],
+    },
+    'Oyster': {
+        'keywords': ['蚵', '牡蠣', '牡蛎', 'oyster'],
+        'exclude': ['蠔油', 'oyster sauce', 'oyster mushroom'],
+    },
+}
+
+
+# An ingredient with one of these is optional or one of alternatives: a weak hint
+OPTIONAL_MARKERS = ('或', '可選', '可省', '/', ' or ', 'optional')
+
+
+def _is_latin(term):
+    return term.isascii()
+
+
+def _is_word_char(ch):
+    return ch.isascii() and (ch.isalnum() or ch == "'")
+
+
+class MeatClassifier:
+    def __init__(self, taxonomy=None):
+        self.taxonomy = taxonomy or TAXONOMY
+        self.priority = {meat: i for i, meat in enumerate(self.taxonomy)}
+        # (term, meat type, is exclusion)
+        self.terms = []
+        for meat, spec in self.taxonomy.items():
+            for kw in spec.get('keywords', []):
+                self.terms.append((kw.lower(), meat, False))
+            for ex in spec.get('exclude', []):
+                self.terms.append((ex.lower(), meat, True))
+        self._build()
+
+    def _build(self):
+        # Trie of all terms, then failure links by BFS
+        self.goto = [{}]
+        self.out = [[]]
+        for idx, (term, _, _) in enumerate(self.terms):
+            node = 0
+            for ch in term:
+                nxt = self.goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[node][ch] = nxt
+                    self.goto.append({})
+                    self.out.append([])
+                node = nxt
+            self.out[node].append(idx)
+
+        self.fail = [0] * len(self.goto)
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def matches(self, text):
+        """(start, end, term index) of every term occurrence in text, in one pass."""
+        text = text.lower()
+        found = []
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(ch, 0)
+            for idx in self.out[node]:
+                term = self.terms[idx][0]
+                start = i + 1 - len(term)
+                if _is_latin(term) and not self._whole_word(text, start, i + 1):
+                    continue
+                found.append((start, i + 1, idx))
+        return found
+
+    @staticmethod
+    def _whole_word(text, start, end):
+        if start > 0 and _is_word_char(text[start - 1]):
+            return False
+        # Plurals: fish -> fishes, clam -> clams
+        for suffix in ('', 's', 'es'):
+            if text.startswith(suffix, end):
+                after = end + len(suffix)
+                if after >= len(text) or not _is_word_char(text[after]):
+                    return True
+        return False
+
+    def classify(self, text):
+        """Meat type of a dish name (or any text), None when nothing matches."""
+        types = self.types(text)
+        return min(types, key=self.priority.get) if types else None
+
+    def types(self, text):
+        """Every meat type text mentions (after the shadowing and exclusion rules)."""
+        if not text:
+            return set()
+        found = self.matches(text)
+        types = set()
+        for start, end, idx in found:
+            _, meat, excluded = self.terms[idx]
+            if excluded:
+                continue
+            shadowed = False
+            for s2, e2, idx2 in found:
+                if (s2, e2) == (start, end) or not (s2 <= start and end <= e2):
+                    continue
+                _, meat2, excluded2 = self.terms[idx2]
+                # Longer keyword of any type, or an exclusion of the same type
+                if not excluded2 or meat2 == meat:
+                    shadowed = True
+                    break
+            if shadowed:
+                continue
+            types.add(meat)
+        return types
+
+    def classify_ingredients(self, ingredients):
+        """
+        Meat type of a dish from its ingredient list: None unless exactly one type
+        matches and some plain (not optional / alternative) ingredient names it.
+
+        >>> c = MeatClassifier()
+        >>> c.classify_ingredients(['雞腿', '薑', '蔥'])
+        'Chicken'
+        >>> print(c.classify_ingredients(['馬鈴薯', '洋蔥', '咖哩塊', '雞肉或牛小排']))  # 咖哩飯
+        None
+        >>> print(c.classify_ingredients(['pork belly', 'beef stock']))
+        None
+        >>> print(c.classify_ingredients(['tofu', 'bacon (optional)']))
+        None
+        >>> c.classify_ingredients(['雞胸肉', '雞肉或雞腿'])
+        'Chicken'
+        """
+        types, strong = set(), False
+        for ingredient in ingredients:
+            found = self.types(ingredient)
+            types |= found
+            if found and not any(marker in ingredient.lower() for marker in OPTIONAL_MARKERS):
+                strong = True
+        return types.pop() if len(types) == 1 and strong else None
+
+    @classmethod
+    def from_json(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+
+_classifier = None
+
+def get_classifier():
+    global _classifier
+    if _classifier is None:
+        _classifier = MeatClassifier()
+    return _classifier
+
+def use_taxonomy(taxonomy):
+    """Replaces the default classifier; affects dishes loaded afterwards."""
+    global _classifier
+    _classifier = taxonomy if isinstance(taxonomy, MeatClassifier) else MeatClassifier(taxonomy)
+
+def classify_meat(text):
+    return get_classifier().classify(text)
+
+def classify_ingredients(ingredients):
+    return get_classifier().classify_ingredients(ingredients)
+
+
+def main():
+    from planner import load_dishes_from_csv
+
+    parser = argparse.ArgumentParser(description="Show the meat type of every dish in a catalog")
+    parser.add_argument('--input', '-i', default='dishes.csv', help='Path to the dishes CSV file')
+    parser.add_argument('--taxonomy', '-t', default=None, help='Custom taxonomy JSON file')
+    parser.add_argument('--all', action='store_true', help='Also list dishes without meat')
+    args = parser.parse_args()
+
+    if args.taxonomy:
+        # Through the module planner imports (this file may be running as __main__)
+        import meat_taxonomy
+        meat_taxonomy.use_taxonomy(meat_taxonomy.MeatClassifier.from_json(args.taxonomy))
+    for d in load_dishes_from_csv(args.input):
+        if d.meat_type or args.all:
+            print(f"{d.meat_type or '-':8s} {d.category:15s} {d.name}")
+
+
+if __name__ == "__main__":
+    main()
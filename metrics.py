@@ -0,0 +1,87 @@
+"""
+Per-stage run metrics for main.py (--metrics).
+
+Records wall time, CPU time and peak traced memory per stage, plus counters
+(days planned, dishes picked, files written) collected through the planner's
+hook points (planner.subscribe). Days and dishes are those of the final plan
+(count_plan), not of every --deadline-ms attempt.
+"""
+import json
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+import planner
+
+
+class RunMetrics:
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.stages = {}
+        self.counts = Counter()
+        self.files = []
+        self.extra = {} # e.g. constraint telemetry (PlannerStats.to_dict())
+        self._started = time.perf_counter()
+        self._cpu_started = time.process_time()
+
+    def attach(self):
+        # Count through the planner hooks instead of threading counters through every call
+        planner.subscribe('day_planned', self._on_day_planned)
+        planner.subscribe('file_written', self._on_file_written)
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def detach(self):
+        planner.unsubscribe('day_planned', self._on_day_planned)
+        planner.unsubscribe('file_written', self._on_file_written)
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def _on_day_planned(self, day, **_):
+        # Live count (re-planning); count_plan replaces it with the final plan's numbers
+        self.counts['days_planned'] += 1
+        self.counts['dishes_picked'] += len(day.dinner) + len(day.lunch)
+
+    def count_plan(self, plan):
+        """Days and dishes of the plan that was kept: --deadline-ms discards attempts, a cache hit fires no events."""
+        planned = [day for day in plan if day.is_planned]
+        self.counts['days_planned'] = len(planned)
+        self.counts['dishes_picked'] = sum(len(day.dinner) + len(day.lunch) for day in planned)
+
+    def _on_file_written(self, path, kind, **_):
+        self.counts['files_written'] += 1
+        self.files.append({'path': path, 'kind': kind})
+
+    @contextmanager
+    def stage(self, name):
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            entry = self.stages.setdefault(name, {'wall_s': 0.0, 'cpu_s': 0.0, 'peak_kb': None, 'calls': 0})
+            entry['wall_s'] += time.perf_counter() - wall
+            entry['cpu_s'] += time.process_time() - cpu
+            entry['calls'] += 1
+            if tracing:
+                peak_kb = tracemalloc.get_traced_memory()[1] / 1024
+                entry['peak_kb'] = max(entry['peak_kb'] or 0, peak_kb)
+
+    def to_dict(self):
+        return {
+            'total_wall_s': time.perf_counter() - self._started,
+            'total_cpu_s': time.process_time() - self._cpu_started,
+            'stages': self.stages,
+            'counts': dict(self.counts),
+            'files': self.files,
+            **self.extra,
+        }
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+        print(f"Metrics saved to {path}")
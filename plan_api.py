@@ -0,0 +1,169 @@
+"""
+In-memory library API: plan, shopping list and every report as str/bytes,
+with no file writes, prints or browser windows (main.py is the file-writing
+CLI around the same pieces).
+
+    from plan_api import plan_and_render
+    result = plan_and_render('dishes.csv', days=28, start_date=date(2026, 3, 2), seed=7)
+    html = result.render('report.html')         # str
+    result.write('plan.parquet', response)      # stream to any file object
+    result.warnings, result.validation.ok       # what the CLI would have printed
+
+Outputs are rendered on first use and cached, so a service only pays for the
+ones it serves.
+"""
+import datetime
+import io
+import json
+import random
+
+from feasibility import check_feasibility
+from planner import (MealPlanner, collect_warnings, plan_to_dataframe, read_dishes, shopping_to_dataframe,
+                     totals_to_dataframe, write_columnar)
+from validator import validate_plan
+
+# Output name -> (kind, what)
+OUTPUTS = {
+    'plan.csv': ('csv', 'plan'),
+    'plan.parquet': ('parquet', 'plan'),
+    'plan.feather': ('feather', 'plan'),
+    'shopping.csv': ('csv', 'shopping'),
+    'shopping.parquet': ('parquet', 'shopping'),
+    'shopping.feather': ('feather', 'shopping'),
+    'shopping_totals.csv': ('csv', 'totals'),
+    'shopping_totals.parquet': ('parquet', 'totals'),
+    'shopping_totals.feather': ('feather', 'totals'),
+    'report.html': ('html', 'report'),
+    'mobile.html': ('html', 'mobile'),
+    'shopping.html': ('html', 'shopping'),
+    'print.html': ('html', 'print'),
+    'analytics.json': ('json', 'analytics'),
+}
+
+
+class PlanResult:
+    """A plan with its shopping list, checks and rendered outputs (see OUTPUTS)."""
+
+    def __init__(self, plan, shopping, dishes, feasibility, validation, warnings, totals=None):
+        self.plan = plan
+        self.shopping = shopping
+        self.dishes = dishes
+        self.feasibility = feasibility # feasibility.FeasibilityReport
+        self.validation = validation   # validator.ValidationReport
+        self.warnings = warnings       # messages the CLI would have printed
+        self.totals = totals           # ({date: totals}, {week: totals}) of the dish attributes, if any
+        self._rendered = {}
+        self._analytics = None
+
+    @property
+    def analytics(self):
+        if self._analytics is None:
+            from analytics import analyze_plan
+            self._analytics = analyze_plan(self.plan, self.dishes)
+        return self._analytics
+
+    def render(self, name):
+        """One output as str (csv, html, json) or bytes (parquet, feather)."""
+        if name not in OUTPUTS:
+            raise KeyError(f"Unknown output {name!r}; one of {', '.join(OUTPUTS)}")
+        if name not in self._rendered:
+            self._rendered[name] = self._render(*OUTPUTS[name])
+        return self._rendered[name]
+
+    def _render(self, kind, what):
+        import html_reporter
+        if kind == 'html':
+            if what == 'report':
+                return html_reporter.render_html_report(self.plan, self.shopping, self.analytics, self.totals)
+            if what == 'mobile':
+                return html_reporter.render_mobile_report(self.plan, self.shopping, self.totals)
+            if what == 'shopping':
+                return html_reporter.render_mobile_shopping_list(self.shopping, self.totals)
+            return html_reporter.render_print_html(self.plan)
+        if kind == 'json':
+            return json.dumps(self.analytics.to_dict(), indent=2, ensure_ascii=False)
+        if what == 'plan':
+            df = plan_to_dataframe(self.plan)
+        elif what == 'totals':
+            # Attribute totals per shopping week (empty without catalog attributes)
+            df = totals_to_dataframe(self.totals[1] if self.totals else {})
+        else:
+            df = shopping_to_dataframe(self.shopping)
+        if kind == 'csv':
+            return df.to_csv(index=False)
+        buf = io.BytesIO()
+        write_columnar(df, buf, kind)
+        return buf.getvalue()
+
+    def render_all(self, names=None):
+        return {name: self.render(name) for name in (names or OUTPUTS)}
+
+    def write(self, name, f):
+        """
+        Streams one output to a file object: str to text files, UTF-8 bytes
+        (with BOM for CSV, like the CLI's files) to anything else.
+        """
+        data = self.render(name)
+        if isinstance(data, str) and not isinstance(f, io.TextIOBase):
+            data = data.encode('utf-8-sig' if name.endswith('.csv') else 'utf-8')
+        f.write(data)
+
+
+def load_catalog(source):
+    # A list of Dish, an open CSV file, or a path (.csv / .db)
+    if isinstance(source, (list, tuple)):
+        return list(source)
+    if hasattr(source, 'read'):
+        return read_dishes(source)
+    from sqlite_store import is_db_path
+    if is_db_path(source):
+        from sqlite_store import load_dishes_from_db
+        return load_dishes_from_db(source)
+    with open(source, 'r', encoding='utf-8-sig') as f:
+        return read_dishes(f)
+
+
+def plan_and_render(dishes, days=28, start_date=None, seed=None, lunch=False, history=None,
+                    shopping_weight=0.0, pantry=None, deadline=None, improve=0, cache=None, limits=None, prefer=None):
+    """
+    Plans and returns a PlanResult. dishes: a list of Dish, an open catalog
+    CSV file or a path. history: a history_store.HistoryStore. deadline
+    (seconds) and improve (moves) as --deadline-ms / --improve. Unlike main.py
+    an infeasible catalog is not an error: check result.feasibility.
+    cache: a plan_cache.PlanCache; used for seeded runs without a deadline.
+    limits, prefer: attribute limits and preference as --limit / --prefer
+    (e.g. {'cost/week': 1500}, 'cost').
+    """
+    warnings = []
+    # Own RNG and warning list per call: nothing global is reseeded or subscribed
+    with collect_warnings(warnings):
+        dishes = load_catalog(dishes)
+        if not dishes:
+            raise ValueError("No dishes in the catalog")
+        feasibility = check_feasibility(dishes, days, start_date, lunch=lunch)
+        planner = MealPlanner(dishes, shopping_weight=shopping_weight, pantry=pantry, lunch=lunch,
+                              limits=limits, prefer=prefer, rng=random.Random(seed))
+        key = None
+        if cache is not None and seed is not None and not deadline:
+            from plan_cache import cache_key
+            params = {'days': days, 'start_date': start_date or datetime.date.today(), 'seed': seed, 'lunch': lunch,
+                      'shopping_weight': planner.shopping_weight, 'pantry': sorted(planner.pantry), 'improve': improve,
+                      'limits': planner.LIMITS, 'prefer': planner.prefer}
+            key = cache_key(dishes, params, history)
+            cached = cache.get(key, dishes)
+            if cached is not None:
+                plan, shopping = cached
+                return PlanResult(plan, shopping, dishes, feasibility, validate_plan(plan, dishes, planner), warnings,
+                                  planner.plan_totals(plan))
+        if deadline:
+            plan, _ = planner.generate_plan_within(deadline, days=days, start_date=start_date, history=history)
+        else:
+            plan = planner.generate_month_plan(days=days, start_date=start_date, history=history)
+        if improve:
+            from improver import PlanImprover
+            PlanImprover(planner).improve(plan, iterations=improve)
+        shopping = planner.aggregate_ingredients(plan)
+        if key is not None:
+            cache.put(key, plan, shopping)
+    return PlanResult(plan, shopping, dishes, feasibility, validate_plan(plan, dishes, planner), warnings,
+                      planner.plan_totals(plan))
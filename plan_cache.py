@@ -0,0 +1,174 @@
+"""
+On-disk plan cache: identical invocations (same catalog, rules, parameters
+and seed) reuse the stored plan and shopping lists instead of planning again.
+
+Entries are small JSON files named by the SHA-256 of everything the plan
+depends on: the parsed catalog (names, categories, ingredients, weights, meat
+types, attributes), the MealPlanner rules, the planning code (PLAN_MODULES),
+the parameters, the seed and the history/rotation state it starts from. The directory is bounded in size;
+the least recently used entries (file mtime, touched on every hit) go first.
+Writes are atomic, so a crash never leaves a half-written entry.
+
+    python main.py --seed 7 --cache .plan_cache
+    python plan_cache.py .plan_cache              # entries and size
+    python plan_cache.py .plan_cache --clear
+"""
+import argparse
+import datetime
+import hashlib
+import importlib
+import json
+import os
+from collections import Counter
+
+from planner import DayPlan, MealPlanner
+
+CACHE_VERSION = 1
+
+
+def _digest(obj):
+    return hashlib.sha256(json.dumps(obj, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')).hexdigest()
+
+
+# Modules whose code decides the cached plan and shopping list. validator.py and
+# feasibility.py only report on a plan (and are re-run on every hit), so not listed.
+PLAN_MODULES = ('planner', 'improver', 'attributes', 'rotation', 'meat_taxonomy')
+
+
+def _code_digest(modules=PLAN_MODULES):
+    # Plans from older planning code are not reused
+    h = hashlib.sha256()
+    for name in modules:
+        with open(importlib.import_module(name).__file__, 'rb') as f:
+            h.update(name.encode('utf-8') + b'\0' + hashlib.sha256(f.read()).digest())
+    return h.hexdigest()
+
+
+def rules_of(planner_cls):
+    """The planning rules (upper-case class attributes) of a MealPlanner class."""
+    rules = {}
+    for name in dir(planner_cls):
+        if name.isupper():
+            value = getattr(planner_cls, name)
+            if isinstance(value, (list, tuple, set, frozenset)):
+                value = sorted(sorted(v) if isinstance(v, (set, frozenset)) else v for v in value)
+            rules[name] = value
+    return rules
+
+
+def cache_key(dishes, params, history=None, rotation=None, planner_cls=MealPlanner):
+    """
+    Key of a planning run. params: JSON-able parameters (days, start date,
+    seed, lunch, ...). history: a HistoryStore, rotation: a RotationScheduler.
+    """
+    catalog = [(d.name, d.category, d.ingredients, d.weight, d.meat_type, d.attrs) for d in dishes]
+    state = {
+        'version': CACHE_VERSION,
+        'code': _code_digest(),
+        'catalog': _digest(catalog),
+        'rules': rules_of(planner_cls),
+        'params': params,
+        'history': _digest(sorted(history.by_date.items())) if history is not None else None,
+        'rotation': _digest(sorted(rotation.saved.items())) if rotation is not None else None,
+    }
+    return _digest(state)
+
+
+class PlanCache:
+    def __init__(self, directory, max_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def get(self, key, dishes):
+        """(plan, shopping lists) stored under key, or None."""
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        by_name = {d.name: d for d in dishes}
+        try:
+            plan = [DayPlan(day, datetime.date.fromisoformat(date), staple,
+                            [by_name[n] for n in dinner], [by_name[n] for n in lunch])
+                    for day, date, staple, dinner, lunch in data['plan']]
+            shopping = {int(week): Counter(counter) for week, counter in data['shopping']}
+        except (KeyError, TypeError, ValueError):
+            # Not this catalog after all, or an unreadable entry: drop it
+            self._remove(path)
+            return None
+        os.utime(path) # most recently used
+        return plan, shopping
+
+    def put(self, key, plan, shopping):
+        data = {
+            'plan': [[day.day, day.date_str, day.staple, day.dinner_names, day.lunch_names] for day in plan],
+            'shopping': [[week, dict(counter)] for week, counter in shopping.items()],
+        }
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, path)
+        self.evict()
+
+    def entries(self):
+        """(path, size, mtime) of every entry, least recently used first."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                path = os.path.join(self.directory, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((path, st.st_size, st.st_mtime))
+        return sorted(entries, key=lambda e: e[2])
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        # Always keep the newest entry, even if it alone is over the limit
+        for path, size, _ in entries[:-1]:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self):
+        for path, _, _ in self.entries():
+            self._remove(path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show or clear a plan cache directory")
+    parser.add_argument('directory', help='Cache directory (main.py --cache)')
+    parser.add_argument('--clear', action='store_true', help='Remove every entry')
+    args = parser.parse_args()
+
+    cache = PlanCache(args.directory)
+    if args.clear:
+        cache.clear()
+        print(f"Cleared {args.directory}")
+        return
+    entries = cache.entries()
+    total = sum(size for _, size, _ in entries)
+    print(f"{len(entries)} cached plan(s), {total / 1024:.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,83 +1,514 @@
 import csv
+import math
+import os
 import random
+import sys
 from collections import defaultdict, Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+import numpy as np
 import pandas as pd
+from attributes import Budget, DishAttributes, check_limits, parse_attributes
+from meat_taxonomy import classify_ingredients, classify_meat
+
+# Hook points for library users: subscribe(event, callback).
+# Callbacks receive keyword arguments:
+#   dishes_loaded(path, count)       plan_started(start_date, days)
+#   day_planned(day)                 plan_finished(plan)
+#   file_written(path, kind)         warning(message)
+_HOOKS = defaultdict(list)
+
+def subscribe(event, callback):
+    _HOOKS[event].append(callback)
+
+def unsubscribe(event, callback):
+    if callback in _HOOKS.get(event, []):
+        _HOOKS[event].remove(callback)
+
+def emit(event, **payload):
+    # Cheap when nobody listens: one dict lookup
+    for callback in _HOOKS.get(event, ()):
+        callback(**payload)
+
+# List collecting the warnings of the current call (collect_warnings), instead of printing them
+_WARNING_SINK = ContextVar('warning_sink', default=None)
+
+@contextmanager
+def collect_warnings(sink):
+    # Warnings inside the block go to the list `sink`; per thread / task, no global state
+    token = _WARNING_SINK.set(sink)
+    try:
+        yield sink
+    finally:
+        _WARNING_SINK.reset(token)
+
+def warn(message):
+    # Collected inside collect_warnings (see plan_api.py), else printed unless a 'warning' subscriber takes it
+    sink = _WARNING_SINK.get()
+    if sink is not None:
+        sink.append(message)
+    elif _HOOKS.get('warning'):
+        emit('warning', message=message)
+    else:
+        print(message)
 
 class Dish:
-    def __init__(self, name, category, ingredients):
+    def __init__(self, name, category, ingredients, weight=1.0, meat_type=None, attrs=None):
         self.name = name
         self.category = category  # 'Protein', 'Egg', 'Other'
-        self.ingredients = [i.strip() for i in ingredients.split(',') if i.strip()]
+        # Interned: the same ingredient string is shared by every dish and index
+        self.ingredients = [sys.intern(i.strip()) for i in ingredients.split(',') if i.strip()]
+        self.weight = weight # Preference: relative odds of being picked (optional 'Weight' column)
+        # Classified once here (see meat_taxonomy.py): from the name, else the ingredients.
+        # An explicit meat_type (optional 'MeatType' column) wins; '' means no meat.
+        if meat_type is None:
+            meat_type = classify_meat(name) or classify_ingredients(self.ingredients)
+        self.meat_type = meat_type or None
+        # Optional numeric attributes: cost, prep_time, calories (see attributes.py)
+        self.attrs = attrs or {}
 
     def __repr__(self):
         return f"{self.name} ({self.category})"
 
+class DayPlan:
+    """
+    One day of a plan. Slotted instead of a dict to keep multi-year plans small:
+    the date string, weekday and dish names are derived on access.
+    Legacy dict-style keys (day['Date'], day['Dinner'], ...) still work.
+    """
+    __slots__ = ('day', 'date', 'staple', 'dinner', 'lunch')
+
+    # Legacy key -> attribute
+    KEYS = {
+        'Day': 'day',
+        'Date': 'date',
+        'DateStr': 'date_str',
+        'Weekday': 'weekday',
+        'Staple': 'staple',
+        'Dinner_Objects': 'dinner',
+        'Dinner': 'dinner_names',
+        'Lunch_Objects': 'lunch',
+        'Lunch': 'lunch_names',
+    }
+
+    def __init__(self, day, date, staple='', dinner=(), lunch=()):
+        self.day = day
+        self.date = date
+        self.staple = staple
+        self.dinner = tuple(dinner)
+        self.lunch = tuple(lunch)
+
+    @property
+    def date_str(self):
+        return self.date.isoformat()
+
+    @property
+    def weekday(self):
+        return self.date.strftime("%a")
+
+    @property
+    def dinner_names(self):
+        return [d.name for d in self.dinner]
+
+    @property
+    def lunch_names(self):
+        return [d.name for d in self.lunch]
+
+    @property
+    def is_planned(self):
+        # Weekends and holidays carry no meal
+        return self.staple not in ('', 'Holiday')
+
+    def __getitem__(self, key):
+        return getattr(self, self.KEYS[key])
+
+    def get(self, key, default=None):
+        attr = self.KEYS.get(key)
+        return getattr(self, attr) if attr else default
+
+    def __repr__(self):
+        return f"DayPlan({self.date_str}, {self.staple!r}, {self.dinner_names})"
+
+class PlannerStats:
+    """
+    Constraint telemetry for one planning run: how often each rule rejected a
+    candidate, empty candidate pools, short meals and staple fallbacks, in
+    total and per ISO week. Pass MealPlanner(dishes, stats=PlannerStats());
+    with the default stats=None nothing is counted.
+    """
+    RULES = ('weekly_reuse', 'fish_limit', 'daily_meat', 'incompatible_pair', 'budget')
+    EVENTS = ('empty_pool', 'short_pick', 'short_meal', 'staple_fallback')
+
+    def __init__(self):
+        self.total = Counter()
+        self.weekly = defaultdict(Counter)
+        self.week = None # Set by the planner as it moves through the horizon
+
+    def count(self, key, n=1):
+        if n:
+            self.total[key] += n
+            self.weekly[self.week][key] += n
+
+    def to_dict(self):
+        return {
+            'total': {k: self.total[k] for k in self.RULES + self.EVENTS},
+            'weekly': {str(week): dict(c) for week, c in self.weekly.items()},
+        }
+
+    def summary(self):
+        lines = ["Constraint rejections: " + ", ".join(f"{k}={self.total[k]}" for k in self.RULES)]
+        lines.append("Planning events: " + ", ".join(f"{k}={self.total[k]}" for k in self.EVENTS))
+        worst = sorted(self.weekly.items(), key=lambda kv: kv[1]['short_meal'], reverse=True)
+        worst = [(w, c) for w, c in worst if c['short_meal']][:3]
+        if worst:
+            lines.append("Weeks with most short meals: " + ", ".join(f"{w} ({c['short_meal']})" for w, c in worst))
+        return "\n".join(lines)
+
+def taiwan_holidays_2026():
+    """
+    Holiday List for 2026 (Taiwan). No dinner is planned on these days.
+    Assuming manual entry based on user request "Refer to Taiwan Holidays"
+    Source: Directorate-General of Personnel Administration (approximate)
+    """
+    import datetime
+    
+    holidays_2026 = set()
+    
+    def add_range(start_str, end_str):
+        s = datetime.datetime.strptime(start_str, "%Y-%m-%d").date()
+        e = datetime.datetime.strptime(end_str, "%Y-%m-%d").date()
+        curr = s
+        while curr <= e:
+            holidays_2026.add(curr)
+            curr += datetime.timedelta(days=1)
+            
+    # Jan 1
+    holidays_2026.add(datetime.date(2026, 1, 1))
+    # LNY: Feb 14 - Feb 22
+    add_range("2026-02-14", "2026-02-22")
+    # Peace Day: Feb 27 - Mar 1
+    add_range("2026-02-27", "2026-03-01")
+    # Tomb Sweeping: Apr 3 - Apr 6
+    add_range("2026-04-03", "2026-04-06")
+    # Labor Day: May 1 - May 3
+    add_range("2026-05-01", "2026-05-03")
+    # Dragon Boat: Jun 19 - Jun 21
+    add_range("2026-06-19", "2026-06-21")
+    # Moon Festival: Sep 25 - Sep 28
+    add_range("2026-09-25", "2026-09-28")
+    # Double Ten: Oct 9 - Oct 11
+    add_range("2026-10-09", "2026-10-11")
+    # Retrocession: Oct 24 - Oct 26
+    add_range("2026-10-24", "2026-10-26")
+    # Constitution: Dec 25 - Dec 27
+    add_range("2026-12-25", "2026-12-27")
+    return holidays_2026
+
+class AliasTable:
+    """
+    Weighted sampling in O(1) per draw (Vose's alias method), built once per pool.
+    Zero-weight items are never drawn; an all-zero pool draws None.
+    """
+    def __init__(self, items, weights):
+        n = len(items)
+        total = sum(weights)
+        self.items = list(items) if total > 0 else []
+        self.prob = [1.0] * len(self.items)
+        self.alias = list(range(len(self.items)))
+        if not self.items:
+            return
+        scaled = [w * n / total for w in weights]
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] += scaled[s] - 1.0
+            (small if scaled[l] < 1.0 else large).append(l)
+
+    def draw(self, rng=random):
+        if not self.items:
+            return None
+        i = rng.randrange(len(self.items))
+        return self.items[i] if rng.random() < self.prob[i] else self.items[self.alias[i]]
+
+class ShoppingTracker:
+    """
+    Ingredients already on one shopping week's list (plus the pantry) for
+    shopping-aware planning. Per-dish reuse counts are kept up to date through
+    the planner's ingredient -> dishes index as ingredients join the list, so
+    scoring a candidate is a dict lookup instead of comparing ingredient lists.
+    """
+    def __init__(self, planner):
+        self.index = planner.ingredient_index
+        self.n_ingredients = planner.n_ingredients
+        self.on_list = set(planner.pantry)
+        self.reuse = Counter(planner.pantry_reuse) # dish name -> its ingredients already available
+
+    def add(self, dish):
+        for ing in dish.ingredients:
+            if ing not in self.on_list:
+                self.on_list.add(ing)
+                for name in self.index.get(ing, ()):
+                    self.reuse[name] += 1
+
+    def new_ingredients(self, dish):
+        # Ingredients this dish would add to the week's list
+        return self.n_ingredients[dish.name] - self.reuse[dish.name]
+
 class MealPlanner:
-    def __init__(self, dishes):
+    # Weekly rules (see feasibility.py for the up-front check against a catalog)
+    WEEKLY_FISH_LIMIT = 2
+    EGG_DAYS_PER_WEEK = 3 # out of Mon..Fri
+    # Staple spacing in days: noodles at most every NOODLE_GAP days, combos every COMBO_GAP
+    NOODLE_GAP = 14
+    COMBO_GAP = 3
+    # Dishes that never share a dinner (Yuba vs Tofu)
+    INCOMPATIBLE_PAIRS = [{'炒腐竹', '滷豆腐'}]
+    # Lunch mode: side dishes per lunch (1 Vegetable + 1 Protein + Other)
+    LUNCH_SIDES = 3
+    # Uniform picks from pools at least this big sample instead of scanning the pool
+    SAMPLE_MIN_POOL = 512
+    # Per-day / per-shopping-week limits on dish attributes, e.g. {'cost/week': 1500} (see attributes.py)
+    LIMITS = {}
+    
+    def __init__(self, dishes, stats=None, shopping_weight=0.0, pantry=None, rotation=None, lunch=False,
+                 limits=None, prefer=None, rng=None):
         self.dishes = dishes
+        # Random stream of every pick: the random module by default, or an own
+        # random.Random (plan_api) so a plan neither reads nor moves the global state
+        self.random = rng or random
+        # Plan a lunch next to every dinner (generate_meal), sharing the day's rules
+        self.lunch = lunch
+        self.stats = stats
+        # rotation.RotationScheduler: least-recently-served picks instead of uniform sampling
+        self.rotation = rotation
         self.by_category = defaultdict(list)
         for d in dishes:
             self.by_category[d.category].append(d)
+        self._filler_pools = {}
+        
+        # Weighted picks from per-pool alias tables, only when some dish has a weight
+        # (or with a --prefer attribute; set by build_attributes)
+        self._alias_tables = {}
+        
+        # Shopping-aware picks: favor dishes whose ingredients are already on the
+        # week's list or in the pantry (0 = off, higher = stronger preference)
+        self.shopping_weight = shopping_weight
+        self.pantry = frozenset(sys.intern(p) for p in (pantry or ()))
+        if shopping_weight:
+            self.build_ingredient_index()
+        
+        # Attribute limits (instance limits on top of the class LIMITS) and the
+        # attribute to keep low ('cost', ...); columns built only when dishes have attributes
+        if limits:
+            self.LIMITS = {**self.LIMITS, **limits}
+        if self.LIMITS:
+            check_limits(self.LIMITS)
+        self.prefer = prefer
+        self.budget = None # attributes.Budget of the running plan
+        self.build_attributes()
         
         # Verify we have enough data
         self.categories = ['Protein', 'Egg', 'Vegetable', 'Other']
         for cat in self.categories:
             if not self.by_category[cat]:
-                print(f"Warning: No dishes found for category '{cat}'")
+                warn(f"Warning: No dishes found for category '{cat}'")
                 
         # Staple Logic
         self.staples = ['Rice', 'Combo (Rice)', 'Combo (Noodle)']
         self.last_noodle_date = None # Track last date noodles were used
+        self.egg_schedule_week = None
+        self.egg_days = set()
+
+    def build_ingredient_index(self):
+        # Interned ingredient -> names of the dishes using it
+        self.ingredient_index = defaultdict(list)
+        self.n_ingredients = {}
+        for d in self.dishes:
+            ings = set(d.ingredients)
+            self.n_ingredients[d.name] = len(ings)
+            for ing in ings:
+                self.ingredient_index[ing].append(d.name)
+        self.pantry_reuse = Counter()
+        for ing in self.pantry:
+            for name in self.ingredient_index.get(ing, ()):
+                self.pantry_reuse[name] += 1
+
+    def build_attributes(self):
+        self.attributes = None
+        self.preference = None
+        if any(d.attrs for d in self.dishes):
+            self.attributes = DishAttributes(self.dishes)
+        if self.prefer:
+            if self.attributes is not None and self.prefer in self.attributes.names:
+                self.preference = self.attributes.preference(self.prefer)
+            else:
+                warn(f"Warning: No dish has a {self.prefer} value, preference ignored.")
+        # The preference rides on the weighted picks (alias tables)
+        self.weighted = any(d.weight != 1.0 for d in self.dishes) or self.preference is not None
+
+    def new_budget(self):
+        # Budget for one planning run, or None without limits on attributes the catalog has
+        if not self.LIMITS or self.attributes is None:
+            return None
+        limited = {key.partition('/')[0] for key in self.LIMITS}
+        if not limited.intersection(self.attributes.names):
+            return None
+        side_ids = [d.id for cat in self.categories for d in self.by_category.get(cat, [])]
+        staple_ids = [d.id for cat in self.staples for d in self.by_category.get(cat, [])]
+        day_sides = 4 + (self.LUNCH_SIDES if self.lunch else 0)
+        return Budget(self.attributes, self.LIMITS, side_ids, staple_ids, day_sides)
+
+    def plan_totals(self, plan):
+        """attributes.DishAttributes.plan_totals of plan, or None without attributes."""
+        return self.attributes.plan_totals(plan) if self.attributes is not None else None
 
-    def generate_meal(self, n=4):
+    def update_dishes(self, dishes):
         """
-        Generates a single meal (Lunch or Dinner) with n dishes.
-        Attempts to include variety. 
-        Note constraints: "Daily" needs all 3 categories. 
-        This function just picks n dishes, we'll validate daily constraints later or build carefully.
-        
-        To simplify 'Daily' constraint (Protein, Egg, Other):
-        We can try to ensure each MEAL has variety, or just check the day.
-        Let's try to make each meal balanced if possible, ensuring at least one of each if n >= 3.
+        Swaps in a re-parsed catalog (watch mode). Dishes identical to current
+        ones are kept as they are, so the pools, alias tables and filler pools of
+        unchanged categories stay valid. Returns the changed categories.
         """
-        meal = []
-        # Mandatory categories for a balanced meal (soft constraint, but good for "Daily" check)
-        # If we have 4 dishes, we can pick 1 Protein, 1 Egg, 1 Other, and 1 Random.
-        
-        pool = self.dishes[:]
-        random.shuffle(pool)
-        
-        chosen_cats = set()
-        
-        # Try to pick one from each category first
-        for cat in self.categories:
-            options = [d for d in pool if d.category == cat and d not in meal]
-            if options:
-                selection = random.choice(options)
-                meal.append(selection)
-                chosen_cats.add(cat)
+        def key(d):
+            return (d.name, d.category, tuple(d.ingredients), d.weight, d.meat_type, tuple(sorted(d.attrs.items())))
+        current = {key(d): d for d in self.dishes}
+        dishes = [current.get(key(d), d) for d in dishes]
+        by_category = defaultdict(list)
+        for d in dishes:
+            by_category[d.category].append(d)
+        # Same dish objects in the same order (Dish compares by identity)
+        changed = {cat for cat in set(by_category) | set(self.by_category)
+                   if by_category.get(cat, []) != self.by_category.get(cat, [])}
+        self.dishes = dishes
+        self.by_category = by_category
+        for cache in (self._alias_tables, self._filler_pools):
+            for pool in [pool for pool in cache if changed.intersection(pool)]:
+                del cache[pool]
+        if self.shopping_weight and changed:
+            self.build_ingredient_index()
+        self.build_attributes()
+        if self.preference is not None and changed:
+            # Preference weights are relative to the catalog's median
+            self._alias_tables.clear()
+        return changed
+
+    def set_pantry(self, pantry):
+        self.pantry = frozenset(sys.intern(p) for p in (pantry or ()))
+        if self.shopping_weight:
+            self.build_ingredient_index()
+
+    def pick_weights(self, dishes):
+        # Pick odds: the dishes' own weights, times the --prefer attribute's preference
+        if self.preference is None:
+            return [d.weight for d in dishes]
+        return (self.preference[[d.id for d in dishes]] * [d.weight for d in dishes]).tolist()
+
+    def alias_table(self, categories):
+        # Built on first use per pool (a category, or the Other+Protein filler pool)
+        key = tuple(categories)
+        table = self._alias_tables.get(key)
+        if table is None:
+            pool = [d for cat in key for d in self.by_category.get(cat, [])]
+            table = self._alias_tables[key] = AliasTable(pool, self.pick_weights(pool))
+        return table
+
+    def filler_pool(self, categories):
+        # Concatenated category pools for the fill step, built once instead of per meal
+        key = tuple(categories)
+        pool = self._filler_pools.get(key)
+        if pool is None:
+            pool = self._filler_pools[key] = [d for cat in key for d in self.by_category.get(cat, [])]
+        return pool
+
+    def weighted_pick(self, categories, pool, count, is_valid, max_draws=16):
+        """
+        Up to `count` distinct dishes drawn by weight from the categories' alias
+        table, masking the ones is_valid rejects (weekly-used, meat rules, ...).
+        O(1) per draw; only when most of the pool is masked does it fall back to
+        one weighted pass over the valid rest of `pool`.
+        """
+        table = self.alias_table(categories)
+        picked = []
+        for _ in range(max_draws * count):
+            if len(picked) >= count:
+                break
+            d = table.draw(self.random)
+            if d is None:
+                break
+            if d not in picked and is_valid(d):
+                picked.append(d)
+        if len(picked) < count:
+            rest = [d for d in pool if d.weight > 0 and d not in picked and is_valid(d)]
+            weights = self.pick_weights(rest)
+            while rest and len(picked) < count:
+                k = self.random.choices(range(len(rest)), weights)[0]
+                weights.pop(k)
+                picked.append(rest.pop(k))
+        return picked
+
+    def sampled_pick(self, pool, count, is_valid, max_draws=16):
+        """
+        Uniform counterpart of weighted_pick for big pools: rejection-samples
+        up to `count` distinct valid dishes, scanning the pool only when most
+        of it is masked.
+        """
+        picked = []
+        for _ in range(max_draws * count):
+            if len(picked) >= count:
+                break
+            d = self.random.choice(pool)
+            if d not in picked and is_valid(d):
+                picked.append(d)
+        if len(picked) < count:
+            rest = [d for d in pool if d not in picked and is_valid(d)]
+            picked.extend(self.random.sample(rest, min(count - len(picked), len(rest))))
+        return picked
+
+    def generate_meal(self, n=None, weekly_used_dishes=(), weekly_fish_count=0, shopping=None,
+                      daily_meats=None, taken=None):
+        """
+        Lunch: 1 Vegetable + 1 Protein + Other for the rest (n sides, LUNCH_SIDES
+        by default), drawn from the same category pools and day state as
+        generate_dinner, so meat types and dishes never repeat across the day's meals.
+        """
+        if n is None:
+            n = self.LUNCH_SIDES
+        meal, pick_valid = self._picker(weekly_used_dishes, weekly_fish_count, shopping, daily_meats, taken)
+        # One vegetable per meal
+        meal.extend(pick_valid('Vegetable', self.by_category['Vegetable'], 1))
+        meal.extend(pick_valid('Protein', self.by_category['Protein'], 1))
+        meal.extend(pick_valid('Other', self.by_category['Other'], max(0, n - len(meal))))
         
-        # Fill the rest
+        pool_cats = ['Other', 'Protein']
         while len(meal) < n:
-            remaining = [d for d in pool if d not in meal]
-            if not remaining:
-                break # Ran out of dishes
-            meal.append(random.choice(remaining))
-            
+            fillers = pick_valid('Fill', self.filler_pool(pool_cats), 1, categories=pool_cats)
+            if not fillers:
+                break
+            meal.append(fillers[0])
+        
+        if self.stats is not None and len(meal) < n:
+            self.stats.count('short_meal')
         return meal
 
-    def get_daily_staple(self, current_date, is_egg_day, last_combo_date=None):
+    def get_daily_staple(self, current_date, is_egg_day, last_combo_date=None,
+                         next_noodle_date=None, next_combo_date=None):
         import datetime
         
         # Determine available options
         options = []
         
-        # Check noodle constraint (once every 14 days)
+        # Check noodle constraint (once every NOODLE_GAP days)
         can_have_noodle = False
         if self.last_noodle_date is None:
             can_have_noodle = True
-        elif (current_date - self.last_noodle_date).days >= 14:
+        elif (current_date - self.last_noodle_date).days >= self.NOODLE_GAP:
             can_have_noodle = True
+        # When re-planning inside a locked plan, the gap must also hold towards later noodle days
+        if next_noodle_date is not None and (next_noodle_date - current_date).days < self.NOODLE_GAP:
+            can_have_noodle = False
             
         # Filter Staples
         # On Non-Egg days, we force FORCE normal staples (Rice/Noodle) because we need 4 slots.
@@ -94,7 +525,11 @@ class MealPlanner:
             if last_combo_date:
                 days_since_combo = (current_date - last_combo_date).days
                 
-            if days_since_combo <= 2:
+            days_until_combo = 999
+            if next_combo_date:
+                days_until_combo = (next_combo_date - current_date).days
+                
+            if days_since_combo < self.COMBO_GAP or days_until_combo < self.COMBO_GAP:
                 # Disperse rule: At least 2 days gap (e.g. Mon->Thu)
                 allowed_types = [s for s in allowed_types if 'Combo' not in s]
         
@@ -109,7 +544,7 @@ class MealPlanner:
             # Fallback if over-constrained (shouldn't happen with Rice)
             return 'Rice'
             
-        selected = random.choice(options)
+        selected = self.random.choice(options)
         
         # Update tracker
         if 'Noodle' in selected:
@@ -117,93 +552,260 @@ class MealPlanner:
             
         return selected
 
-    def identify_meat_type(self, dish_name):
-        name = dish_name.lower()
-        if '魚' in name and '吻仔魚' not in name: return 'Fish' # Main fish dishes
-        if '吻仔魚' in name: return 'Fish' # Treat as fish
-        if '牛' in name: return 'Beef'
-        if '豬' in name: return 'Pork'
-        if '雞' in name and '雞蛋' not in name and '蛋' not in name: return 'Chicken' # Avoid Egg matches
-        if '雞肉' in name: return 'Chicken'
-        if '蝦' in name: return 'Shrimp'
-        if '蛤蜊' in name: return 'Clam'
-        return None
+    # Monthly usage caps for specific staple dishes (matched by substring)
+    MONTHLY_LIMITS = {
+        '雞湯麵': 2,
+        '番茄牛肉飯': 1,
+        '義大利麵': 1,
+        '咖哩飯': 1
+    }
 
-    def generate_dinner(self, staple, is_egg_day, weekly_used_dishes, weekly_fish_count):
-        # Determine dish count
-        # Combo -> 3 items (Staple + 2 sides)
-        # Normal -> 4 items (Staple + 3 sides - Wait, normal is 4 dishes total including staple?)
-        # Let's check CSV output. Only Side dishes are in 'Dinner_Objects'.
-        # Previous layout: Staple is separate.
-        # Logic: 
-        # Egg Day (Normal): 1P + 1V + 1E. (3 sides).
-        # Non-Egg (Normal): 1P + 1V + 2B. (4 sides).
-        # Combo: "配菜就不安排蛋白質". 
-        #   Egg Day (Combo): 0P + 1V + 1E. (2 sides).
-        #   Non-Egg (Combo): N/A (Combo not allowed).
-        
-        target_sides = 4 # Default for Normal Staple
-        if 'Combo' in staple:
-            target_sides = 2 # 1V + 1E (Protein excluded, Veg included, Egg included)
-            
+    def pick_staple_dish(self, staple_cat, monthly_dish_counts):
+        """
+        Picks the staple dish for a staple category, respecting MONTHLY_LIMITS.
+        Returns (staple_dish_name, staple_cat). The category falls back to 'Rice'
+        (白飯) when every option in it has hit its monthly limit, and to a Rice
+        dish when the catalog has none of the category.
+        """
+        s_options = self.by_category.get(staple_cat, [])
+        if not s_options and staple_cat != 'Rice' and self.by_category.get('Rice'):
+            # e.g. no Combo dishes: a real Rice day (Rice-day sides) instead of a bare category name
+            if self.stats is not None:
+                self.stats.count('staple_fallback')
+            return self.pick_staple_dish('Rice', monthly_dish_counts)
+        monthly_limits = self.MONTHLY_LIMITS
+
+        valid_s_options = []
+        for s in s_options:
+            # Check limit
+            # Match by substring for flexibility
+            limit = 999
+            for key, lim in monthly_limits.items():
+                if key in s.name:
+                    limit = lim
+                    break
+
+            # Count by full dish name, check against the matched rule
+            count = monthly_dish_counts[s.name]
+            if count < limit:
+                valid_s_options.append(s)
+
+        if self.budget is not None:
+            # Staples leaving room for the day's sides under the LIMITS (all of them if none does)
+            valid_s_options = [s for s in valid_s_options if self.budget.staple_fits(s.name)] or valid_s_options
+
+        def choose(options):
+            if self.rotation is not None:
+                ok = set(options)
+                picked = self.rotation.pick([staple_cat], 1, lambda s: s in ok)
+                if picked:
+                    return picked[0]
+            elif self.weighted:
+                ok = set(options)
+                picked = self.weighted_pick([staple_cat], options, 1, lambda s: s in ok)
+                if picked:
+                    return picked[0]
+            return self.random.choice(options)
+
+        staple_dish_name = staple_cat # Fallback
+        if valid_s_options:
+            s_dish = choose(valid_s_options)
+            staple_dish_name = s_dish.name
+            monthly_dish_counts[s_dish.name] += 1
+        elif s_options:
+            # Fallback if specific limit reached (e.g. no more Curry allowed)
+            # Try finding a non-limited option
+            unlimited = [s for s in s_options if not any(k in s.name for k in monthly_limits)]
+            if unlimited:
+                s_dish = choose(unlimited)
+                staple_dish_name = s_dish.name
+                monthly_dish_counts[s_dish.name] += 1
+            else:
+                # User limits might eventually block all Combos if pool is small
+                # (e.g. 雞湯麵 is the only Noodle, max 2/month). Fallback to Rice is safe.
+                # IMPORTANT: Update category so sides are generated for Normal Staple (4 dishes)
+                staple_dish_name = '白飯'
+                staple_cat = 'Rice'
+                if self.stats is not None:
+                    self.stats.count('staple_fallback')
+
+        return staple_dish_name, staple_cat
+
+    @staticmethod
+    def identify_meat_type(dish_name):
+        # Name-only classification; loaded dishes carry theirs in Dish.meat_type
+        return classify_meat(dish_name)
+
+    def _picker(self, weekly_used_dishes, weekly_fish_count, shopping=None, daily_meats=None, taken=None):
+        """
+        (meal, pick_valid) for building one meal. daily_meats and taken (dish
+        names) are the day's state, shared by its meals: pass the same sets to
+        the dinner and lunch of a day.
+        """
         meal = []
-        daily_meats = set()
-        
+        if daily_meats is None:
+            daily_meats = set()
+        if taken is None:
+            taken = set()
         # Helper to pick form list
-        def pick_valid(category, pool, count=1, exclude_meat_types=None):
-            # Filter by weekly used
-            candidates = [d for d in pool if d.name not in weekly_used_dishes and d not in meal]
-            
-            # Filter by constraints
-            valid = []
-            for d in candidates:
-                # Vegetable Limit: If we already have a vegetable, don't pick another?
-                # Actually enforcing 1 V per day means we pick V exactly once.
+        stats = self.stats
+        budget = self.budget
+        
+        def allowed(d):
+            # Vegetable Limit: If we already have a vegetable, don't pick another?
+            # Actually enforcing 1 V per day means we pick V exactly once.
+            
+            # Meat Type Uniqueness
+            m_type = d.meat_type
+            
+            # Fish Limit
+            if m_type == 'Fish' and weekly_fish_count >= self.WEEKLY_FISH_LIMIT:
+                if stats is not None:
+                    stats.count('fish_limit')
+                return False
                 
-                # Meat Type Uniqueness
-                m_type = self.identify_meat_type(d.name)
+            # Daily Meat Uniqueness
+            if m_type and m_type in daily_meats:
+                if stats is not None:
+                    stats.count('daily_meat')
+                return False
                 
-                # Fish Limit
-                if m_type == 'Fish' and weekly_fish_count >= 2:
-                    continue
-                    
-                # Daily Meat Uniqueness
-                if m_type and m_type in daily_meats:
-                    continue
-                    
-                # Constraint: Incompatibility (Yuba vs Tofu)
-                # 炒腐竹 vs 滷豆腐
-                incompatible_pairs = [{'炒腐竹', '滷豆腐'}]
-                is_incompatible = False
-                current_names = {x.name for x in meal}
-                for pair in incompatible_pairs:
-                    if d.name in pair:
-                        # Check if the OTHER element of the pair is already in meal
-                        other = (pair - {d.name}).pop()
-                        if other in current_names:
-                            is_incompatible = True
-                            break
-                if is_incompatible:
-                    continue
-                    
-                valid.append(d)
+            # Constraint: Incompatibility (Yuba vs Tofu)
+            # 炒腐竹 vs 滷豆腐
+            incompatible_pairs = self.INCOMPATIBLE_PAIRS
+            is_incompatible = False
+            current_names = {x.name for x in meal}
+            for pair in incompatible_pairs:
+                if d.name in pair:
+                    # Check if the OTHER element of the pair is already in meal
+                    other = (pair - {d.name}).pop()
+                    if other in current_names:
+                        is_incompatible = True
+                        break
+            if is_incompatible:
+                if stats is not None:
+                    stats.count('incompatible_pair')
+                return False
+            
+            # Attribute limits: budget.ok was set for the whole pool by budget.mask
+            if budget is not None and not budget.ok[d.id]:
+                if stats is not None:
+                    stats.count('budget')
+                return False
+            return True
+        
+        def unused(d):
+            if d.name in weekly_used_dishes or d.name in taken or d in meal:
+                if stats is not None:
+                    stats.count('weekly_reuse')
+                return False
+            return True
+        
+        def pick_valid(category, pool, count=1, exclude_meat_types=None, categories=None):
+            drawn = True # valid already holds the picks
+            if budget is not None:
+                fits = budget.mask(pool)
+                if fits.sum() * 2 < len(pool):
+                    # Mostly over the limits: draw from the dishes that fit instead of rejecting the rest
+                    pool = [pool[k] for k in np.flatnonzero(fits).tolist()]
+            if self.rotation is not None:
+                # Least recently served valid dishes, popped from the category heaps
+                valid = self.rotation.pick(categories or [category], count, lambda d: unused(d) and allowed(d))
+            elif self.weighted and shopping is None:
+                # Preference weights: O(1) alias draws, excluded dishes masked
+                valid = self.weighted_pick(categories or [category], pool, count, lambda d: unused(d) and allowed(d))
+            elif shopping is None and len(pool) >= self.SAMPLE_MIN_POOL:
+                # Big pools: a few uniform draws instead of filtering the whole pool
+                valid = self.sampled_pick(pool, count, lambda d: unused(d) and allowed(d))
+            else:
+                drawn = False
+                # Filter by weekly used
+                candidates = [d for d in pool if d.name not in weekly_used_dishes and d.name not in taken and d not in meal]
+                if stats is not None:
+                    stats.count('weekly_reuse', len(pool) - len(candidates))
+                
+                # Filter by constraints
+                valid = [d for d in candidates if allowed(d)]
                 
             if not valid:
+                if stats is not None:
+                    stats.count('empty_pool')
                 return []
                 
             # Pick
             picked = []
-            if len(valid) >= count:
-                picked = random.sample(valid, count)
+            if drawn:
+                picked = valid
+                if len(valid) < count and stats is not None:
+                    stats.count('short_pick')
+            elif shopping is not None and len(valid) > count:
+                # Fewer new ingredients for the week's list -> more likely (times the dish's own weight)
+                weights = [w * math.exp(-self.shopping_weight * shopping.new_ingredients(d))
+                           for d, w in zip(valid, self.pick_weights(valid))]
+                for _ in range(count):
+                    if not any(weights):
+                        break # Only zero-weight dishes left
+                    k = self.random.choices(range(len(valid)), weights)[0]
+                    picked.append(valid.pop(k))
+                    weights.pop(k)
+            elif len(valid) >= count:
+                picked = self.random.sample(valid, count)
             else:
                 picked = valid # Take what we can
+                if stats is not None:
+                    stats.count('short_pick')
                 
+            # Picks of one batch were validated together: keep one per meat type and
+            # no incompatible pair among them (the fill step makes up for any dropped)
+            kept = []
             for p in picked:
-                m = self.identify_meat_type(p.name)
+                m = p.meat_type
+                if m and m in daily_meats:
+                    if stats is not None:
+                        stats.count('daily_meat')
+                    continue
+                if any(p.name in pair and (pair - {p.name}) & {k.name for k in kept} for pair in self.INCOMPATIBLE_PAIRS):
+                    if stats is not None:
+                        stats.count('incompatible_pair')
+                    continue
+                if budget is not None:
+                    if not budget.fits(p):
+                        if stats is not None:
+                            stats.count('budget')
+                        continue
+                    budget.add(p)
                 if m: daily_meats.add(m)
+                taken.add(p.name)
+                kept.append(p)
                 
-            return picked
+            return kept
+
+        return meal, pick_valid
 
+    def generate_dinner(self, staple, is_egg_day, weekly_used_dishes, weekly_fish_count, shopping=None,
+                        daily_meats=None, taken=None):
+        # Determine dish count
+        # Combo -> 3 items (Staple + 2 sides)
+        # Normal -> 4 items (Staple + 3 sides - Wait, normal is 4 dishes total including staple?)
+        # Let's check CSV output. Only Side dishes are in 'Dinner_Objects'.
+        # Previous layout: Staple is separate.
+        # Logic: 
+        # Egg Day (Normal): 1P + 1V + 1E. (3 sides).
+        # Non-Egg (Normal): 1P + 1V + 2B. (4 sides).
+        # Combo: "配菜就不安排蛋白質". 
+        #   Egg Day (Combo): 0P + 1V + 1E. (2 sides).
+        #   Non-Egg (Combo): N/A (Combo not allowed).
+        
+        target_sides = 4 # Default for Normal Staple
+        if 'Combo' in staple:
+            target_sides = 2 # 1V + 1E (Protein excluded, Veg included, Egg included)
+            
+        meal, pick_valid = self._picker(weekly_used_dishes, weekly_fish_count, shopping, daily_meats, taken)
+        stats = self.stats
+        if self.budget is not None:
+            # Slots still to fill today (the lunch too), each kept a cheapest side in reserve
+            self.budget.slots = target_sides + (self.LUNCH_SIDES if self.lunch else 0)
+        
         # 1. Vegetable (Strictly 1)
         v_picked = pick_valid('Vegetable', self.by_category['Vegetable'], 1)
         meal.extend(v_picked)
@@ -260,19 +862,83 @@ class MealPlanner:
                 pool_cats.append('Protein') # Allowed second protein?
                 # User: "每天出現的肉類不會重複" -> implies multiple meat dishes allowed IF types differ.
                 
-            candidates = []
-            for cat in pool_cats:
-                candidates.extend(self.by_category[cat])
-                
-            fillers = pick_valid('Fill', candidates, 1)
+            fillers = pick_valid('Fill', self.filler_pool(pool_cats), 1, categories=pool_cats)
             if fillers:
                 meal.append(fillers[0])
             else:
                 break # Cannot fill
                 
+        if stats is not None and len(meal) < target_sides:
+            stats.count('short_meal')
         return meal
 
-    def generate_month_plan(self, days=28, start_date=None):
+    def _serve_meal(self, dishes, date, weekly_used_dishes, shopping=None):
+        # Update trackers for a planned meal; returns its fish dishes (weekly fish count)
+        fish = 0
+        for d in dishes:
+            weekly_used_dishes.add(d.name)
+            if d.meat_type == 'Fish':
+                fish += 1
+            if shopping is not None:
+                shopping.add(d)
+            if self.rotation is not None:
+                self.rotation.serve(d.name, date)
+        return fish
+
+    def seed_from_history(self, history, start_date):
+        """
+        Constraint state carried over from meals served before start_date
+        (see history_store.HistoryStore). Returns
+        (weekly_used_dishes, weekly_fish_count, last_combo_date, monthly_dish_counts)
+        and sets last_noodle_date and the egg schedule of the first week.
+        Each look-back day is a single O(1) probe into the history's date index.
+        """
+        import datetime
+        
+        by_name = {d.name: d for d in self.dishes}
+        week_key = start_date.isocalendar()[:2]
+        weekly_used_dishes = set()
+        weekly_fish_count = 0
+        last_combo_date = None
+        monthly_dish_counts = Counter()
+        egg_weekdays = set()
+        
+        # Far enough back for the noodle gap and the rest of the current month
+        lookback = max(self.NOODLE_GAP, start_date.day - 1)
+        for k in range(1, lookback + 1):
+            date = start_date - datetime.timedelta(days=k)
+            served = history.served_on(date)
+            if not served:
+                continue
+            staple, names = served
+            staple_cat = by_name[staple].category if staple in by_name else ''
+            
+            if 'Noodle' in staple_cat and self.last_noodle_date is None:
+                self.last_noodle_date = date
+            if 'Combo' in staple_cat and last_combo_date is None:
+                last_combo_date = date
+            if staple_cat and (date.year, date.month) == (start_date.year, start_date.month):
+                monthly_dish_counts[staple] += 1
+                
+            if date.isocalendar()[:2] == week_key:
+                for name in names:
+                    weekly_used_dishes.add(name)
+                    meat = by_name[name].meat_type if name in by_name else self.identify_meat_type(name)
+                    if meat == 'Fish':
+                        weekly_fish_count += 1
+                if 'Combo' in staple_cat or any(n in by_name and by_name[n].category == 'Egg' for n in names):
+                    egg_weekdays.add(date.isoweekday())
+        
+        # Continue the week's egg schedule instead of drawing a fresh one
+        if egg_weekdays:
+            remaining = list(range(start_date.isoweekday(), 6))
+            needed = max(0, self.EGG_DAYS_PER_WEEK - len(egg_weekdays))
+            self.egg_days = egg_weekdays | set(self.random.sample(remaining, min(needed, len(remaining))))
+            self.egg_schedule_week = week_key
+            
+        return weekly_used_dishes, weekly_fish_count, last_combo_date, monthly_dish_counts
+
+    def generate_month_plan(self, days=28, start_date=None, history=None):
         import datetime
         
         if start_date is None:
@@ -286,46 +952,31 @@ class MealPlanner:
         weekly_fish_count = 0
         last_combo_date = None
         monthly_dish_counts = Counter()
+        self.last_noodle_date = None
+        self.egg_schedule_week = None
+        shopping = None # ShoppingTracker of the current shopping week (shopping-aware mode)
+        if self.rotation is not None:
+            self.rotation.start(self.random)
+        self.budget = budget = self.new_budget()
         
-        # Holiday List for 2026 (Taiwan)
-        # Assuming manual entry based on user request "Refer to Taiwan Holidays"
-        # Source: Directorate-General of Personnel Administration (approximate)
-        holidays_2026 = set()
-        
-        def add_range(start_str, end_str):
-            s = datetime.datetime.strptime(start_str, "%Y-%m-%d").date()
-            e = datetime.datetime.strptime(end_str, "%Y-%m-%d").date()
-            curr = s
-            while curr <= e:
-                holidays_2026.add(curr)
-                curr += datetime.timedelta(days=1)
-                
-        # Jan 1
-        holidays_2026.add(datetime.date(2026, 1, 1))
-        # LNY: Feb 14 - Feb 22
-        add_range("2026-02-14", "2026-02-22")
-        # Peace Day: Feb 27 - Mar 1
-        add_range("2026-02-27", "2026-03-01")
-        # Tomb Sweeping: Apr 3 - Apr 6
-        add_range("2026-04-03", "2026-04-06")
-        # Labor Day: May 1 - May 3
-        add_range("2026-05-01", "2026-05-03")
-        # Dragon Boat: Jun 19 - Jun 21
-        add_range("2026-06-19", "2026-06-21")
-        # Moon Festival: Sep 25 - Sep 28
-        add_range("2026-09-25", "2026-09-28")
-        # Double Ten: Oct 9 - Oct 11
-        add_range("2026-10-09", "2026-10-11")
-        # Retrocession: Oct 24 - Oct 26
-        add_range("2026-10-24", "2026-10-26")
-        # Constitution: Dec 25 - Dec 27
-        add_range("2026-12-25", "2026-12-27")
+        # Rolling plans: carry the constraint state over from previous plans
+        if history is not None:
+            weekly_used_dishes, weekly_fish_count, last_combo_date, monthly_dish_counts = \
+                self.seed_from_history(history, start_date)
+            current_week = start_date.isocalendar()[:2]
+        
+        emit('plan_started', start_date=start_date, days=days)
+        
+        holidays_2026 = taiwan_holidays_2026()
         
         # Pre-calculate dates
         calendar_dates = []
         for i in range(days):
             d = start_date + datetime.timedelta(days=i)
             calendar_dates.append(d)
+        # Planned (weekday, non-holiday) days, for the budget's reserve of the week's later days
+        planned = [d.isoweekday() <= 5 and d not in holidays_2026 for d in calendar_dates]
+        current_month = (start_date.year, start_date.month)
         
         # Group by ISO Week to manage resets
         # Logic: Iterating day by day. Check if week number changes.
@@ -333,29 +984,31 @@ class MealPlanner:
         for current_date in calendar_dates:
             year, week, weekday = current_date.isocalendar() # Mon=1, Sun=7
             week_key = (year, week)
+            if self.stats is not None:
+                self.stats.week = f"{year}-W{week:02d}"
             
             # Reset counters on new week
             if week_key != current_week:
                 weekly_used_dishes = set()
                 weekly_fish_count = 0
                 current_week = week_key
+            # ... and the monthly limits on a new calendar month (as validator.py counts them)
+            if (current_date.year, current_date.month) != current_month:
+                monthly_dish_counts = Counter()
+                current_month = (current_date.year, current_date.month)
             
-            day_data = {
-                'Day': (current_date - start_date).days + 1,
-                'Date': current_date,
-                'DateStr': current_date.strftime("%Y-%m-%d"),
-                'Weekday': current_date.strftime("%a"),
-                'Staple': '',
-                'Dinner_Objects': [],
-                'Dinner': [],
-                'Lunch_Objects': [] # Empty
-            }
+            day_data = DayPlan((current_date - start_date).days + 1, current_date)
+            # Shopping weeks follow aggregate_ingredients: 7-day blocks from the start
+            if self.shopping_weight and day_data.day % 7 == 1:
+                shopping = ShoppingTracker(self)
+            if budget is not None and day_data.day % 7 == 1:
+                budget.start_week()
             
             # Skip weekends (Sat=6, Sun=7) OR Holidays
             is_holiday = (current_date in holidays_2026)
             if weekday > 5 or is_holiday:
                 if is_holiday:
-                    day_data['Staple'] = 'Holiday'
+                    day_data.staple = 'Holiday'
                 plan.append(day_data)
                 continue
                 
@@ -366,11 +1019,11 @@ class MealPlanner:
             # "Weekly Egg Rule: Exactly 3 weekdays".
             # We need to decide egg days for the WHOLE week when we enter the week.
             
-            # Quick hack: Generate egg schedule on the fly if not exists
-            if not hasattr(self, 'egg_schedule') or self.egg_schedule_week != week_key:
+            # Generate the egg schedule once per week
+            if self.egg_schedule_week != week_key:
                 self.egg_schedule_week = week_key
                 # Pick 3 days from 1..5
-                days_indices = sorted(random.sample(range(1, 6), 3))
+                days_indices = sorted(self.random.sample(range(1, 6), self.EGG_DAYS_PER_WEEK))
                 self.egg_days = set(days_indices)
                 
             is_egg_day = (weekday in self.egg_days)
@@ -393,155 +1046,417 @@ class MealPlanner:
             # So it returns CATEGORY.
             
             # Staple Selection with Monthly Limits
-            staple_cat = staple_name
-            s_options = self.by_category.get(staple_cat, [])
-            
-            # Limits Definition
-            monthly_limits = {
-                '雞湯麵': 2,
-                '番茄牛肉飯': 1,
-                '義大利麵': 1,
-                '咖哩飯': 1
-            }
-            
-            valid_s_options = []
-            for s in s_options:
-                # Check limit
-                # Match by substring for flexibility
-                limit = 999
-                matched_key = None
-                for key, lim in monthly_limits.items():
-                    if key in s.name:
-                        limit = lim
-                        matched_key = key
-                        break
-                
-                # Check current count
-                # Use the matched key for counting if found, else full name
-                # Actually better to count by Full Name, but check limit against rule.
-                # But if we have multiple variants of "Chicken Soup", we might want to group them?
-                # User gave specific names. Let's assume singular variants for now.
-                # But wait, if name is long "Pasta...", we must count "Pasta..." usage.
-                
-                count = monthly_dish_counts[s.name]
-                if count < limit:
-                    valid_s_options.append(s)
+            if budget is not None:
+                i = day_data.day - 1
+                budget.start_day(sum(planned[i + 1:i - i % 7 + 7]))
+            staple_dish_name, staple_cat = self.pick_staple_dish(staple_name, monthly_dish_counts)
             
-            staple_dish_name = staple_cat # Fallback
-            if valid_s_options:
-                s_dish = random.choice(valid_s_options)
-                staple_dish_name = s_dish.name
-                monthly_dish_counts[s_dish.name] += 1
-            elif s_options:
-                # Fallback if specific limit reached (e.g. no more Curry allowed)
-                # Try to pick something else from the category if possible?
-                # If everything in this category is exhausted (unlikely for Rice, but possible for Combo),
-                # If Combo is exhausted, we might have an issue. 
-                # But Combo has other options? 
-                # If only restricted items are available, we forced to break rule or change category?
-                # Simple fallback: Pick anything from options, ignoring limit (Soft Limit) 
-                # OR Fallback to "Rice" (if Combo failed)?
-                # Let's fallback to "Rice" (Plain) if it's a Combo/Rice category and we ran out of fancy options.
-                
-                # Try finding a non-limited option
-                unlimited = [s for s in s_options if not any(k in s.name for k in monthly_limits)]
-                if unlimited:
-                    s_dish = random.choice(unlimited)
-                    staple_dish_name = s_dish.name
-                    monthly_dish_counts[s_dish.name] += 1
-                else:
-                    # Logic breakdown: User limits might eventually block all Combos if pool is small.
-                    # Current pool: 
-                    # Combo (Noodle): 雞湯麵 (Limit 2). Is there any other Noodle? 
-                    # Let's check CSV... 
-                    # If no other Noodle, then limiting to 2 means only 2 Noodle days/month.
-                    # But we only allow Noodle on Egg Days. 3 Egg Days/week * 4 weeks = 12 days.
-                    # If we block Noodle, what do we serve? Rice?
-                    # Yes, fallback to Rice is safe.
-                    
-                    if staple_cat == 'Combo (Noodle)':
-                         # Fallback to Rice to respect strict limit (Max 2)
-                         # Even if category was Noodle, we switch to Rice dish.
-                         staple_dish_name = '白飯'
-                         staple_cat = 'Rice' # IMPORTANT: Update category so sides are generated for Normal Staple (4 dishes)
-                    else:
-                         staple_dish_name = '白飯' # Safe fallback for Rice category
-                         staple_cat = 'Rice' # Ensure consistency
-            
-            day_data['Staple'] = staple_dish_name
-            
-            # Dinner
-            dinner_dishes = self.generate_dinner(staple_cat, is_egg_day, weekly_used_dishes, weekly_fish_count)
-            day_data['Dinner_Objects'] = dinner_dishes
-            day_data['Dinner'] = [d.name for d in dinner_dishes]
-            
-            # Update trackers
-            for d in dinner_dishes:
-                weekly_used_dishes.add(d.name)
-                if self.identify_meat_type(d.name) == 'Fish':
-                    weekly_fish_count += 1
+            day_data.staple = staple_dish_name
+            if budget is not None:
+                budget.spend(staple_dish_name)
+            
+            # Dinner, then lunch drawn with the same day state (meat types, dishes taken)
+            daily_meats, taken = set(), set()
+            dinner_dishes = self.generate_dinner(staple_cat, is_egg_day, weekly_used_dishes, weekly_fish_count,
+                                                 shopping, daily_meats, taken)
+            day_data.dinner = tuple(dinner_dishes)
+            weekly_fish_count += self._serve_meal(dinner_dishes, current_date, weekly_used_dishes, shopping)
+            if self.lunch:
+                lunch_dishes = self.generate_meal(None, weekly_used_dishes, weekly_fish_count, shopping,
+                                                  daily_meats, taken)
+                day_data.lunch = tuple(lunch_dishes)
+                weekly_fish_count += self._serve_meal(lunch_dishes, current_date, weekly_used_dishes, shopping)
+            if self.rotation is not None:
+                self.rotation.serve(staple_dish_name, current_date)
             
             plan.append(day_data)
+            emit('day_planned', day=day_data)
             
+        self.budget = None
+        emit('plan_finished', plan=plan)
         return plan
 
-    def aggregate_ingredients(self, plan):
+    def generate_plan_within(self, seconds, days=28, start_date=None, history=None, improve=True):
+        """
+        Anytime planning: the best plan found within `seconds` of wall time.
+        Greedy attempts (generate_month_plan) run until one is complete (no
+        short meals, no staple fallbacks) or half the budget is spent; the best
+        one is then improved (improver.py) until the deadline. The first attempt
+        always finishes, so a plan is returned even if it overruns the budget.
+        Each attempt fires the usual plan_started/day_planned/plan_finished events.
+        Returns (plan, report) where report says how close the plan is to full
+        (and how many rule violations validator.py finds in it).
+        """
+        import time
+
+        started = time.perf_counter()
+        deadline = started + seconds
+        user_stats = self.stats
+        best = None # (short meals, staple fallbacks), plan, stats
+        attempts = 0
+        try:
+            while True:
+                self.stats = PlannerStats()
+                plan = self.generate_month_plan(days=days, start_date=start_date, history=history)
+                attempts += 1
+                key = (self.stats.total['short_meal'], self.stats.total['staple_fallback'])
+                if best is None or key < best[0]:
+                    best = (key, plan, self.stats)
+                if best[0] == (0, 0) or time.perf_counter() - started >= seconds / 2:
+                    break
+        finally:
+            self.stats = user_stats
+
+        (short_meals, fallbacks), plan, stats = best
+        if user_stats is not None:
+            # Only the attempt that was kept counts
+            user_stats.total.update(stats.total)
+            for week, c in stats.weekly.items():
+                user_stats.weekly[week].update(c)
+
+        report = {'attempts': attempts, 'improve_moves': 0}
+        remaining = deadline - time.perf_counter()
+        if improve and remaining > 0:
+            from improver import PlanImprover
+            result = PlanImprover(self).improve(plan, iterations=None, seconds=remaining)
+            report['improve_moves'] = result['iterations']
+            report['score'] = result['score_after']
+
+        from validator import validate_plan
+        planned_days = sum(1 for d in plan if d.is_planned)
+        report.update({
+            'violations': validate_plan(plan, self.dishes, self).total(),
+            'short_meals': short_meals,
+            'staple_fallbacks': fallbacks,
+            'complete': short_meals == 0 and fallbacks == 0,
+            'full_days': (planned_days - short_meals) / planned_days if planned_days else 1.0,
+            'seconds': time.perf_counter() - started,
+        })
+        report['deadline_met'] = report['seconds'] <= seconds
+        return plan, report
+
+    def replan_days(self, plan, dates):
+        """
+        Re-solves only the given dates of an existing plan, in place.
+        Every other day is locked; the weekly-used, fish, noodle-gap, combo-spacing
+        and monthly-limit state is derived from the locked days.
+        Returns the set of shopping-list week numbers (see aggregate_ingredients) that changed.
+        """
+        import bisect
+        
+        targets = set(dates)
+        by_name = {d.name: d for d in self.dishes}
+        if self.rotation is not None:
+            self.rotation.start(self.random)
+        self.budget = budget = self.new_budget()
+        
+        def staple_category(day):
+            dish = by_name.get(day.staple)
+            return dish.category if dish else ''
+        
+        # Constraint state from locked days; monthly limits per calendar month
+        monthly_dish_counts = defaultdict(Counter)
+        noodle_dates = []
+        combo_dates = []
+        for day in plan:
+            if day.date in targets:
+                continue
+            cat = staple_category(day)
+            if cat:
+                monthly_dish_counts[day.date.year, day.date.month][day.staple] += 1
+            if 'Noodle' in cat:
+                noodle_dates.append(day.date)
+            if 'Combo' in cat:
+                combo_dates.append(day.date)
+        noodle_dates.sort()
+        combo_dates.sort()
+        
+        def neighbours(sorted_dates, date):
+            i = bisect.bisect_left(sorted_dates, date)
+            before = sorted_dates[i - 1] if i > 0 else None
+            after = sorted_dates[i] if i < len(sorted_dates) else None
+            return before, after
+        
+        changed_weeks = set()
+        for i, day in enumerate(plan):
+            current_date = day.date
+            # Only planned weekdays can be re-solved (weekends/holidays stay empty)
+            if current_date not in targets or not day.is_planned:
+                continue
+            
+            week_key = current_date.isocalendar()[:2]
+            if self.stats is not None:
+                self.stats.week = f"{week_key[0]}-W{week_key[1]:02d}"
+            weekly_used_dishes = set()
+            weekly_fish_count = 0
+            for other in plan:
+                if other is day or other.date.isocalendar()[:2] != week_key:
+                    continue
+                for d in other.dinner + other.lunch:
+                    weekly_used_dishes.add(d.name)
+                    if d.meat_type == 'Fish':
+                        weekly_fish_count += 1
+            
+            # Keep the week's egg schedule: combo days are always egg days
+            is_egg_day = (any(d.category == 'Egg' for d in day.dinner)
+                          or 'Combo' in staple_category(day))
+            
+            self.last_noodle_date, next_noodle = neighbours(noodle_dates, current_date)
+            last_combo, next_combo = neighbours(combo_dates, current_date)
+            staple_name = self.get_daily_staple(current_date, is_egg_day, last_combo,
+                                                next_noodle, next_combo)
+            
+            if budget is not None:
+                # Locked and already re-solved days of the shopping week are spent;
+                # the week's later target days are kept in reserve
+                block = plan[i - i % 7:i - i % 7 + 7]
+                later = [other for other in block if other.date in targets and other.date > current_date]
+                budget.start_week()
+                for other in block:
+                    if other is not day and other not in later and other.is_planned:
+                        budget.spend(other.staple)
+                        for d in other.dinner + other.lunch:
+                            budget.spend(d.name)
+                budget.start_day(sum(1 for other in later if other.is_planned))
+            
+            month_counts = monthly_dish_counts[current_date.year, current_date.month]
+            staple_dish_name, staple_cat = self.pick_staple_dish(staple_name, month_counts)
+            if (budget is not None and not budget.staple_fits(staple_dish_name) and staple_category(day)
+                    and (budget.staple_fits(day.staple) or not budget.dearer(day.staple, staple_dish_name))):
+                # No staple of the category fits the week's limits: keep the day's own
+                # (already paid for in the locked week) unless it is dearer still
+                month_counts[staple_dish_name] -= 1
+                month_counts[day.staple] += 1
+                staple_dish_name, staple_cat = day.staple, staple_category(day)
+            if 'Noodle' in staple_cat:
+                bisect.insort(noodle_dates, current_date)
+            if 'Combo' in staple_cat:
+                bisect.insort(combo_dates, current_date)
+            if budget is not None:
+                budget.spend(staple_dish_name)
+            shopping = None
+            if self.shopping_weight:
+                # The rest of this day's shopping week is locked: start from its ingredients
+                shopping = ShoppingTracker(self)
+                for other in plan[i - i % 7:i - i % 7 + 7]:
+                    if other is not day:
+                        for d in other.dinner + other.lunch:
+                            shopping.add(d)
+            daily_meats, taken = set(), set()
+            dinner_dishes = self.generate_dinner(staple_cat, is_egg_day, weekly_used_dishes, weekly_fish_count,
+                                                 shopping, daily_meats, taken)
+            
+            day.staple = staple_dish_name
+            day.dinner = tuple(dinner_dishes)
+            weekly_fish_count += self._serve_meal(dinner_dishes, current_date, weekly_used_dishes, shopping)
+            if self.lunch:
+                day.lunch = tuple(self.generate_meal(None, weekly_used_dishes, weekly_fish_count, shopping,
+                                                     daily_meats, taken))
+                self._serve_meal(day.lunch, current_date, weekly_used_dishes, shopping)
+            if self.rotation is not None:
+                self.rotation.serve(staple_dish_name, current_date)
+            changed_weeks.add((i // 7) + 1)
+            emit('day_planned', day=day)
+        
+        self.last_noodle_date = noodle_dates[-1] if noodle_dates else None
+        self.budget = None
+        if budget is not None and changed_weeks:
+            # The locked days may leave no room: say so instead of saving an over-limit week quietly
+            from validator import validate_plan
+            for message in validate_plan(plan, self.dishes, self).violations['budget']:
+                warn(f"Warning: over the limits after re-planning: {message}")
+        return changed_weeks
+
+    def aggregate_ingredients(self, plan, weeks=None):
         # Weekly aggregation
         # Returns a dict: Week Num -> Counter of ingredients
+        # weeks: optional set of week numbers to aggregate (incremental updates)
         shopping_lists = {}
         
         for i, day in enumerate(plan):
             week_num = (i // 7) + 1
+            if weeks is not None and week_num not in weeks:
+                continue
             if week_num not in shopping_lists:
                 shopping_lists[week_num] = Counter()
             
-            all_dishes = day['Dinner_Objects']
+            all_dishes = day.dinner + day.lunch
             for dish in all_dishes:
                 for ing in dish.ingredients:
                     shopping_lists[week_num][ing] += 1
                     
         return shopping_lists
 
+def parse_weight(value, name=None):
+    # Optional 'Weight' column: blank -> 1, bad or negative values -> 1 with a warning
+    if value is None or not str(value).strip():
+        return 1.0
+    try:
+        weight = float(value)
+    except ValueError:
+        weight = -1
+    if weight < 0:
+        warn(f"Warning: Invalid weight {value!r} for '{name}', using 1.")
+        return 1.0
+    return weight
+
+def parse_meat_type(value):
+    # Optional 'MeatType' column: blank -> detect from the name, None/- -> no meat
+    value = (value or '').strip()
+    if not value:
+        return None
+    if value.lower() in ('none', '-', 'no'):
+        return ''
+    return value
+
 def load_dishes_from_csv(filepath):
-    dishes = []
+    from sqlite_store import is_db_path
+    if is_db_path(filepath):
+        from sqlite_store import load_dishes_from_db
+        dishes = load_dishes_from_db(filepath)
+        emit('dishes_loaded', path=filepath, count=len(dishes))
+        return dishes
+    
     try:
         with open(filepath, 'r', encoding='utf-8-sig') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                # Handle potential key case sensitivity or whitespace
-                name = row.get('Dish Name') or row.get('name')
-                cat = row.get('Category') or row.get('category')
-                ings = row.get('Ingredients') or row.get('ingredients')
-                
-                if name and cat:
-                    dishes.append(Dish(name, cat, ings if ings else ""))
+            dishes = read_dishes(f)
     except Exception as e:
         print(f"Error loading CSV: {e}")
         return []
+    emit('dishes_loaded', path=filepath, count=len(dishes))
     return dishes
 
-def save_plan_to_csv(plan, filename="meal_plan.csv"):
+def read_dishes(f):
+    """Dishes from an open catalog CSV file (or any iterable of CSV lines)."""
+    dishes = []
+    reader = csv.DictReader(f)
+    for row in reader:
+        # Handle potential key case sensitivity or whitespace
+        name = row.get('Dish Name') or row.get('name')
+        cat = row.get('Category') or row.get('category')
+        ings = row.get('Ingredients') or row.get('ingredients')
+        weight = parse_weight(row.get('Weight') or row.get('weight'), name)
+        meat_type = parse_meat_type(row.get('MeatType') or row.get('Meat Type') or row.get('meat_type'))
+        
+        if name and cat:
+            dishes.append(Dish(name, cat, ings if ings else "", weight, meat_type, parse_attributes(row, name)))
+    return dishes
+
+COLUMNAR_EXTENSIONS = ('.parquet', '.feather', '.arrow')
+
+def is_columnar_path(path):
+    return isinstance(path, str) and path.lower().endswith(COLUMNAR_EXTENSIONS)
+
+def iter_table_rows(filepath, columns=None):
+    """
+    Rows of a saved plan or shopping list as dicts of strings, read from CSV or
+    from a columnar file (Parquet/Feather). Columnar files only read `columns`
+    when given.
+    """
+    if is_columnar_path(filepath):
+        if filepath.lower().endswith('.parquet'):
+            df = pd.read_parquet(filepath, columns=columns)
+        else:
+            df = pd.read_feather(filepath, columns=columns)
+        for record in df.astype(object).to_dict('records'):
+            yield {k: ('' if pd.isna(v) else str(v)) for k, v in record.items()}
+        return
+    
+    with open(filepath, 'r', encoding='utf-8-sig', newline='') as f:
+        for row in csv.DictReader(f):
+            yield row
+
+def load_plan_from_csv(filepath, dishes, household="default"):
+    """
+    Loads a plan written by save_plan_to_csv back into DayPlans.
+    Dish names are resolved against the catalog; unknown names are skipped.
+    """
+    import datetime
+    from sqlite_store import is_db_path
+    if is_db_path(filepath):
+        from sqlite_store import load_plan_from_db
+        return load_plan_from_db(filepath, dishes, household)
+    
+    by_name = {d.name: d for d in dishes}
+    plan = []
+    missing = set()
+    dish_cols = lunch_cols = None
+    for row in iter_table_rows(filepath):
+        if dish_cols is None:
+            dish_cols = [c for c in row if c.startswith('Dish ')]
+            lunch_cols = [c for c in row if c.startswith('Lunch ')]
+        date = datetime.datetime.strptime(row['Date'], "%Y-%m-%d").date()
+        meals = []
+        for cols in (dish_cols, lunch_cols):
+            meal = []
+            for col in cols:
+                name = row.get(col)
+                if not name:
+                    continue
+                if name in by_name:
+                    meal.append(by_name[name])
+                else:
+                    missing.add(name)
+            meals.append(meal)
+        dinner, lunch = meals
+        plan.append(DayPlan(int(row['Day']), date, row.get('Staple') or '', dinner, lunch))
+    if missing:
+        warn(f"Warning: {len(missing)} dishes in {filepath} not found in catalog: {', '.join(sorted(missing))}")
+    return plan
+
+def load_shopping_list(filepath, household="default", start_date=None, end_date=None):
+    # Inverse of save_shopping_list: Week Num -> Counter of ingredients
+    # (.db: the weeks of the plan from start_date to end_date, default the latest saved)
+    from sqlite_store import is_db_path
+    if is_db_path(filepath):
+        from sqlite_store import load_shopping_list_from_db
+        return load_shopping_list_from_db(filepath, household, start_date, end_date)
+    
+    shopping_lists = {}
+    for row in iter_table_rows(filepath):
+        week = int(row['Week'])
+        shopping_lists.setdefault(week, Counter())[row['Ingredient']] += int(row['Count'])
+    return shopping_lists
+
+def load_pantry(filepath):
+    """
+    Ingredients on hand, for shopping-aware planning: one per line (or comma
+    separated), '#' starts a comment.
+    """
+    pantry = set()
+    try:
+        with open(filepath, 'r', encoding='utf-8-sig') as f:
+            for line in f:
+                line = line.split('#', 1)[0]
+                pantry.update(p.strip() for p in line.split(',') if p.strip())
+    except OSError as e:
+        print(f"Error loading pantry: {e}")
+        return set()
+    return pantry
+
+def plan_to_dataframe(plan):
     # Flatten for CSV
     # Day, Meal, Dish 1, Dish 2, Dish 3, Dish 4
     rows = []
     for day in plan:
         # Dinner Only
         row_d = {
-            'Day': day['Day'], 
-            'Date': day['DateStr'], 
-            'Weekday': day['Weekday'], 
-            'Staple': day['Staple'],
+            'Day': day.day, 
+            'Date': day.date_str, 
+            'Weekday': day.weekday, 
+            'Staple': day.staple,
             # 'Meal': 'Dinner' # Redundant if only one meal
         }
-        for i, d in enumerate(day['Dinner']):
-            row_d[f'Dish {i+1}'] = d
+        for i, d in enumerate(day.dinner):
+            row_d[f'Dish {i+1}'] = d.name
+        # Lunch mode: 'Lunch 1', 'Lunch 2', ... after the dinner dishes
+        for i, d in enumerate(day.lunch):
+            row_d[f'Lunch {i+1}'] = d.name
         rows.append(row_d)
         
-    df = pd.DataFrame(rows)
-    df.to_csv(filename, index=False, encoding='utf-8-sig')
-    print(f"Plan saved to {filename}")
+    return pd.DataFrame(rows)
 
-def save_shopping_list(shopping_lists, filename="shopping_list.csv"):
+def shopping_to_dataframe(shopping_lists):
     rows = []
     for week, counter in shopping_lists.items():
         for ingredient, count in counter.items():
@@ -551,9 +1466,92 @@ def save_shopping_list(shopping_lists, filename="shopping_list.csv"):
                 'Count': count
             })
             
-    df = pd.DataFrame(rows)
-    df.to_csv(filename, index=False, encoding='utf-8-sig')
-    print(f"Shopping list saved to {filename}")
+    return pd.DataFrame(rows)
+
+def totals_to_dataframe(week_totals):
+    # Attribute totals per shopping week ({week: {attr: total}}), columns named as in the catalog
+    from attributes import ATTRIBUTES
+    rows = [{'Week': week, **{ATTRIBUTES[attr][0]: value for attr, value in values.items()}}
+            for week, values in week_totals.items()]
+    return pd.DataFrame(rows)
+
+def totals_path(filename):
+    # Companion file of a shopping list for its week totals: shopping_list_totals.csv
+    root, ext = os.path.splitext(filename)
+    return f"{root}_totals{ext}"
+
+def save_columnar(df, filename):
+    """
+    Writes a DataFrame as Parquet (.parquet) or Arrow IPC / Feather (.feather, .arrow).
+    Date columns become typed dates and text columns are dictionary-encoded,
+    so readers get compact, typed, column-prunable files. Requires pyarrow.
+    """
+    try:
+        import pyarrow
+    except ImportError:
+        print(f"Error: Writing {filename} requires pyarrow (pip install pyarrow)")
+        return False
+    
+    write_columnar(df, filename, 'parquet' if filename.lower().endswith('.parquet') else 'feather')
+    return True
+
+def write_columnar(df, target, fmt='parquet'):
+    # target: a path or a binary file object (plan_api.py renders into memory)
+    import pyarrow
+    df = df.copy()
+    for col in df.columns:
+        if col == 'Date':
+            df[col] = pd.to_datetime(df[col]).dt.date
+            df[col] = df[col].astype(pd.ArrowDtype(pyarrow.date32()))
+        elif df[col].dtype == object or pd.api.types.is_string_dtype(df[col]):
+            df[col] = df[col].astype('category')
+    
+    if fmt == 'parquet':
+        df.to_parquet(target, index=False)
+    else:
+        df.to_feather(target)
+
+def save_plan_to_csv(plan, filename="meal_plan.csv", household="default"):
+    from sqlite_store import is_db_path
+    if is_db_path(filename):
+        from sqlite_store import save_plan_to_db
+        save_plan_to_db(plan, filename, household)
+        emit('file_written', path=filename, kind='plan')
+        return
+    
+    df = plan_to_dataframe(plan)
+    if is_columnar_path(filename):
+        if not save_columnar(df, filename):
+            return
+    else:
+        df.to_csv(filename, index=False, encoding='utf-8-sig')
+    print(f"Plan saved to {filename}")
+    emit('file_written', path=filename, kind='plan')
+
+def save_shopping_list(shopping_lists, filename="shopping_list.csv", household="default", plan_start=None,
+                       totals=None):
+    """
+    totals: attribute totals per shopping week (MealPlanner.plan_totals(plan)[1]),
+    saved next to the list (shopping_list_totals.csv, or a shopping_totals table in .db).
+    """
+    from sqlite_store import is_db_path
+    if is_db_path(filename):
+        from sqlite_store import save_shopping_list_to_db
+        save_shopping_list_to_db(shopping_lists, filename, household, plan_start, totals)
+        emit('file_written', path=filename, kind='shopping')
+        return
+    
+    frames = [(filename, shopping_to_dataframe(shopping_lists))]
+    if totals:
+        frames.append((totals_path(filename), totals_to_dataframe(totals)))
+    for path, df in frames:
+        if is_columnar_path(path):
+            if not save_columnar(df, path):
+                return
+        else:
+            df.to_csv(path, index=False, encoding='utf-8-sig')
+        print(f"Shopping list saved to {path}" if path == filename else f"Week totals saved to {path}")
+        emit('file_written', path=path, kind='shopping')
 
 if __name__ == "__main__":
     # Test Run
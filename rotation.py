@@ -0,0 +1,142 @@
+"""
+Least-recently-served rotation for the planner (MealPlanner(rotation=...)).
+
+Each category pool is a heap keyed by (last served date, serve count), so the
+planner takes the dish that has waited longest, fewest servings first, in
+O(log n) instead of sampling uniformly. Never-served dishes come first, in
+random order. The serve log is a small JSON file carried across runs:
+
+    python main.py --rotation rotation.json
+    python rotation.py rotation.json --category Protein     # show the queue
+"""
+import argparse
+import datetime
+import heapq
+import itertools
+import json
+import os
+import random
+import sys
+from collections import defaultdict
+
+
+class RotationScheduler:
+    def __init__(self, dishes, path=None):
+        self.path = path
+        self.by_name = {d.name: d for d in dishes}
+        self.by_category = defaultdict(list)
+        for d in dishes:
+            self.by_category[d.category].append(d)
+        self.saved = {} # dish name -> (last served date ordinal, serve count), as persisted
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            for name, entry in data.get('dishes', {}).items():
+                self.saved[name] = (datetime.date.fromisoformat(entry['last']).toordinal(), entry['count'])
+        self.start()
+
+    def start(self, rng=random):
+        """Working state for one planning run, from the persisted serve log; rng breaks ties."""
+        self.random = rng
+        self.state = dict(self.saved)
+        self._seq = itertools.count()
+        self.heaps = {}
+        for cat, dishes in self.by_category.items():
+            heap = [self._entry(d) for d in dishes]
+            heapq.heapify(heap)
+            self.heaps[cat] = heap
+
+    def _entry(self, dish):
+        last, count = self.state.get(dish.name, (0, 0))
+        # Random tie-break so equal keys (e.g. never served) rotate in random order
+        return (last, count, self.random.random(), next(self._seq), dish)
+
+    def _current(self, entry):
+        # Entries are never updated in place: serve() pushes a new one, old ones are skipped
+        return self.state.get(entry[4].name, (0, 0)) == entry[:2]
+
+    def pick(self, categories, count, is_valid):
+        """
+        Up to `count` dishes from the given categories, least recently served first,
+        for which is_valid(dish) holds. Rejected entries go back on their heaps.
+        """
+        heaps = [self.heaps[c] for c in categories if c in self.heaps]
+        picked = []
+        popped = []
+        while len(picked) < count:
+            # Next entry across the category heaps
+            heap = min((h for h in heaps if h), key=lambda h: h[0], default=None)
+            if heap is None:
+                break
+            entry = heapq.heappop(heap)
+            if not self._current(entry):
+                continue
+            popped.append((heap, entry))
+            if is_valid(entry[4]):
+                picked.append(entry[4])
+        for heap, entry in popped:
+            heapq.heappush(heap, entry)
+        return picked
+
+    def serve(self, name, date):
+        """Records a serving; replayed dates (not after the last serving) are ignored."""
+        dish = self.by_name.get(name)
+        if dish is None:
+            return
+        last, count = self.state.get(name, (0, 0))
+        day = date.toordinal()
+        if day <= last:
+            return
+        self.state[name] = (day, count + 1)
+        heapq.heappush(self.heaps[dish.category], self._entry(dish))
+
+    def record_plan(self, plan):
+        """Adds the staples and side dishes of a final plan to the persisted serve log."""
+        self.start()
+        for day in plan:
+            if not day.is_planned:
+                continue
+            self.serve(day.staple, day.date)
+            for d in day.dinner + day.lunch:
+                self.serve(d.name, day.date)
+        self.saved = dict(self.state)
+
+    def queue(self, category):
+        """(name, last served date or None, count) of a category, next to be served first."""
+        rows = sorted((self.state.get(d.name, (0, 0)), d.name) for d in self.by_category.get(category, []))
+        return [(name, datetime.date.fromordinal(last) if last else None, count)
+                for (last, count), name in rows]
+
+    def save(self, path=None):
+        path = path or self.path
+        data = {'dishes': {name: {'last': datetime.date.fromordinal(last).isoformat(), 'count': count}
+                           for name, (last, count) in sorted(self.saved.items())}}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        print(f"Rotation state saved to {path}")
+
+
+def main():
+    from planner import load_dishes_from_csv
+
+    parser = argparse.ArgumentParser(description="Show the least-recently-served rotation queue")
+    parser.add_argument('state', help='Rotation state file (JSON)')
+    parser.add_argument('--input', '-i', default='dishes.csv', help='Path to the dishes CSV file')
+    parser.add_argument('--category', '-c', default=None, help='Only this category')
+    parser.add_argument('--top', type=int, default=10, help='Dishes per category (default: 10)')
+    args = parser.parse_args()
+
+    dishes = load_dishes_from_csv(args.input)
+    if not dishes:
+        print("Error: No dishes loadable from file. Check format.")
+        sys.exit(1)
+    rotation = RotationScheduler(dishes, args.state)
+    categories = [args.category] if args.category else sorted(rotation.by_category)
+    for cat in categories:
+        print(f"{cat}:")
+        for name, last, count in rotation.queue(cat)[:args.top]:
+            print(f"  {name:20s} {last.isoformat() if last else 'never':>10s}  x{count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Map-reduce shopping aggregation across many stored meal plans.
+
+Streams existing meal_plan.csv files (or the output directories of a batch run),
+resolves dish names to ingredients through an indexed catalog and reduces the
+per-file weekly counters into one combined purchase list.
+"""
+import argparse
+import csv
+import datetime
+import fnmatch
+import os
+import sys
+from collections import Counter, defaultdict
+from multiprocessing import Pool
+
+from planner import load_dishes_from_csv, save_shopping_list, is_columnar_path, iter_table_rows
+
+PLAN_PATTERNS = ("meal_plan*.csv", "meal_plan*.parquet", "meal_plan*.feather", "meal_plan*.arrow")
+
+# Worker state (set once per process by _init_worker)
+_WORKER_INDEX = None
+_WORKER_RANGE = (None, None)
+
+
+def build_ingredient_index(dishes):
+    """
+    Dish name -> tuple of ingredients.
+    Built once from the catalog and shared by every worker.
+    """
+    return {d.name: tuple(d.ingredients) for d in dishes}
+
+
+def iter_plan_files(paths, patterns=PLAN_PATTERNS):
+    """
+    Yields plan files one at a time.
+    Directories are walked recursively (batch run output), files are passed through.
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if any(fnmatch.fnmatch(name, p) for p in patterns):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def week_start(date):
+    # Weeks are keyed by their Monday so plans from different households line up
+    return date - datetime.timedelta(days=date.weekday())
+
+
+def count_plan_file(filepath, index, start_date=None, end_date=None):
+    """
+    Map step: weekly ingredient counters for a single plan file.
+    The file is streamed row by row, never loaded as a whole.
+    Returns (weekly counters, unresolved dish names).
+    """
+    weekly = defaultdict(Counter)
+    unresolved = Counter()
+
+    if is_columnar_path(filepath):
+        return _count_columnar_file(filepath, index, start_date, end_date)
+
+    with open(filepath, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if not header or "Date" not in header:
+            return {}, unresolved
+
+        date_col = header.index("Date")
+        dish_cols = [i for i, h in enumerate(header) if h.startswith(("Dish ", "Lunch "))]
+
+        for row in reader:
+            if len(row) <= date_col or not row[date_col]:
+                continue
+            date = datetime.date.fromisoformat(row[date_col])
+            if start_date and date < start_date:
+                continue
+            if end_date and date > end_date:
+                continue
+
+            counter = None
+            for i in dish_cols:
+                if i >= len(row) or not row[i]:
+                    continue
+                ingredients = index.get(row[i])
+                if ingredients is None:
+                    unresolved[row[i]] += 1
+                    continue
+                if counter is None:
+                    counter = weekly[week_start(date)]
+                counter.update(ingredients)
+
+    return dict(weekly), unresolved
+
+
+def _columnar_names(filepath):
+    import pyarrow.parquet
+    import pyarrow.ipc
+
+    if filepath.lower().endswith(".parquet"):
+        return pyarrow.parquet.read_schema(filepath).names
+    with pyarrow.ipc.open_file(filepath) as reader:
+        return reader.schema.names
+
+
+def _count_columnar_file(filepath, index, start_date=None, end_date=None):
+    # Column-pruned read: only Date and the Dish/Lunch columns are loaded
+    columns = [c for c in _columnar_names(filepath) if c == "Date" or c.startswith(("Dish ", "Lunch "))]
+    weekly = defaultdict(Counter)
+    unresolved = Counter()
+    for row in iter_table_rows(filepath, columns=columns):
+        if not row.get("Date"):
+            continue
+        date = datetime.date.fromisoformat(row["Date"])
+        if (start_date and date < start_date) or (end_date and date > end_date):
+            continue
+        for col in columns:
+            name = row[col]
+            if col == "Date" or not name:
+                continue
+            ingredients = index.get(name)
+            if ingredients is None:
+                unresolved[name] += 1
+            else:
+                weekly[week_start(date)].update(ingredients)
+    return dict(weekly), unresolved
+
+
+def _init_worker(index, start_date, end_date):
+    global _WORKER_INDEX, _WORKER_RANGE
+    _WORKER_INDEX = index
+    _WORKER_RANGE = (start_date, end_date)
+
+
+def _count_worker(filepath):
+    try:
+        return count_plan_file(filepath, _WORKER_INDEX, *_WORKER_RANGE)
+    except Exception as e:
+        print(f"Error reading plan {filepath}: {e}")
+        return {}, Counter()
+
+
+def aggregate_plan_files(paths, dishes, start_date=None, end_date=None, workers=None, chunksize=16):
+    """
+    Reduce step: merges the weekly counters of every plan file into one purchase list.
+    Returns (shopping_lists keyed by week start date, unresolved dish names, files read).
+    """
+    index = build_ingredient_index(dishes)
+    files = iter_plan_files(paths)
+
+    total = defaultdict(Counter)
+    unresolved = Counter()
+    n_files = 0
+
+    def reduce_one(result):
+        weekly, missing = result
+        for week, counter in weekly.items():
+            total[week].update(counter)
+        unresolved.update(missing)
+
+    if workers == 1:
+        _init_worker(index, start_date, end_date)
+        for filepath in files:
+            reduce_one(_count_worker(filepath))
+            n_files += 1
+    else:
+        with Pool(processes=workers, initializer=_init_worker,
+                  initargs=(index, start_date, end_date)) as pool:
+            for result in pool.imap_unordered(_count_worker, files, chunksize=chunksize):
+                reduce_one(result)
+                n_files += 1
+
+    shopping_lists = {week: total[week] for week in sorted(total)}
+    return shopping_lists, unresolved, n_files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Combined shopping list across many stored meal plans")
+    parser.add_argument('plans', nargs='+', help='Plan CSV files or batch output directories')
+    parser.add_argument('--catalog', '-c', default='dishes.csv', help='Dishes CSV used to resolve ingredients')
+    parser.add_argument('--output', '-o', default='combined_shopping_list.csv', help='Output filename for the combined list')
+    parser.add_argument('--start-date', type=str, default=None, help='First date to include (YYYY-MM-DD)')
+    parser.add_argument('--end-date', type=str, default=None, help='Last date to include (YYYY-MM-DD)')
+    parser.add_argument('--workers', '-j', type=int, default=None, help='Worker processes (default: CPU count, 1 = no pool)')
+
+    args = parser.parse_args()
+
+    try:
+        start_date = datetime.date.fromisoformat(args.start_date) if args.start_date else None
+        end_date = datetime.date.fromisoformat(args.end_date) if args.end_date else None
+    except ValueError:
+        print("Error: Invalid date format. Please use YYYY-MM-DD.")
+        sys.exit(1)
+
+    dishes = load_dishes_from_csv(args.catalog)
+    if not dishes:
+        print("Error: No dishes loadable from catalog. Check format.")
+        sys.exit(1)
+
+    shopping, unresolved, n_files = aggregate_plan_files(
+        args.plans, dishes, start_date, end_date, workers=args.workers)
+
+    print(f"Aggregated {n_files} plan files into {len(shopping)} weeks.")
+    if unresolved:
+        print(f"Warning: {sum(unresolved.values())} dishes not found in catalog "
+              f"({len(unresolved)} distinct), e.g. {', '.join(list(unresolved)[:5])}")
+
+    save_shopping_list(shopping, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,374 @@
+"""
+Optional SQLite storage backend for catalogs, plans and shopping history.
+
+planner.load_dishes_from_csv / save_plan_to_csv / save_shopping_list (and the
+matching loaders) delegate here when the path ends in .db, .sqlite or .sqlite3.
+Tables are indexed for the common lookups (dishes by category and meat type,
+plan days by date and household, shopping counts by week) and every write is
+a single bulk transaction.
+
+Saved plans accumulate as history: plan days are keyed by date, shopping weeks
+by the date they start, and the plans table records the date range of every
+save so a load returns one plan (the latest by default), not a mix.
+"""
+import argparse
+import datetime
+import sqlite3
+import sys
+from collections import Counter
+
+DB_EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
+# Dish attribute columns, named like the attributes.ATTRIBUTES keys
+ATTRIBUTE_COLUMNS = ('cost', 'prep_time', 'calories')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dishes (
+    id          INTEGER PRIMARY KEY,
+    name        TEXT NOT NULL UNIQUE,
+    category    TEXT NOT NULL,
+    meat_type   TEXT,
+    ingredients TEXT NOT NULL DEFAULT '',
+    weight      REAL NOT NULL DEFAULT 1,
+    cost        REAL,
+    prep_time   REAL,
+    calories    REAL
+);
+CREATE INDEX IF NOT EXISTS idx_dishes_category ON dishes(category);
+CREATE INDEX IF NOT EXISTS idx_dishes_meat_type ON dishes(meat_type);
+
+CREATE TABLE IF NOT EXISTS plans (
+    id         INTEGER PRIMARY KEY,
+    household  TEXT NOT NULL,
+    start_date TEXT NOT NULL,
+    end_date   TEXT NOT NULL,
+    saved_at   TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_plans_household ON plans(household, id);
+
+CREATE TABLE IF NOT EXISTS plan_days (
+    household TEXT NOT NULL,
+    date      TEXT NOT NULL,
+    day       INTEGER,
+    weekday   TEXT,
+    staple    TEXT,
+    PRIMARY KEY (household, date)
+);
+CREATE INDEX IF NOT EXISTS idx_plan_days_date ON plan_days(date, household);
+
+CREATE TABLE IF NOT EXISTS plan_dishes (
+    household TEXT NOT NULL,
+    date      TEXT NOT NULL,
+    meal      TEXT NOT NULL,
+    position  INTEGER NOT NULL,
+    dish_name TEXT NOT NULL,
+    category  TEXT,
+    meat_type TEXT,
+    PRIMARY KEY (household, date, meal, position)
+);
+CREATE INDEX IF NOT EXISTS idx_plan_dishes_meat_type ON plan_dishes(meat_type, date);
+CREATE INDEX IF NOT EXISTS idx_plan_dishes_dish ON plan_dishes(dish_name, date);
+
+CREATE TABLE IF NOT EXISTS shopping (
+    household  TEXT NOT NULL,
+    week       INTEGER NOT NULL,
+    week_start TEXT,
+    ingredient TEXT NOT NULL,
+    count      INTEGER NOT NULL,
+    PRIMARY KEY (household, week_start, ingredient)
+);
+CREATE INDEX IF NOT EXISTS idx_shopping_week_start ON shopping(week_start, household);
+
+CREATE TABLE IF NOT EXISTS shopping_totals (
+    household  TEXT NOT NULL,
+    week       INTEGER NOT NULL,
+    week_start TEXT,
+    cost       REAL,
+    prep_time  REAL,
+    calories   REAL,
+    PRIMARY KEY (household, week_start)
+);
+"""
+
+
+def is_db_path(path):
+    return isinstance(path, str) and path.lower().endswith(DB_EXTENSIONS)
+
+
+def connect(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA)
+    # Databases created before the weight column
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(dishes)")}
+    if 'weight' not in columns:
+        conn.execute("ALTER TABLE dishes ADD COLUMN weight REAL NOT NULL DEFAULT 1")
+    # ... and before the attribute columns (attributes.py; NULL = unknown)
+    for attr in ATTRIBUTE_COLUMNS:
+        if attr not in columns:
+            conn.execute(f"ALTER TABLE dishes ADD COLUMN {attr} REAL")
+    # ... and when shopping weeks were keyed by their plan-relative number (each
+    # plan overwrote the last one's weeks): rebuilt keyed by week_start, rows kept
+    rekeyed = False
+    for table in ('shopping', 'shopping_totals'):
+        key = [row[1] for row in conn.execute(f"PRAGMA table_info({table})") if row[5]]
+        if 'week' in key:
+            with conn:
+                conn.execute("DROP INDEX IF EXISTS idx_shopping_week_start")
+                conn.execute(f"ALTER TABLE {table} RENAME TO {table}_old")
+            conn.executescript(SCHEMA)
+            with conn:
+                conn.execute(f"INSERT OR REPLACE INTO {table} SELECT * FROM {table}_old")
+                conn.execute(f"DROP TABLE {table}_old")
+            rekeyed = True
+    if rekeyed:
+        conn.executescript(SCHEMA)
+    return conn
+
+
+def plan_range(conn, household="default", plan_id=None):
+    """(start_date, end_date) of a saved plan (the household's latest by default), or None."""
+    if plan_id is not None:
+        row = conn.execute("SELECT start_date, end_date FROM plans WHERE id = ? AND household = ?",
+                           (plan_id, household)).fetchone()
+        if row is None:
+            raise ValueError(f"no plan {plan_id} for household '{household}'")
+        return row
+    return conn.execute("SELECT start_date, end_date FROM plans WHERE household = ? ORDER BY id DESC LIMIT 1",
+                        (household,)).fetchone()
+
+
+def save_dishes_to_db(dishes, db_path):
+    # '' = no meat, so loading doesn't classify again; NULL (older rows) is re-classified
+    rows = [(d.name, d.category, d.meat_type or '', ', '.join(d.ingredients), d.weight,
+             *(d.attrs.get(attr) for attr in ATTRIBUTE_COLUMNS))
+            for d in dishes]
+    conn = connect(db_path)
+    try:
+        with conn:
+            conn.executemany(
+                "INSERT INTO dishes (name, category, meat_type, ingredients, weight, cost, prep_time, calories) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET category=excluded.category, "
+                "meat_type=excluded.meat_type, ingredients=excluded.ingredients, weight=excluded.weight, "
+                "cost=excluded.cost, prep_time=excluded.prep_time, calories=excluded.calories", rows)
+    finally:
+        conn.close()
+    print(f"{len(rows)} dishes saved to {db_path}")
+
+
+def load_dishes_from_db(db_path, category=None):
+    from planner import Dish
+
+    conn = connect(db_path)
+    try:
+        columns = "name, category, ingredients, weight, meat_type, cost, prep_time, calories"
+        if category:
+            cur = conn.execute(f"SELECT {columns} FROM dishes WHERE category = ? ORDER BY id", (category,))
+        else:
+            cur = conn.execute(f"SELECT {columns} FROM dishes ORDER BY id")
+        return [Dish(name, cat, ings or "", weight, meat,
+                     {attr: v for attr, v in zip(ATTRIBUTE_COLUMNS, values) if v is not None})
+                for name, cat, ings, weight, meat, *values in cur]
+    finally:
+        conn.close()
+
+
+def save_plan_to_db(plan, db_path, household="default"):
+    """
+    Replaces the household's rows for every date in the plan in one transaction
+    (other dates are kept as history) and returns the id of the saved plan.
+    """
+
+    day_rows = []
+    dish_rows = []
+    for day in plan:
+        date_str = day.date_str
+        day_rows.append((household, date_str, day.day, day.weekday, day.staple))
+        for meal, dishes in (('Dinner', day.dinner), ('Lunch', day.lunch)):
+            for i, d in enumerate(dishes):
+                dish_rows.append((household, date_str, meal, i + 1, d.name, d.category, d.meat_type))
+
+    dates = [(household, row[1]) for row in day_rows]
+    plan_id = None
+    conn = connect(db_path)
+    try:
+        with conn:
+            conn.executemany("DELETE FROM plan_dishes WHERE household = ? AND date = ?", dates)
+            conn.executemany("INSERT OR REPLACE INTO plan_days VALUES (?, ?, ?, ?, ?)", day_rows)
+            conn.executemany("INSERT INTO plan_dishes VALUES (?, ?, ?, ?, ?, ?, ?)", dish_rows)
+            if plan:
+                plan_id = conn.execute(
+                    "INSERT INTO plans (household, start_date, end_date, saved_at) VALUES (?, ?, ?, ?)",
+                    (household, plan[0].date_str, plan[-1].date_str,
+                     datetime.datetime.now().isoformat(timespec='seconds'))).lastrowid
+    finally:
+        conn.close()
+    print(f"Plan saved to {db_path} (household '{household}')")
+    return plan_id
+
+
+def load_plan_from_db(db_path, dishes, household="default", plan_id=None):
+    """
+    The days of one saved plan: plan_id, or the household's latest. A later plan
+    over some of its dates replaced those days. Databases from before the plans
+    table (no saved ranges) load every stored day.
+    """
+    from planner import DayPlan
+
+    by_name = {d.name: d for d in dishes}
+    conn = connect(db_path)
+    try:
+        where, params = "household = ?", [household]
+        dates = plan_range(conn, household, plan_id)
+        if dates is not None:
+            where += " AND date BETWEEN ? AND ?"
+            params.extend(dates)
+        days = conn.execute(
+            f"SELECT date, day, weekday, staple FROM plan_days WHERE {where} ORDER BY date", params).fetchall()
+        meals = {'Dinner': {}, 'Lunch': {}}
+        for meal, date_str, name in conn.execute(
+                f"SELECT meal, date, dish_name FROM plan_dishes WHERE {where} AND meal IN ('Dinner', 'Lunch') "
+                "ORDER BY date, position", params):
+            if name in by_name:
+                meals[meal].setdefault(date_str, []).append(by_name[name])
+    finally:
+        conn.close()
+
+    dinners, lunches = meals['Dinner'], meals['Lunch']
+    return [DayPlan(day_num, datetime.date.fromisoformat(date_str), staple or '',
+                    dinners.get(date_str, ()), lunches.get(date_str, ()))
+            for date_str, day_num, weekday, staple in days]
+
+
+def save_shopping_list_to_db(shopping_lists, db_path, household="default", plan_start=None, totals=None):
+    """
+    Weeks are keyed by the date they start, so the lists of earlier plans stay
+    for cross-plan queries; the plan-relative week number (as in
+    aggregate_ingredients) is kept for reference. plan_start defaults to the
+    start of the household's latest saved plan.
+    totals: attribute totals per week, stored in shopping_totals.
+    """
+    conn = connect(db_path)
+    try:
+        if plan_start is None:
+            dates = plan_range(conn, household)
+            plan_start = dates and datetime.date.fromisoformat(dates[0])
+        if plan_start is None and (shopping_lists or totals):
+            raise ValueError("the shopping list needs the plan's start date (plan_start)")
+
+        def week_start(week):
+            return (plan_start + datetime.timedelta(days=7 * (week - 1))).isoformat()
+
+        rows = []
+        for week, counter in shopping_lists.items():
+            for ingredient, count in counter.items():
+                rows.append((household, week, week_start(week), ingredient, count))
+        total_rows = [(household, week, week_start(week), *(values.get(attr) for attr in ATTRIBUTE_COLUMNS))
+                      for week, values in (totals or {}).items()]
+
+        with conn:
+            conn.executemany("DELETE FROM shopping WHERE household = ? AND week_start = ?",
+                             [(household, week_start(w)) for w in shopping_lists])
+            conn.executemany("INSERT INTO shopping VALUES (?, ?, ?, ?, ?)", rows)
+            if total_rows:
+                conn.executemany("INSERT OR REPLACE INTO shopping_totals VALUES (?, ?, ?, ?, ?, ?)", total_rows)
+    finally:
+        conn.close()
+    print(f"Shopping list saved to {db_path} (household '{household}')")
+
+
+def load_shopping_list_from_db(db_path, household="default", start_date=None, end_date=None):
+    """
+    The weeks starting in [start_date, end_date] (default: the household's latest
+    saved plan), numbered from start_date like aggregate_ingredients.
+    """
+    shopping_lists = {}
+    conn = connect(db_path)
+    try:
+        if start_date is None:
+            dates = plan_range(conn, household)
+            if dates is None:
+                # Nothing saved through a plan yet: every stored week by its own number
+                for week, ingredient, count in conn.execute(
+                        "SELECT week, ingredient, count FROM shopping WHERE household = ? ORDER BY week",
+                        (household,)):
+                    shopping_lists.setdefault(week, Counter())[ingredient] += count
+                return shopping_lists
+            start_date, end_date = (datetime.date.fromisoformat(d) for d in dates)
+        end_date = end_date or datetime.date.max
+        for week_start, ingredient, count in conn.execute(
+                "SELECT week_start, ingredient, count FROM shopping WHERE household = ? "
+                "AND week_start BETWEEN ? AND ? ORDER BY week_start",
+                (household, start_date.isoformat(), end_date.isoformat())):
+            week = (datetime.date.fromisoformat(week_start) - start_date).days // 7 + 1
+            shopping_lists.setdefault(week, Counter())[ingredient] += count
+    finally:
+        conn.close()
+    return shopping_lists
+
+
+def count_served(db_path, meat_type=None, dish_name=None, start_date=None, end_date=None, household=None):
+    """
+    How often a meat type (or a dish) was served in [start_date, end_date].
+    e.g. count_served("meals.db", meat_type="Beef", start_date="2026-01-01", end_date="2026-03-31")
+    """
+    where = []
+    params = []
+    if meat_type:
+        where.append("meat_type = ?")
+        params.append(meat_type)
+    if dish_name:
+        where.append("dish_name = ?")
+        params.append(dish_name)
+    if start_date:
+        where.append("date >= ?")
+        params.append(str(start_date))
+    if end_date:
+        where.append("date <= ?")
+        params.append(str(end_date))
+    if household:
+        where.append("household = ?")
+        params.append(household)
+    sql = "SELECT COUNT(*) FROM plan_dishes"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+
+    conn = connect(db_path)
+    try:
+        return conn.execute(sql, params).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def main():
+    from planner import load_dishes_from_csv
+
+    parser = argparse.ArgumentParser(description="Meal planner SQLite store")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    imp = sub.add_parser('import-dishes', help='Load a dishes CSV into the database')
+    imp.add_argument('db')
+    imp.add_argument('csv')
+
+    query = sub.add_parser('count', help='Count served dishes, e.g. beef this quarter')
+    query.add_argument('db')
+    query.add_argument('--meat', default=None, help='Meat type (Beef, Pork, Chicken, Fish, Shrimp, Clam, ...; see meat_taxonomy.py)')
+    query.add_argument('--dish', default=None, help='Exact dish name')
+    query.add_argument('--start-date', default=None)
+    query.add_argument('--end-date', default=None)
+    query.add_argument('--household', default=None)
+
+    args = parser.parse_args()
+
+    if args.command == 'import-dishes':
+        dishes = load_dishes_from_csv(args.csv)
+        if not dishes:
+            print("Error: No dishes loadable from file. Check format.")
+            sys.exit(1)
+        save_dishes_to_db(dishes, args.db)
+    else:
+        n = count_served(args.db, args.meat, args.dish, args.start_date, args.end_date, args.household)
+        print(n)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Parameter sweep for the planning rules.
+
+Every combination of the given rule grids is planned with several seeds across
+a process pool (a MealPlanner subclass per setting, so planner.py stays
+untouched) and tabulated per setting: feasibility of the catalog, short-meal
+and staple-fallback rates, rule violations and variety (share of the catalog
+served, mean days between repeats of a dish).
+
+    python sweep.py -i dishes.csv --days 90 --seeds 8 \\
+        --grid WEEKLY_FISH_LIMIT=1,2,3 --grid NOODLE_GAP=7,14 --grid EGG_DAYS_PER_WEEK=2,3 \\
+        --grid MONTHLY_LIMITS.咖哩飯=1,2,none --csv sweep.csv
+
+A grid is RULE=v1,v2,... for an upper-case MealPlanner attribute, or
+TABLE.key=... for one entry of a dict rule (none removes the entry).
+"""
+import argparse
+import datetime
+import itertools
+import random
+import sys
+import time
+from multiprocessing import Pool
+
+import pandas as pd
+
+from feasibility import check_feasibility
+from planner import MealPlanner, PlannerStats, load_dishes_from_csv
+from validator import validate_plan
+
+# Worker state (set once per process by _init_worker)
+_WORKER_DISHES = None
+_WORKER_PLAN = None # (days, start_date, lunch)
+
+
+def parse_value(text):
+    text = text.strip()
+    if text.lower() == 'none':
+        return None
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            pass
+    return text
+
+
+def parse_grid(specs):
+    """['NAME=1,2', ...] -> {'NAME': [1, 2], ...}; raises ValueError on unknown rules."""
+    grid = {}
+    for spec in specs:
+        name, sep, values = spec.partition('=')
+        name = name.strip()
+        base, _, key = name.partition('.')
+        if not sep or not values.strip():
+            raise ValueError(f"grid '{spec}' is not RULE=v1,v2,...")
+        if not base.isupper() or not hasattr(MealPlanner, base):
+            raise ValueError(f"unknown rule '{base}' (an upper-case MealPlanner attribute)")
+        if key and not isinstance(getattr(MealPlanner, base), dict):
+            raise ValueError(f"'{base}' is not a table rule; use {base}=...")
+        grid[name] = [parse_value(v) for v in values.split(',')]
+    return grid
+
+
+def planner_class(overrides):
+    """MealPlanner subclass with the given rule values (TABLE.key entries merged into a copy)."""
+    attrs = {}
+    for name, value in overrides.items():
+        base, _, key = name.partition('.')
+        if key:
+            table = dict(attrs.get(base, getattr(MealPlanner, base)))
+            if value is None:
+                table.pop(key, None)
+            else:
+                table[key] = value
+            attrs[base] = table
+        else:
+            attrs[name] = value
+    return type('SweepPlanner', (MealPlanner,), attrs)
+
+
+def plan_metrics(plan, dishes, stats, planner_cls, lunch=False):
+    """Quality numbers of one plan (rates per planned meal)."""
+    planned = [day for day in plan if day.is_planned]
+    meals = len(planned) * (2 if lunch else 1)
+    last_seen, gaps, served = {}, [], set()
+    for i, day in enumerate(plan):
+        for d in day.dinner + day.lunch:
+            if d.name in last_seen:
+                gaps.append(i - last_seen[d.name])
+            last_seen[d.name] = i
+            served.add(d.name)
+    sides = sum(1 for d in dishes if d.category in ('Protein', 'Egg', 'Vegetable', 'Other'))
+    report = validate_plan(plan, dishes, planner_cls)
+    return {
+        'short_meal_rate': stats.total['short_meal'] / meals if meals else 0.0,
+        'staple_fallback_rate': stats.total['staple_fallback'] / len(planned) if planned else 0.0,
+        'violations': report.total(),
+        'egg_warnings': len(report.warnings),
+        'variety': len(served) / sides if sides else 0.0,
+        'mean_repeat_gap': sum(gaps) / len(gaps) if gaps else float('nan'),
+    }
+
+
+def _init_worker(dishes, days, start_date, lunch):
+    global _WORKER_DISHES, _WORKER_PLAN
+    _WORKER_DISHES = dishes
+    _WORKER_PLAN = (days, start_date, lunch)
+
+
+def _run_worker(task):
+    setting, overrides, seed = task
+    days, start_date, lunch = _WORKER_PLAN
+    planner_cls = planner_class(overrides)
+    random.seed(seed)
+    stats = PlannerStats()
+    t0 = time.perf_counter()
+    plan = planner_cls(_WORKER_DISHES, stats=stats, lunch=lunch).generate_month_plan(days=days, start_date=start_date)
+    row = {'setting': setting, 'seed': seed, 'seconds': time.perf_counter() - t0}
+    row.update(plan_metrics(plan, _WORKER_DISHES, stats, planner_cls, lunch))
+    return row
+
+
+def run_sweep(dishes, grid, days=28, start_date=None, seeds=4, seed=0, lunch=False, workers=None):
+    """
+    Plans every combination of grid (name -> values) with `seeds` seeds.
+    Returns (settings, runs): one row per setting with its feasibility and the
+    mean metrics over its seeds, and one row per plan.
+    """
+    start_date = start_date or datetime.date.today()
+    names = list(grid)
+    combos = [dict(zip(names, values)) for values in itertools.product(*grid.values())] or [{}]
+    tasks = [(i, overrides, seed + k) for i, overrides in enumerate(combos) for k in range(seeds)]
+
+    if workers == 1:
+        _init_worker(dishes, days, start_date, lunch)
+        rows = [_run_worker(task) for task in tasks]
+    else:
+        with Pool(processes=workers, initializer=_init_worker, initargs=(dishes, days, start_date, lunch)) as pool:
+            rows = list(pool.imap_unordered(_run_worker, tasks))
+    runs = pd.DataFrame([{**combos[row['setting']], **row} for row in rows])
+    runs = runs.sort_values(['setting', 'seed'], ignore_index=True)
+
+    settings = []
+    for i, overrides in enumerate(combos):
+        report = check_feasibility(dishes, days, start_date, planner_class(overrides), lunch=lunch)
+        settings.append({**overrides, 'setting': i, 'feasible': report.ok,
+                         'feasibility_errors': len(report.errors), 'feasibility_warnings': len(report.warnings)})
+    metrics = runs.drop(columns=names + ['seed']).groupby('setting').mean()
+    table = pd.DataFrame(settings).set_index('setting').join(metrics)
+    table = table.sort_values(['feasible', 'violations', 'short_meal_rate', 'variety'],
+                              ascending=[False, True, True, False])
+    return table.reset_index(drop=True), runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep planning rule values over several seeds and compare the plans")
+    parser.add_argument('--input', '-i', default='dishes.csv', help='Path to the dishes CSV (or .db) file')
+    parser.add_argument('--grid', '-g', action='append', default=[], help='RULE=v1,v2,... (repeatable), e.g. WEEKLY_FISH_LIMIT=1,2,3')
+    parser.add_argument('--days', '-d', type=int, default=28, help='Days per plan (default: 28)')
+    parser.add_argument('--start-date', type=str, default=None, help='Start date in YYYY-MM-DD format (default: today)')
+    parser.add_argument('--seeds', type=int, default=4, help='Plans (seeds) per setting')
+    parser.add_argument('--seed', type=int, default=0, help='First seed')
+    parser.add_argument('--lunch', action='store_true', help='Plan in lunch mode')
+    parser.add_argument('--workers', '-j', type=int, default=None, help='Worker processes (default: CPU count, 1 = no pool)')
+    parser.add_argument('--csv', type=str, default=None, help='Write the per-setting table to this CSV')
+    parser.add_argument('--runs-csv', type=str, default=None, help='Write one row per plan to this CSV')
+    args = parser.parse_args()
+
+    try:
+        grid = parse_grid(args.grid)
+        start_date = datetime.datetime.strptime(args.start_date, "%Y-%m-%d").date() if args.start_date else None
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    dishes = load_dishes_from_csv(args.input)
+    if not dishes:
+        print("Error: No dishes loadable from file. Check format.")
+        sys.exit(1)
+
+    n_settings = 1
+    for values in grid.values():
+        n_settings *= len(values)
+    print(f"Sweeping {n_settings} setting(s) x {args.seeds} seed(s) of {args.days}-day plans...")
+    t0 = time.perf_counter()
+    table, runs = run_sweep(dishes, grid, args.days, start_date, args.seeds, args.seed, args.lunch, args.workers)
+    print(f"{len(runs)} plans in {time.perf_counter() - t0:.1f}s\n")
+    with pd.option_context('display.width', 200, 'display.max_columns', None, 'display.float_format', '{:.3f}'.format):
+        print(table.drop(columns='seconds').to_string(index=False))
+
+    if args.csv:
+        table.to_csv(args.csv, index=False, encoding='utf-8-sig')
+        print(f"\nSettings saved to {args.csv}")
+    if args.runs_csv:
+        runs.to_csv(args.runs_csv, index=False, encoding='utf-8-sig')
+        print(f"Runs saved to {args.runs_csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Synthetic catalogs and planning horizons for scale testing.
+
+Generates realistic dishes CSVs of any size with a configurable category mix.
+Dish names use the meat keywords meat_taxonomy.py recognizes (魚, 牛, 豬,
+雞, 蝦, 蛤蜊), include fish dishes and the incompatible 炒腐竹 / 滷豆腐 pair,
+and the staple categories carry the monthly-limited dishes, so every planning
+rule is exercised. The same seed always gives the same catalog.
+"""
+import argparse
+import csv
+import datetime
+import random
+import sys
+
+from planner import Dish
+
+DEFAULT_MIX = {
+    'Protein': 0.25,
+    'Egg': 0.10,
+    'Vegetable': 0.25,
+    'Other': 0.28,
+    'Rice': 0.04,
+    'Combo (Rice)': 0.05,
+    'Combo (Noodle)': 0.03,
+}
+
+# Meat type -> name stems containing a keyword of meat_taxonomy.TAXONOMY
+MEATS = {
+    'Fish': ['鮭魚', '鱈魚', '虱目魚', '鯛魚', '鯖魚', '大比目魚'],
+    'Beef': ['牛肉', '牛小排', '牛腱', '牛絞肉'],
+    'Pork': ['豬肉', '豬頸肉', '豬五花', '豬里肌'],
+    'Chicken': ['雞肉', '雞腿', '雞胸', '雞翅'],
+    'Shrimp': ['蝦仁', '蝦子', '白蝦'],
+    'Clam': ['蛤蜊'],
+}
+METHODS = ['炒', '蒸', '滷', '烤', '煎', '燉', '燙', '涼拌', '紅燒', '清蒸']
+VEGETABLES = ['高麗菜', '青江菜', '菠菜', '地瓜葉', '空心菜', '青花菜', '白花椰菜', '娃娃菜',
+              '茼蒿', '櫛瓜', '絲瓜', '四季豆', '玉米', '皎白筍', '大陸妹', '芥藍']
+OTHER_BASES = ['豆腐', '香菇', '金針菇', '杏鮑菇', '鴻禧菇', '干貝', '茄子', '豆干', '海帶', '木耳', '馬鈴薯']
+EGG_BASES = ['紅蘿蔔', '番茄', '洋蔥', '菠菜', '九層塔', '玉米', '蔥']
+SEASONINGS = ['洋蔥', '蒜頭', '薑', '蔥', '醬油', '黑胡椒', '香油', '紅蘿蔔', '辣椒', '九層塔']
+
+# Staples the planner's monthly limits refer to (see MealPlanner.MONTHLY_LIMITS)
+FIXED_DISHES = [
+    ('白飯', 'Rice', ''),
+    ('義大利麵', 'Rice', '義大利麵, 香油, 醬油膏'),
+    ('雞湯麵', 'Combo (Noodle)', '雞肉, 香菇, 蒜頭, 麵'),
+    ('番茄牛肉飯', 'Combo (Rice)', '番茄, 牛小排, 洋蔥, 馬鈴薯'),
+    ('咖哩飯', 'Combo (Rice)', '馬鈴薯, 洋蔥, 咖哩塊, 紅蘿蔔, 雞肉'),
+    ('炒腐竹', 'Other', '腐竹'),
+    ('滷豆腐', 'Other', '豆腐'),
+]
+
+# Named horizons (days) for load tests
+HORIZONS = {
+    'week': 7,
+    'month': 28,
+    'quarter': 91,
+    'year': 365,
+    'decade': 3650,
+}
+
+
+def horizon(name_or_days, start_date=None):
+    """(start_date, days) for a named horizon or a day count. Starts on a Monday by default."""
+    days = HORIZONS[name_or_days] if isinstance(name_or_days, str) else int(name_or_days)
+    if start_date is None:
+        start_date = datetime.date(2026, 1, 5)
+    return start_date, days
+
+
+def _unique(name, seen):
+    # Large catalogs run out of combinations: number the variants
+    if name not in seen:
+        seen.add(name)
+        return name
+    n = 2
+    while f"{name} #{n}" in seen:
+        n += 1
+    name = f"{name} #{n}"
+    seen.add(name)
+    return name
+
+
+def _meat_stem(rng, fish_ratio):
+    if rng.random() < fish_ratio:
+        return rng.choice(MEATS['Fish'])
+    meat_type = rng.choice([m for m in MEATS if m != 'Fish'])
+    return rng.choice(MEATS[meat_type])
+
+
+def _ingredients(rng, base):
+    extras = rng.sample(SEASONINGS, rng.randint(0, 3))
+    return ', '.join([base] + [e for e in extras if e != base])
+
+
+def generate_catalog(n_dishes, seed=0, mix=None, fish_ratio=0.3, meaty_other_ratio=0.15):
+    """
+    Returns a list of n_dishes Dish objects.
+    mix: category -> share of the catalog (normalized); defaults to DEFAULT_MIX.
+    fish_ratio: share of meat dishes that are fish.
+    meaty_other_ratio: share of 'Other' dishes that contain meat (e.g. 蒜末炒吻仔魚).
+    """
+    rng = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+    total = sum(mix.values())
+
+    seen = set()
+    dishes = []
+    for name, cat, ings in FIXED_DISHES:
+        if len(dishes) >= n_dishes:
+            break
+        if cat in mix:
+            seen.add(name)
+            dishes.append(Dish(name, cat, ings))
+
+    # Category counts for the remaining slots, largest remainder rounding
+    remaining = max(0, n_dishes - len(dishes))
+    shares = {cat: remaining * w / total for cat, w in mix.items()}
+    counts = {cat: int(s) for cat, s in shares.items()}
+    for cat in sorted(shares, key=lambda c: shares[c] - counts[c], reverse=True)[:remaining - sum(counts.values())]:
+        counts[cat] += 1
+
+    for cat, count in counts.items():
+        for _ in range(count):
+            method = rng.choice(METHODS)
+            if cat == 'Protein':
+                base = _meat_stem(rng, fish_ratio)
+                name = f"{method}{base}"
+            elif cat == 'Egg':
+                base = rng.choice(EGG_BASES)
+                name = rng.choice([f"{base}炒蛋", f"{base}烘蛋", "荷包蛋", "蒸蛋"])
+            elif cat == 'Vegetable':
+                base = rng.choice(VEGETABLES)
+                name = f"{method}{base}" if rng.random() < 0.5 else base
+            elif cat == 'Rice':
+                base = rng.choice(VEGETABLES + OTHER_BASES)
+                name = f"{base}炊飯"
+            elif cat == 'Combo (Rice)':
+                base = _meat_stem(rng, fish_ratio)
+                name = f"{base}燴飯"
+            elif cat == 'Combo (Noodle)':
+                base = _meat_stem(rng, fish_ratio)
+                name = f"{base}{rng.choice(['湯麵', '炒麵', '拌麵'])}"
+            else:
+                if rng.random() < meaty_other_ratio:
+                    base = _meat_stem(rng, fish_ratio)
+                    name = f"{base}炒{rng.choice(OTHER_BASES)}"
+                else:
+                    base = rng.choice(OTHER_BASES)
+                    name = f"{method}{base}"
+            ings = _ingredients(rng, base)
+            if cat == 'Egg':
+                ings = '雞蛋, ' + ings
+            dishes.append(Dish(_unique(name, seen), cat, ings))
+
+    return dishes
+
+
+def save_catalog_csv(dishes, filename):
+    with open(filename, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Dish Name', 'Category', 'Ingredients'])
+        for d in dishes:
+            writer.writerow([d.name, d.category, ', '.join(d.ingredients)])
+    print(f"Synthetic catalog ({len(dishes)} dishes) saved to {filename}")
+
+
+def parse_mix(text):
+    # "Protein=0.3,Egg=0.1,..." -> dict
+    mix = {}
+    for part in text.split(','):
+        cat, _, weight = part.partition('=')
+        mix[cat.strip()] = float(weight)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic dishes catalog for scale testing")
+    parser.add_argument('--dishes', '-n', type=int, default=1000, help='Number of dishes (default: 1000)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (same seed, same catalog)')
+    parser.add_argument('--mix', type=str, default=None, help='Category mix, e.g. "Protein=0.3,Egg=0.1,Vegetable=0.25,Other=0.25,Rice=0.1"')
+    parser.add_argument('--fish-ratio', type=float, default=0.3, help='Share of meat dishes that are fish')
+    parser.add_argument('--output', '-o', default='synthetic_dishes.csv', help='Output CSV filename')
+    args = parser.parse_args()
+
+    try:
+        mix = parse_mix(args.mix) if args.mix else None
+    except ValueError:
+        print("Error: Invalid --mix. Use Category=weight pairs separated by commas.")
+        sys.exit(1)
+
+    dishes = generate_catalog(args.dishes, seed=args.seed, mix=mix, fish_ratio=args.fish_ratio)
+    save_catalog_csv(dishes, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+"""
+Rule validator for finished plans.
+
+The plan is turned into flat arrays (one row per served side dish: day, dish,
+meal, category, meat type; one row per day: date, ISO week, month, staple) and
+every rule is checked in a few vectorized passes over them:
+  - egg_days:          more than EGG_DAYS_PER_WEEK egg days in an ISO week
+  - fish_limit:        more than WEEKLY_FISH_LIMIT fish dishes in an ISO week
+  - weekly_repeat:     a side dish served twice in an ISO week
+  - noodle_gap:        noodle staples less than NOODLE_GAP days apart
+  - combo_spacing:     combo staples less than COMBO_GAP days apart
+  - monthly_limit:     a staple over its MONTHLY_LIMITS in a calendar month
+  - daily_meat:        a meat type twice in a day (across lunch and dinner)
+  - vegetable:         more than one Vegetable in a meal
+  - incompatible_pair: both dishes of an INCOMPATIBLE_PAIRS pair in one meal
+  - combo_protein:     a Protein side with a combo staple
+  - budget:            a day or shopping week over one of the LIMITS (attributes.py)
+Fewer egg days than the week allows is only a warning: the planner bends that
+rule when the catalog runs out of Egg dishes (see feasibility.py). Rules are
+checked inside the plan only; the carry-over from history is not.
+
+    python validator.py meal_plan.csv -i dishes.csv
+"""
+import argparse
+import sys
+
+import numpy as np
+
+from planner import MealPlanner, load_dishes_from_csv, load_plan_from_csv
+
+RULES = ['egg_days', 'fish_limit', 'weekly_repeat', 'noodle_gap', 'combo_spacing', 'monthly_limit',
+         'daily_meat', 'vegetable', 'incompatible_pair', 'combo_protein', 'budget']
+
+
+class PlanArrays:
+    """Columnar view of a plan: per-day and per-dish (entry) integer arrays."""
+
+    def __init__(self, plan, dishes=()):
+        staple_cats = {d.name: d.category for d in dishes}
+        self.plan = plan
+        n = len(plan)
+        self.ordinal = np.fromiter((day.date.toordinal() for day in plan), dtype=np.int64, count=n)
+        self.planned = np.fromiter((day.is_planned for day in plan), dtype=bool, count=n)
+        self.weekday = np.fromiter((day.date.isoweekday() for day in plan), dtype=np.int8, count=n)
+
+        # ISO weeks and calendar months as dense indices
+        week_keys = np.fromiter((y * 100 + w for y, w, _ in (day.date.isocalendar() for day in plan)),
+                                dtype=np.int64, count=n)
+        self.week_keys, self.week = np.unique(week_keys, return_inverse=True)
+        month_keys = np.fromiter((day.date.year * 12 + day.date.month - 1 for day in plan), dtype=np.int64, count=n)
+        self.month_keys, self.month = np.unique(month_keys, return_inverse=True)
+
+        # Staples: names and categories (blank for weekends/holidays and fallbacks not in the catalog)
+        staple_index = {}
+        staple = np.full(n, -1, dtype=np.int64)
+        for i, day in enumerate(plan):
+            if day.is_planned:
+                staple[i] = staple_index.setdefault(day.staple, len(staple_index))
+        self.staple_names = list(staple_index)
+        self.staple = staple
+        cats = [staple_cats.get(name, '') for name in self.staple_names]
+        noodle = np.array(['Noodle' in c for c in cats] + [False], dtype=bool)
+        combo = np.array(['Combo' in c for c in cats] + [False], dtype=bool)
+        self.noodle_day = noodle[staple] # -1 -> the trailing False
+        self.combo_day = combo[staple]
+
+        # One entry per side dish served
+        self.names = []
+        self.categories = []
+        self.meats = []
+        name_index, cat_index, meat_index = {}, {}, {}
+        e_day, e_meal, e_name, e_cat, e_meat = [], [], [], [], []
+        for i, day in enumerate(plan):
+            for meal, meal_dishes in enumerate((day.dinner, day.lunch)):
+                for d in meal_dishes:
+                    e_day.append(i)
+                    e_meal.append(meal)
+                    e_name.append(name_index.setdefault(d.name, len(name_index)))
+                    e_cat.append(cat_index.setdefault(d.category, len(cat_index)))
+                    e_meat.append(meat_index.setdefault(d.meat_type, len(meat_index)) if d.meat_type else -1)
+        self.names = list(name_index)
+        self.categories = list(cat_index)
+        self.meats = list(meat_index)
+        self.e_day = np.array(e_day, dtype=np.int64)
+        self.e_meal = np.array(e_meal, dtype=np.int64) # 0 dinner, 1 lunch
+        self.e_name = np.array(e_name, dtype=np.int64)
+        self.e_cat = np.array(e_cat, dtype=np.int64)
+        self.e_meat = np.array(e_meat, dtype=np.int64)
+
+    def category_mask(self, category):
+        code = self.categories.index(category) if category in self.categories else -2
+        return self.e_cat == code
+
+    def meat_mask(self, meat):
+        code = self.meats.index(meat) if meat in self.meats else -2
+        return self.e_meat == code
+
+    def week_label(self, w):
+        key = int(self.week_keys[w])
+        return f"{key // 100}-W{key % 100:02d}"
+
+    def month_label(self, m):
+        key = int(self.month_keys[m])
+        return f"{key // 12}-{key % 12 + 1:02d}"
+
+    def date_str(self, i):
+        return self.plan[i].date_str
+
+
+def duplicates(keys):
+    """(key, count) of the keys occurring more than once."""
+    if not len(keys):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    uniq, counts = np.unique(keys, return_counts=True)
+    dup = counts > 1
+    return uniq[dup], counts[dup]
+
+
+class ValidationReport:
+    def __init__(self):
+        self.violations = {rule: [] for rule in RULES}
+        self.warnings = []
+
+    @property
+    def ok(self):
+        return not any(self.violations.values())
+
+    def counts(self):
+        """Rule -> number of violations (for metrics / run reports)."""
+        return {rule: len(v) for rule, v in self.violations.items()}
+
+    def total(self):
+        return sum(len(v) for v in self.violations.values())
+
+    def summary(self, limit=5):
+        if self.ok and not self.warnings:
+            return "Validation: OK, the plan keeps every rule."
+        lines = [f"Validation: {self.total()} violation(s)" if not self.ok else "Validation: OK"]
+        for rule, issues in self.violations.items():
+            if issues:
+                lines.append(f"  {rule} ({len(issues)}): " + "; ".join(issues[:limit])
+                             + (" ..." if len(issues) > limit else ""))
+        if self.warnings:
+            lines.append(f"  warnings ({len(self.warnings)}): " + "; ".join(self.warnings[:limit])
+                         + (" ..." if len(self.warnings) > limit else ""))
+        return "\n".join(lines)
+
+
+def validate_plan(plan, dishes=(), planner_cls=MealPlanner):
+    """
+    Checks a plan against the planning rules of planner_cls (a planner
+    instance also works, with its own LIMITS). dishes (the catalog) resolves
+    staple categories and dish attributes. Returns a ValidationReport.
+
+    Monthly limits count per calendar month, as the planner applies them: a
+    plan across a month boundary gets each month's allowance (咖哩飯: 1).
+
+    >>> import datetime, random
+    >>> from planner import Dish
+    >>> dishes = [Dish('白飯', 'Rice', '米'), Dish('咖哩飯', 'Combo (Rice)', '咖哩塊, 洋蔥'),
+    ...           Dish('炒麵', 'Combo (Noodle)', '麵'), Dish('荷包蛋', 'Egg', '雞蛋'),
+    ...           Dish('蒸蛋', 'Egg', '雞蛋'), Dish('炒蛋', 'Egg', '雞蛋')]
+    >>> dishes += [Dish(f'{m}{k}', 'Protein', m) for m in ('雞肉', '豬肉', '牛肉') for k in range(4)]
+    >>> dishes += [Dish(f'青菜{k}', 'Vegetable', '青菜') for k in range(8)]
+    >>> dishes += [Dish(f'豆腐{k}', 'Other', '豆腐') for k in range(8)]
+    >>> planner = MealPlanner(dishes, rng=random.Random(1))
+    >>> plan = planner.generate_month_plan(days=42, start_date=datetime.date(2026, 1, 19))
+    >>> [day.date.month for day in plan if day.staple == '咖哩飯']
+    [1, 2]
+    >>> validate_plan(plan, dishes, planner).counts()['monthly_limit']
+    0
+    """
+    report = ValidationReport()
+    if not plan:
+        return report
+    a = PlanArrays(plan, dishes)
+    v = report.violations
+    n_weeks = len(a.week_keys)
+    entry_week = a.week[a.e_day]
+
+    # Weekly no-repeat
+    keys, counts = duplicates(entry_week * len(a.names) + a.e_name)
+    for key, c in zip(keys, counts):
+        v['weekly_repeat'].append(f"{a.week_label(key // len(a.names))}: {a.names[key % len(a.names)]} x{c}")
+
+    # Weekly fish cap
+    fish = np.bincount(entry_week[a.meat_mask('Fish')], minlength=n_weeks)
+    for w in np.flatnonzero(fish > planner_cls.WEEKLY_FISH_LIMIT):
+        v['fish_limit'].append(f"{a.week_label(w)}: {fish[w]} fish dishes (limit {planner_cls.WEEKLY_FISH_LIMIT})")
+
+    # Egg days: an Egg dish at dinner or a combo staple (combos only go on egg days)
+    egg_day = a.combo_day.copy()
+    egg_day[a.e_day[a.category_mask('Egg') & (a.e_meal == 0)]] = True
+    eggs = np.bincount(a.week, weights=egg_day, minlength=n_weeks).astype(np.int64)
+    planned = np.bincount(a.week, weights=a.planned, minlength=n_weeks).astype(np.int64)
+    target = planner_cls.EGG_DAYS_PER_WEEK
+    # Weekdays outside the plan or on holidays may have taken some egg days
+    low = np.maximum(0, target - (5 - planned))
+    for w in np.flatnonzero(eggs > target):
+        v['egg_days'].append(f"{a.week_label(w)}: {eggs[w]} egg days (rule {target})")
+    for w in np.flatnonzero(eggs < low):
+        report.warnings.append(f"{a.week_label(w)}: only {eggs[w]} egg day(s), {low[w]} expected")
+
+    # Noodle gap and combo spacing
+    for rule, mask, gap in (('noodle_gap', a.noodle_day, planner_cls.NOODLE_GAP),
+                            ('combo_spacing', a.combo_day, planner_cls.COMBO_GAP)):
+        days = np.flatnonzero(mask)
+        gaps = np.diff(a.ordinal[days])
+        for k in np.flatnonzero(gaps < gap):
+            v[rule].append(f"{a.date_str(days[k])} -> {a.date_str(days[k + 1])}: {gaps[k]} days (min {gap})")
+
+    # Monthly staple limits (first matching key, as in pick_staple_dish)
+    n_staples = len(a.staple_names)
+    if n_staples:
+        limit = np.full(n_staples, np.iinfo(np.int64).max, dtype=np.int64)
+        for s, name in enumerate(a.staple_names):
+            lim = next((lim for key, lim in planner_cls.MONTHLY_LIMITS.items() if key in name), None)
+            if lim is not None:
+                limit[s] = lim
+        served = a.staple >= 0
+        uniq, counts = np.unique(a.month[served] * n_staples + a.staple[served], return_counts=True)
+        over = counts > limit[uniq % n_staples]
+        for key, c in zip(uniq[over], counts[over]):
+            s = key % n_staples
+            v['monthly_limit'].append(f"{a.month_label(key // n_staples)}: {a.staple_names[s]} x{c} (limit {limit[s]})")
+
+    # Daily meat uniqueness, across both meals
+    has_meat = a.e_meat >= 0
+    keys, counts = duplicates(a.e_day[has_meat] * len(a.meats) + a.e_meat[has_meat])
+    for key, c in zip(keys, counts):
+        v['daily_meat'].append(f"{a.date_str(key // len(a.meats))}: {a.meats[key % len(a.meats)]} x{c}")
+
+    # Per meal: one Vegetable, no incompatible pair
+    meal_key = a.e_day * 2 + a.e_meal
+    keys, counts = duplicates(meal_key[a.category_mask('Vegetable')])
+    for key, c in zip(keys, counts):
+        v['vegetable'].append(f"{a.date_str(key // 2)} {('dinner', 'lunch')[key % 2]}: {c} vegetables")
+    name_code = {name: i for i, name in enumerate(a.names)}
+    for pair in planner_cls.INCOMPATIBLE_PAIRS:
+        codes = [name_code.get(name, -2) for name in pair]
+        both = None
+        for code in codes:
+            meals = np.unique(meal_key[a.e_name == code])
+            both = meals if both is None else np.intersect1d(both, meals)
+        for key in both if both is not None else ():
+            v['incompatible_pair'].append(f"{a.date_str(key // 2)} {('dinner', 'lunch')[key % 2]}: {' + '.join(sorted(pair))}")
+
+    # Combo staples come without a Protein side
+    bad = a.category_mask('Protein') & (a.e_meal == 0) & a.combo_day[a.e_day]
+    for i in np.unique(a.e_day[bad]):
+        v['combo_protein'].append(f"{a.date_str(i)}: Protein side with {plan[i].staple}")
+
+    # Attribute limits per day and per shopping week (7-day blocks from the start), staples included
+    attrs = {d.name: d.attrs for d in dishes}
+    for key, limit in getattr(planner_cls, 'LIMITS', {}).items():
+        attr, _, period = key.partition('/')
+        side = np.array([attrs.get(name, {}).get(attr, 0.0) for name in a.names] + [0.0])
+        staple = np.array([attrs.get(name, {}).get(attr, 0.0) for name in a.staple_names] + [0.0])
+        day_total = np.bincount(a.e_day, weights=side[a.e_name], minlength=len(plan)) + staple[a.staple]
+        if period == 'day':
+            for i in np.flatnonzero(day_total > limit + 1e-9):
+                v['budget'].append(f"{a.date_str(i)}: {attr} {day_total[i]:g} (limit {limit:g})")
+        else:
+            week_total = np.bincount(np.arange(len(plan)) // 7, weights=day_total)
+            for w in np.flatnonzero(week_total > limit + 1e-9):
+                v['budget'].append(f"shopping week {w + 1} (from {a.date_str(w * 7)}): {attr} {week_total[w]:g} (limit {limit:g})")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check a meal plan against the planning rules")
+    parser.add_argument('plan', help='Plan file (CSV, Parquet/Feather or .db)')
+    parser.add_argument('--input', '-i', default='dishes.csv', help='Path to the dishes CSV file')
+    parser.add_argument('--household', type=str, default='default', help='Household key for .db plans')
+    parser.add_argument('--limit', action='append', default=[], help='Attribute limit attribute/period=value (repeatable), e.g. cost/week=1500')
+    args = parser.parse_args()
+
+    try:
+        from attributes import parse_limits
+        limits = parse_limits(args.limit)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    dishes = load_dishes_from_csv(args.input)
+    if not dishes:
+        print("Error: No dishes loadable from file. Check format.")
+        sys.exit(1)
+    plan = load_plan_from_csv(args.plan, dishes, household=args.household)
+    if not plan:
+        print(f"Error: No plan loadable from '{args.plan}'.")
+        sys.exit(1)
+
+    report = validate_plan(plan, dishes, type('LimitedPlanner', (MealPlanner,), {'LIMITS': limits}))
+    print(report.summary())
+    if not report.ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
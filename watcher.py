@@ -0,0 +1,73 @@
+"""
+Helpers for watch mode (python main.py --watch).
+
+InputWatcher polls the input files (mtime and size, no extra dependency) and
+reports which of them changed. OutputCache remembers what each output was last
+rendered from, so a regeneration only rewrites the outputs whose inputs
+changed: editing one dish's ingredients rewrites the shopping list and the
+reports showing it, not the plan file or the print view.
+"""
+import os
+import time
+
+
+class InputWatcher:
+    def __init__(self, paths):
+        # name -> path of every watched input
+        self.paths = dict(paths)
+        self.stamps = {name: self.stamp(path) for name, path in self.paths.items()}
+
+    @staticmethod
+    def stamp(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None # missing counts as a change once it (re)appears
+        return (st.st_mtime_ns, st.st_size)
+
+    def changed(self):
+        """Names of the inputs changed since the last call."""
+        names = []
+        for name, path in self.paths.items():
+            stamp = self.stamp(path)
+            if stamp != self.stamps[name]:
+                self.stamps[name] = stamp
+                names.append(name)
+        return names
+
+    def wait(self, interval=0.5):
+        """Blocks until some input changes; returns the changed names."""
+        names = []
+        while not names:
+            time.sleep(interval)
+            names = self.changed()
+        # Editors often save in several writes: wait until the files settle
+        while True:
+            time.sleep(interval)
+            more = self.changed()
+            if not more:
+                return names
+            names.extend(n for n in more if n not in names)
+
+
+def plan_key(plan):
+    # What the plan file and the reports show of a plan
+    return tuple((day.date, day.staple, tuple((d.name, d.category) for d in day.dinner),
+                  tuple((d.name, d.category) for d in day.lunch)) for day in plan)
+
+
+def shopping_key(shopping):
+    return tuple((week, tuple(sorted(counter.items()))) for week, counter in shopping.items())
+
+
+class OutputCache:
+    def __init__(self):
+        self.inputs = {}
+        self.values = {}
+
+    def stale(self, output, *inputs):
+        """True if output was last rendered from other inputs (and remembers these)."""
+        if self.inputs.get(output) == inputs:
+            return False
+        self.inputs[output] = inputs
+        return True